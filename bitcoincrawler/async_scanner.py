@@ -0,0 +1,190 @@
+import asyncio
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner, _bulk_inputs, _bulk_outputs, _selected, _split, \
+    _split_items_observers
+from bitcoincrawler.components.columns import BlockColumns
+from bitcoincrawler.components.model import BlockDisconnected
+
+
+def _callbacks(observers, name):
+    """
+    :return: [(observers[i].<name>, is coroutine function), ...], for the observers defining it
+    """
+    callbacks = []
+    for observer in observers:
+        callback = getattr(observer, name, None)
+        if callback is not None:
+            callbacks.append((callback, asyncio.iscoroutinefunction(callback)))
+    return callbacks
+
+
+class AsyncBitcoinScanner(BitcoinScanner):
+    """
+    BitcoinScanner running on an event loop, with the same observers lists.
+    blocks_generator is an iterable or an async iterator (e.g. an async generator) of blocks: with
+    factory.generate_blocks_async() of an async factory, blocks and transactions rpcs are awaited on the loop.
+    Observers callbacks can be coroutine functions (async def, asyncio.coroutine): they're scheduled
+    as tasks, up to `concurrency` running at once. The other callbacks are called directly.
+    Every callback of a block is done before the following block is notified, but async callbacks
+    of the same block run concurrently, in no particular order.
+
+    scanner = AsyncBitcoinScanner(blocks, concurrency=50)
+    scanner.outputs_observers.append(observer)  # async def on_output(self, output)
+    scanner.scan()  # or: yield from scanner.scan_async()
+    notify_transaction(tx) notifies one transaction the same way (notify_transaction_async on a running loop).
+    """
+    def __init__(self, blocks_generator, concurrency=100, loop=None, mempool_storage=None, checkpoint=None,
+                 factory=None):
+        super(AsyncBitcoinScanner, self).__init__(blocks_generator, mempool_storage=mempool_storage,
+                                                  checkpoint=checkpoint, factory=factory)
+        self.loop = loop or asyncio.get_event_loop()
+        self.concurrency = concurrency
+        # running async callbacks, concurrent notify_transaction_async calls included
+        self.__slots = asyncio.Semaphore(concurrency, loop=self.loop)
+
+    @asyncio.coroutine
+    def _gather_callbacks(self, callbacks, pending, *args):
+        """
+        Calls the sync callbacks, schedules the async ones as tasks added to pending.
+        Named apart from BitcoinScanner._call(method, *args), that the inherited notify methods use.
+        """
+        for callback, is_async in callbacks:
+            if is_async:
+                yield from self.__slots.acquire()
+                task = asyncio.ensure_future(callback(*args), loop=self.loop)
+                task.add_done_callback(self.__done)
+                pending.append(task)
+            else:
+                callback(*args)
+
+    def __done(self, task):
+        self.__slots.release()
+
+    @asyncio.coroutine
+    def _call_selected(self, cur_tx, selections, method, bulk_method, pending):
+        """
+        :param selections: _selected result, [(observer, [selected inputs/outputs]), ...]
+        """
+        for n, items in selections:
+            if hasattr(type(n), bulk_method):
+                yield from self._gather_callbacks(_callbacks([n], bulk_method), pending, cur_tx, items)
+            else:
+                callbacks = _callbacks([n], method)
+                for item in items:
+                    yield from self._gather_callbacks(callbacks, pending, item)
+
+    @asyncio.coroutine
+    def _next_block(self, blocks):
+        """
+        :param blocks: iterator or async iterator
+        :return: the next block, None at the end
+        """
+        if hasattr(blocks, '__anext__'):
+            try:
+                return (yield from asyncio.ensure_future(blocks.__anext__(), loop=self.loop))
+            except StopAsyncIteration:
+                return None
+        return next(blocks, None)
+
+    def scan(self):
+        self.loop.run_until_complete(self.scan_async())
+
+    def _dispatched_callbacks(self):
+        """
+        :return: {kind: _callbacks(...)} of the registered observers, filtered observers as
+                 [(observer, filter), ...] under 'filtered_in'/'filtered_out'
+        """
+        tx_observers, bulk_tx_observers = _split(self.transactions_observers, 'on_block_transactions')
+        in_observers, out_observers, bulk_in_observers, bulk_out_observers, \
+            filtered_in_observers, filtered_out_observers = \
+            _split_items_observers(self.inputs_observers, self.outputs_observers)
+        return {'tx': _callbacks(tx_observers, 'on_transaction'),
+                'in': _callbacks(in_observers, 'on_input'),
+                'out': _callbacks(out_observers, 'on_output'),
+                'bulk_tx': _callbacks(bulk_tx_observers, 'on_block_transactions'),
+                'bulk_in': _callbacks(bulk_in_observers, 'on_inputs'),
+                'bulk_out': _callbacks(bulk_out_observers, 'on_outputs'),
+                'filtered_in': filtered_in_observers,
+                'filtered_out': filtered_out_observers}
+
+    @asyncio.coroutine
+    def _notify_transaction_async(self, tx, callbacks, pending):
+        """
+        :param callbacks: _dispatched_callbacks()
+        """
+        yield from self._gather_callbacks(callbacks['tx'], pending, tx)
+        if callbacks['bulk_in']:
+            yield from self._gather_callbacks(callbacks['bulk_in'], pending, tx, _bulk_inputs(tx.raw_inputs()))
+        if callbacks['in']:
+            for vin in tx.vin:
+                yield from self._gather_callbacks(callbacks['in'], pending, vin)
+        yield from self._call_selected(
+            tx, _selected(tx, callbacks['filtered_in'], 'raw_inputs', 'vin'), 'on_input', 'on_inputs', pending)
+        if callbacks['bulk_out']:
+            yield from self._gather_callbacks(callbacks['bulk_out'], pending, tx, _bulk_outputs(tx.raw_outputs()))
+        if callbacks['out']:
+            for vout in tx.vout:
+                yield from self._gather_callbacks(callbacks['out'], pending, vout)
+        yield from self._call_selected(
+            tx, _selected(tx, callbacks['filtered_out'], 'raw_outputs', 'vout'), 'on_output', 'on_outputs', pending)
+
+    @asyncio.coroutine
+    def notify_transaction_async(self, cur_tx):
+        """
+        notify_transaction, on the running loop: done when every callback is
+        """
+        pending = []
+        yield from self._notify_transaction_async(cur_tx, self._dispatched_callbacks(), pending)
+        yield from asyncio.gather(*pending, loop=self.loop)
+
+    def notify_transaction(self, cur_tx):
+        self.loop.run_until_complete(self.notify_transaction_async(cur_tx))
+
+    @asyncio.coroutine
+    def scan_async(self):
+        callbacks = self._dispatched_callbacks()
+        block_callbacks = _callbacks(self.blocks_observers, 'on_block')
+        disconnected_callbacks = _callbacks(self.blocks_observers, 'on_block_disconnected')
+        columns_callbacks = _callbacks(self.columns_observers, 'on_block_columns')
+        notify_tx = any(callbacks.values())
+        if not (block_callbacks or columns_callbacks or notify_tx) or self.blocks_generator is None:
+            return
+        observers = self.observers
+        self._apply_needs()
+        if self.checkpoint:
+            self.checkpoint.restore(observers)
+        blocks = self.blocks_generator.__aiter__() if hasattr(self.blocks_generator, '__aiter__') \
+            else iter(self.blocks_generator)
+        prev_block = None
+        completed = False
+        try:
+            while True:
+                cur_block = yield from self._next_block(blocks)
+                if cur_block is None:
+                    break
+                pending = []
+                if isinstance(cur_block, BlockDisconnected):
+                    yield from self._gather_callbacks(disconnected_callbacks, pending, cur_block.block)
+                    yield from asyncio.gather(*pending, loop=self.loop)
+                    continue
+                if self.checkpoint and prev_block is None:
+                    self._check_checkpoint(cur_block)
+                yield from self._gather_callbacks(block_callbacks, pending, cur_block)
+                if columns_callbacks:
+                    yield from self._gather_callbacks(columns_callbacks, pending, BlockColumns.from_block(cur_block))
+                if notify_tx:
+                    txs = yield from cur_block.transactions_async()
+                    if callbacks['bulk_tx']:
+                        yield from self._gather_callbacks(callbacks['bulk_tx'], pending, cur_block, txs)
+                    for tx in txs:
+                        yield from self._notify_transaction_async(tx, callbacks, pending)
+                yield from asyncio.gather(*pending, loop=self.loop)
+                prev_block = cur_block
+                if self.checkpoint:
+                    self.checkpoint.block_done(cur_block, observers)
+            if self.checkpoint and prev_block:
+                self.checkpoint.save(prev_block, observers)
+            completed = True
+        finally:
+            if self.checkpoint:
+                self.checkpoint.flush(raise_error=completed)
@@ -1,65 +1,365 @@
 import asyncio
+from itertools import cycle
+from time import perf_counter
+from bitcoincrawler.components.columns import BlockColumns
+from bitcoincrawler.components.model import BlockDisconnected
+from bitcoincrawler.filters import filter_of
+from bitcoincrawler.observers import needs_of
+from bitcoincrawler.profiling import profiled_call, profiled_items_call
 
-class BitcoinScanner:
-    def __init__(self, blocks_generator, async=False, mempool_storage=None):
+def _split(observers, bulk_method):
+    """
+    :return: (per item observers, observers whose class defines bulk_method)
+    """
+    return ([n for n in observers if not hasattr(type(n), bulk_method)],
+            [n for n in observers if hasattr(type(n), bulk_method)])
+
+
+def _filtered(observers, name):
+    """
+    :param name: 'input_filter' or 'output_filter'
+    :return: (observers without filter, [(observer, filter), ...] for the observers declaring one)
+    """
+    filters = [(n, filter_of(n, name)) for n in observers]
+    return [n for n, f in filters if f is None], [(n, f) for n, f in filters if f is not None]
+
+
+def _split_items_observers(inputs_observers, outputs_observers):
+    """
+    :return: (in_observers, out_observers, bulk_in_observers, bulk_out_observers,
+              filtered_in_observers, filtered_out_observers), as _notify_transaction takes them
+    """
+    in_observers, filtered_in_observers = _filtered(inputs_observers, 'input_filter')
+    out_observers, filtered_out_observers = _filtered(outputs_observers, 'output_filter')
+    in_observers, bulk_in_observers = _split(in_observers, 'on_inputs')
+    out_observers, bulk_out_observers = _split(out_observers, 'on_outputs')
+    return (in_observers, out_observers, bulk_in_observers, bulk_out_observers,
+            filtered_in_observers, filtered_out_observers)
+
+
+def _bulk_inputs(raw_inputs, indexes=None):
+    """
+    Inputs given to on_inputs: [(n, 36 bytes outpoint), ...], no input is built
+    :param raw_inputs: Transaction.raw_inputs()
+    :param indexes: of the inputs to keep, None for all of them
+    """
+    if indexes is None:
+        return list(enumerate(raw_inputs))
+    return [(n, raw_inputs[n]) for n in indexes]
+
+
+def _bulk_outputs(raw_outputs, indexes=None):
+    """
+    Outputs given to on_outputs: [(n, satoshis, script bytes), ...], no output is built
+    :param raw_outputs: Transaction.raw_outputs()
+    :param indexes: of the outputs to keep, None for all of them
+    """
+    if indexes is None:
+        return [(n, value, script) for n, (value, script) in enumerate(raw_outputs)]
+    return [(n,) + raw_outputs[n] for n in indexes]
+
+
+# per Transaction raw method: the bulk callback, its items, and their kind for the profiler
+_BULK = {'raw_inputs': ('on_inputs', _bulk_inputs, 'inputs'), 'raw_outputs': ('on_outputs', _bulk_outputs, 'outputs')}
+
+
+def _selected(cur_tx, filtered_observers, raw, items, counts=None):
+    """
+    Evaluates the filters on the raw inputs/outputs of cur_tx.
+    :param raw: 'raw_inputs' or 'raw_outputs'
+    :param items: 'vin' or 'vout': built only when a filter selects some of them for a per item observer
+    :param counts: dict, gets the number of inputs/outputs filtered (key 'inputs'/'outputs')
+    :return: [(observer, [selected inputs/outputs]), ...] for the observers with a selection,
+             raw items (_bulk_inputs, _bulk_outputs) for the bulk observers
+    """
+    if not filtered_observers:
+        return []
+    raw_items = getattr(cur_tx, raw)()
+    bulk_method, bulk_items, kind = _BULK[raw]
+    if counts is not None:
+        counts[kind] = len(raw_items)
+    built = None
+    selections = []
+    for n, f in filtered_observers:
+        selected = f.select(raw_items)
+        if not selected:
+            continue
+        if hasattr(type(n), bulk_method):
+            selections.append((n, bulk_items(raw_items, selected)))
+        else:
+            if built is None:
+                built = list(getattr(cur_tx, items))
+            selections.append((n, [built[i] for i in selected]))
+    return selections
+
+
+class _TransactionDispatch:
+    """
+    Notifies a transaction to the inputs/outputs observers, split by _split_items_observers.
+    Shared by BitcoinScanner and MempoolInspector: they define _call(method, *args) and profiler, and with a
+    profiler call _profile_transactions().
+    """
+    def _profile_transactions(self):
+        """
+        The callbacks of one transaction every profiler.sample are timed, by _timed_call and _call_items,
+        the others are called as without profiler
+        """
+        self._sampling = cycle((True,) + (False,) * (self.profiler.sample - 1))
+        self._timed_call = profiled_call(self.profiler, self._call, self.profiler.sample)
+        self._call_items = profiled_items_call(self.profiler, self._call, self.profiler.sample)
+
+    def _notify_selected(self, cur_tx, n, items, method, bulk_method, timed=False):
+        if hasattr(type(n), bulk_method):
+            (self._timed_call if timed else self._call)(getattr(n, bulk_method), cur_tx, items)
+        elif timed:
+            self._call_items(getattr(n, method), items)
+        else:
+            for item in items:
+                self._call(getattr(n, method), item)
+
+    def _notify_transaction(self, cur_tx, tx_observers, in_observers, out_observers,
+                            bulk_in_observers=(), bulk_out_observers=(),
+                            filtered_in_observers=(), filtered_out_observers=()):
+        """
+        :param bulk_in_observers: observers with on_inputs(tx, inputs), called once per transaction
+        :param bulk_out_observers: observers with on_outputs(tx, outputs), called once per transaction
+        :param filtered_in_observers: [(observer, InputFilter), ...], notified of the selected inputs only
+        :param filtered_out_observers: [(observer, OutputFilter), ...], notified of the selected outputs only
+        """
+        profiler = self.profiler
+        timed = profiler is not None and next(self._sampling)
+        call = self._timed_call if timed else self._call
+        # items dispatched, for the profiler: ints, cheaper than a count() per transaction
+        inputs = outputs = 0
+        for n in tx_observers:
+            call(n.on_transaction, cur_tx)
+
+        if len(bulk_in_observers) > 0:
+            raw_inputs = _bulk_inputs(cur_tx.raw_inputs())
+            inputs = len(raw_inputs)
+            for i_n in bulk_in_observers:
+                call(i_n.on_inputs, cur_tx, raw_inputs)
+        if len(in_observers) > 0:
+            if timed:
+                # every observer gets the inputs in one timed loop
+                vins = list(cur_tx.vin)
+                inputs = len(vins)
+                for i_n in in_observers:
+                    self._call_items(i_n.on_input, vins)
+            else:
+                # counted as they go: a list of them would cost more
+                inputs = 0
+                for vin in cur_tx.vin:
+                    inputs += 1
+                    for i_n in in_observers:
+                        self._call(i_n.on_input, vin)
+        if filtered_in_observers:
+            counts = {} if profiler else None
+            for i_n, vins in _selected(cur_tx, filtered_in_observers, 'raw_inputs', 'vin', counts):
+                self._notify_selected(cur_tx, i_n, vins, 'on_input', 'on_inputs', timed)
+            inputs = counts['inputs'] if counts else inputs
+
+        if len(bulk_out_observers) > 0:
+            raw_outputs = _bulk_outputs(cur_tx.raw_outputs())
+            outputs = len(raw_outputs)
+            for o_n in bulk_out_observers:
+                call(o_n.on_outputs, cur_tx, raw_outputs)
+        if len(out_observers) > 0:
+            if timed:
+                vouts = list(cur_tx.vout)
+                outputs = len(vouts)
+                for o_n in out_observers:
+                    self._call_items(o_n.on_output, vouts)
+            else:
+                outputs = 0
+                for vout in cur_tx.vout:
+                    outputs += 1
+                    for o_n in out_observers:
+                        self._call(o_n.on_output, vout)
+        if filtered_out_observers:
+            counts = {} if profiler else None
+            for o_n, vouts in _selected(cur_tx, filtered_out_observers, 'raw_outputs', 'vout', counts):
+                self._notify_selected(cur_tx, o_n, vouts, 'on_output', 'on_outputs', timed)
+            outputs = counts['outputs'] if counts else outputs
+        if profiler is not None:
+            tally = profiler.counts
+            if tx_observers:
+                tally['transactions'] += 1
+            tally['inputs'] += inputs
+            tally['outputs'] += outputs
+
+
+class BitcoinScanner(_TransactionDispatch):
+    def __init__(self, blocks_generator, async=False, mempool_storage=None, checkpoint=None, profiler=None,
+                 factory=None):
+        """
+        :param checkpoint: a Checkpoint. Observers state is restored before the scan, and
+                           blocks_generator must start right after the checkpoint block.
+        :param profiler: a profiling.ScanProfiler, timing observers and blocks. Without it, nothing is timed.
+        :param factory: the factory of blocks_generator. If it has a needs option and none is set, the scan
+                        sets it to the observers needs: fields nobody reads are not decoded.
+        """
         self.mempool_storage = mempool_storage
         self.blocks_generator = blocks_generator
+        self.checkpoint = checkpoint
+        self.factory = factory
         self.blocks_observers = []
         self.inputs_observers = []
         self.outputs_observers = []
         self.transactions_observers = []
+        self.columns_observers = []
 
         if async:
             self.loop = asyncio.get_event_loop()
         else:
             self.loop = None
 
+        self.profiler = profiler
+        if profiler:
+            self._profile_transactions()
+            # per block callbacks: every call is timed
+            self._block_call = profiled_call(profiler, self._call)
+            self._observe = profiled_call(profiler, self._observe)
+
+    def _observe(self, method, *args):
+        """
+        Block level callbacks, never run on the loop
+        """
+        method(*args)
+
     def _notify_block(self, cur_block):
         for n in self.blocks_observers:
-            n.on_block(cur_block)
+            self._observe(n.on_block, cur_block)
 
-    def _notify_transaction(self, cur_tx, tx_observers, in_observers, out_observers):
-        for n in tx_observers:
-            if self.loop:
-                self.loop.run_until_complete(asyncio.coroutine(lambda: n.on_transaction(cur_tx))())
-            else:
-                n.on_transaction(cur_tx)
+    def _notify_block_columns(self, cur_block):
+        columns = BlockColumns.from_block(cur_block)
+        for n in self.columns_observers:
+            self._observe(n.on_block_columns, columns)
 
-        if len(in_observers) > 0:
-            for vin in cur_tx.vin:
-                for i_n in in_observers:
-                    if self.loop:
-                        self.loop.run_until_complete(asyncio.coroutine(lambda: i_n.on_input(vin))())
-                    else:
-                        i_n.on_input(vin)
+    def _notify_block_disconnected(self, cur_block):
+        for n in self.blocks_observers:
+            if hasattr(n, 'on_block_disconnected'):
+                self._observe(n.on_block_disconnected, cur_block)
 
-        if len(out_observers) > 0:
-            for vout in cur_tx.vout:
-                for o_n in out_observers:
-                    if self.loop:
-                        self.loop.run_until_complete(asyncio.coroutine(lambda: o_n.on_output(vout))())
-                    else:
-                        o_n.on_output(vout)
+    def _call(self, method, *args):
+        if self.loop:
+            self.loop.run_until_complete(asyncio.coroutine(method)(*args))
+        else:
+            method(*args)
+
+    def _notify_block_transactions(self, cur_block, txs, observers):
+        call = self._block_call if self.profiler else self._call
+        for n in observers:
+            call(n.on_block_transactions, cur_block, txs)
 
     def notify_transaction(self, cur_tx):
+        """
+        Observers with on_block_transactions are notified per block, by scan
+        """
         self._notify_transaction(
-            cur_tx, self.transactions_observers,
-            self.inputs_observers, self.outputs_observers
+            cur_tx, _split(self.transactions_observers, 'on_block_transactions')[0],
+            *_split_items_observers(self.inputs_observers, self.outputs_observers)
         )
 
+    @property
+    def observers(self):
+        """
+        Every registered observer, once, in a stable order (checkpoints refer to it)
+        """
+        observers = []
+        for n in self.blocks_observers + self.transactions_observers + self.inputs_observers + \
+                self.outputs_observers + self.columns_observers:
+            if not any(n is o for o in observers):
+                observers.append(n)
+        return observers
+
+    @property
+    def needs(self):
+        """
+        Fields read by the registered observers, for the factory needs option. None: every field
+        """
+        return needs_of(self.observers)
+
+    def _apply_needs(self):
+        """
+        Called as the scan starts, before the first block is generated
+        """
+        if self.factory is not None and hasattr(self.factory, 'needs') and self.factory.needs is None:
+            self.factory.needs = self.needs
+
+    def _timed_blocks(self):
+        """
+        blocks_generator, timing the fetch of every block in self._fetch_time
+        """
+        blocks = iter(self.blocks_generator)
+        while True:
+            s = perf_counter()
+            cur_block = next(blocks, None)
+            self._fetch_time = perf_counter() - s
+            if cur_block is None:
+                return
+            yield cur_block
+
+    def _check_checkpoint(self, cur_block):
+        if self.checkpoint.hash and cur_block.previousblockhash != self.checkpoint.hash:
+            raise ValueError('blocks do not follow the checkpoint', 'scan',
+                             'checkpoint: {}, block: {}'.format(self.checkpoint.hash, cur_block.hash))
+
     def scan(self):
         notify_tx = lambda: len(self.transactions_observers) > 0 \
             or len(self.inputs_observers) > 0 \
             or len(self.outputs_observers) > 0
 
-        notify_block = lambda: (len(self.blocks_observers) > 0 or notify_tx) and self.blocks_generator != None
+        notify_block = lambda: (len(self.blocks_observers) > 0 or len(self.columns_observers) > 0 or notify_tx()) \
+            and self.blocks_generator != None
 
         if notify_block():
-            for cur_block in self.blocks_generator:
-                self._notify_block(cur_block)
-                if notify_tx():
-                    for tx in cur_block.tx:
-                        self.notify_transaction(tx)
+            observers = self.observers
+            tx_observers, bulk_tx_observers = _split(self.transactions_observers, 'on_block_transactions')
+            in_observers, out_observers, bulk_in_observers, bulk_out_observers, \
+                filtered_in_observers, filtered_out_observers = \
+                _split_items_observers(self.inputs_observers, self.outputs_observers)
+            self._apply_needs()
+            if self.checkpoint:
+                self.checkpoint.restore(observers)
+            prev_block = None
+            completed = False
+            try:
+                for cur_block in self._timed_blocks() if self.profiler else self.blocks_generator:
+                    s = self.profiler and perf_counter()
+                    if isinstance(cur_block, BlockDisconnected):
+                        # follow mode reorg
+                        self._notify_block_disconnected(cur_block.block)
+                        continue
+                    if self.checkpoint and prev_block is None:
+                        self._check_checkpoint(cur_block)
+                    self._notify_block(cur_block)
+                    if self.columns_observers:
+                        self._notify_block_columns(cur_block)
+                    if notify_tx():
+                        txs = cur_block.tx
+                        if bulk_tx_observers:
+                            txs = list(txs)
+                            self._notify_block_transactions(cur_block, txs, bulk_tx_observers)
+                            if self.profiler and not tx_observers:
+                                self.profiler.count(transactions=len(txs))
+                        if tx_observers or in_observers or out_observers or bulk_in_observers or bulk_out_observers \
+                                or filtered_in_observers or filtered_out_observers:
+                            for tx in txs:
+                                self._notify_transaction(tx, tx_observers, in_observers, out_observers,
+                                                         bulk_in_observers, bulk_out_observers,
+                                                         filtered_in_observers, filtered_out_observers)
+                    prev_block = cur_block
+                    if self.checkpoint:
+                        self.checkpoint.block_done(cur_block, observers)
+                    if self.profiler:
+                        self.profiler.block_done(cur_block.height, self._fetch_time, perf_counter() - s)
+                if self.checkpoint and prev_block:
+                    self.checkpoint.save(prev_block, observers)
+                completed = True
+            finally:
+                if self.checkpoint:
+                    self.checkpoint.flush(raise_error=completed)
 
 class AsyncTaskException(Exception):
     def __init__(self, msg, method, params):
@@ -0,0 +1,134 @@
+import logging
+import os
+import pickle
+import threading
+
+logger = logging.getLogger('bitcoincrawler.checkpoint')
+
+
+class Checkpoint:
+    """
+    Last completed block (height, hash) and observers state of a scan, saved every `every` blocks.
+    Observers with get_state/set_state are snapshotted and restored, the others are skipped.
+    get_state() must return a snapshot (not the live structures): it is pickled by a background thread,
+    while the scan goes on.
+    Files are written to <path>.tmp, then renamed over path: a crash never leaves a partial checkpoint.
+
+    checkpoint = Checkpoint('scan.checkpoint', every=1000)
+    blocks = factory.generate_blocks(blockheight=checkpoint.next_height(default=0), stop_blockheight=370000)
+    BitcoinScanner(blocks, checkpoint=checkpoint).scan()
+    """
+    def __init__(self, path, every=1000):
+        self.path = path
+        self.every = every
+        self.__state = None
+        self.__loaded = False
+        self.__blocks = 0
+        self.__pending = None
+        self.__error = None
+        self.__cond = threading.Condition()
+        self.__writer = None
+
+    def load(self):
+        """
+        :return: {'height': .., 'hash': .., 'observers': {index: state}} or None without checkpoint
+        """
+        if not self.__loaded:
+            try:
+                with open(self.path, 'rb') as f:
+                    self.__state = pickle.load(f)
+            except FileNotFoundError:
+                self.__state = None
+            self.__loaded = True
+        return self.__state
+
+    @property
+    def height(self):
+        state = self.load()
+        return state and state['height']
+
+    @property
+    def hash(self):
+        state = self.load()
+        return state and state['hash']
+
+    def next_height(self, default=0):
+        """
+        :return: height to resume from, default without checkpoint
+        """
+        state = self.load()
+        return state['height'] + 1 if state else default
+
+    def restore(self, observers):
+        state = self.load()
+        if not state:
+            return
+        for i, observer in enumerate(observers):
+            if i in state['observers'] and hasattr(observer, 'set_state'):
+                observer.set_state(state['observers'][i])
+
+    def block_done(self, block, observers):
+        """
+        Called by the scanner once a block has been notified to every observer.
+        """
+        self.__blocks += 1
+        if not self.__blocks % self.every:
+            self.save(block, observers)
+
+    def save(self, block, observers):
+        state = {'height': block.height,
+                 'hash': block.hash,
+                 'observers': {i: observer.get_state() for i, observer in enumerate(observers)
+                               if hasattr(observer, 'get_state')}}
+        self.__state, self.__loaded = state, True
+        with self.__cond:
+            self.__raise()
+            self.__pending = state
+            if not self.__writer:
+                self.__writer = threading.Thread(target=self.__write_loop, daemon=True)
+                self.__writer.start()
+            self.__cond.notify()
+
+    def flush(self, raise_error=True):
+        """
+        Waits for the pending write, if any.
+        :param raise_error: False when the scan failed: a write error is logged, the scan error is the one raised
+        """
+        with self.__cond:
+            while self.__pending is not None and self.__writer.is_alive():
+                self.__cond.wait()
+            if raise_error:
+                self.__raise()
+            elif self.__error:
+                error, self.__error = self.__error, None
+                logger.error('checkpoint write failed: %s', error, exc_info=error)
+
+    def __raise(self):
+        if self.__error:
+            error, self.__error = self.__error, None
+            raise error
+
+    def __write_loop(self):
+        while True:
+            with self.__cond:
+                while self.__pending is None:
+                    self.__cond.wait()
+                state = self.__pending
+            try:
+                self._write(state)
+            except Exception as e:
+                with self.__cond:
+                    self.__error = e
+            with self.__cond:
+                # a newer state may have been queued during the write
+                if self.__pending is state:
+                    self.__pending = None
+                self.__cond.notify_all()
+
+    def _write(self, state):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+COIN = 100000000
+# bitcoind json fields carrying BTC amounts
+AMOUNT_FIELDS = ('value', 'fee', 'modifiedfee')
+
+
+class Satoshis(int):
+    """
+    An amount in satoshis, as parsed by BitcoinCli(amounts_as_satoshis=True): the AMOUNT_FIELDS of the json
+    objects, other floats (difficulty, ...) stay Decimals.
+    """
+    __slots__ = ()
+
+
+def btc_to_satoshis(value):
+    """
+    :param value: BTC amount, Decimal, int, str or float (rounded to the nearest satoshi)
+    """
+    return int(Decimal(value).scaleb(8).to_integral_value())
+
+
+def satoshis_to_btc(value):
+    """
+    :return: Decimal with 8 decimal places
+    """
+    return Decimal(value).scaleb(-8)
+
+
+def satoshis_hook(obj):
+    """
+    json object_hook, with parse_float=Decimal: BTC amounts to exact Satoshis.
+    Values with more than 8 decimals can't be amounts: they stay Decimals.
+    """
+    for field in AMOUNT_FIELDS:
+        if field in obj:
+            value = obj[field]
+            if isinstance(value, Decimal):
+                scaled = value.scaleb(8)
+                if scaled == scaled.to_integral_value():
+                    obj[field] = Satoshis(scaled)
+            elif isinstance(value, int) and not isinstance(value, (Satoshis, bool)):
+                obj[field] = Satoshis(value * COIN)
+    return obj
@@ -1,4 +1,34 @@
 class BaseFactory:
+    @staticmethod
+    def _check_boundaries(blockhash=None,
+                          blockheight=None,
+                          stop_blockhash=None,
+                          stop_blockheight=None,
+                          max_iterations=None):
+        if ((stop_blockheight and stop_blockhash) or (stop_blockheight and max_iterations) or (stop_blockhash and max_iterations)):
+            raise ValueError('specify at most one stop condition',
+                             'blocks_from',
+                             'stop_hash: {}, stop_height: {}, max_iterations: {}'.format(stop_blockhash,
+                                                                                         stop_blockheight,
+                                                                                         max_iterations))
+
+        if blockhash and blockheight != None or (not blockhash and blockheight == None):
+            raise ValueError('specify only one (and at least) start condition',
+                             'blocks_from',
+                             'hash: {}, height: {}'.format(blockhash, blockheight))
+
+    @staticmethod
+    def _stop_check(stop_blockhash=None, stop_blockheight=None, max_iterations=None):
+        """
+        :return: f(iteration, block, previous block hash), True when the block must not be produced
+        """
+        if stop_blockheight:
+            return lambda i, block, prev_hash: block.height > stop_blockheight
+        elif max_iterations:
+            return lambda i, block, prev_hash: i >= max_iterations
+        else:
+            return lambda i, block, prev_hash: prev_hash and (prev_hash == stop_blockhash)
+
     def _get_transaction(self, txid):
         raise NotImplementedError()
 
@@ -8,6 +38,13 @@ class BaseFactory:
     def get_transactions(self, txs):
         raise NotImplementedError()
 
+    def get_transactions_async(self, txs, parent_block=None):
+        """
+        Coroutine, get_transactions on the running event loop (AsyncBitcoinScanner)
+        :return: list of transactions
+        """
+        raise NotImplementedError()
+
     def generate_blocks(self,
                         blockhash=None,
                         blockheight=None,
@@ -16,6 +53,17 @@ class BaseFactory:
                         max_iterations=None):
         raise NotImplementedError()
 
+    def generate_blocks_async(self,
+                              blockhash=None,
+                              blockheight=None,
+                              stop_blockhash=None,
+                              stop_blockheight=None,
+                              max_iterations=None):
+        """
+        generate_blocks as an async iterator, for AsyncBitcoinScanner
+        """
+        raise NotImplementedError()
+
 
 class AdapterFactory(BaseFactory):
     def __init__(self, txs_factory, blocks_factory):
@@ -31,6 +79,9 @@ class AdapterFactory(BaseFactory):
     def get_transactions(self, txs):
         return self.t.get_transactions(txs)
 
+    def get_transactions_async(self, txs, parent_block=None):
+        return self.t.get_transactions_async(txs, parent_block=parent_block)
+
     def generate_blocks(self, blockhash=None,
                         blockheight=None,
                         stop_blockhash=None,
@@ -3,36 +3,130 @@ from bitcoincrawler.components.bitcoind.exceptions.client import BitcoinCliExcep
 
 import base64
 import asyncio
+import threading
 import requests
 import json
 from decimal import Decimal
 
+from bitcoincrawler.components.amounts import satoshis_hook
 from bitcoincrawler.components.tools import chain
 import aiohttp
-from requests.exceptions import ConnectionError
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
 
 class BitcoinCli:
     """
     bitcoind v0.11
+    Connections are pooled and kept alive, both with sync (requests) and async (aiohttp) transports:
+    close() the client (or use it as a context manager) when done.
+    Async calls run on the event loop of the calling thread, each loop with its own aiohttp session and
+    async_limit (PipelinedScanner parse workers have a loop each).
     """
-    def __init__(self, btcd_user, btcd_password, btcd_url, network="main", async=False, async_limit=100):
+    def __init__(self, btcd_user, btcd_password, btcd_url, network="main", async=False, async_limit=100,
+                 pool_size=None, keep_alive=30, timeout=None, amounts_as_satoshis=False):
+        """
+        :param pool_size: max pooled connections. Defaults to 10 (sync) and async_limit (async)
+        :param keep_alive: seconds an idle async connection is kept open, 0 or None disables keep-alive
+        :param timeout: seconds, applies to connect and read. None waits forever
+        :param amounts_as_satoshis: amounts (vout value, mempool fees) are parsed as int Satoshis instead of
+                                    BTC Decimals, other floats (difficulty) stay Decimals
+        """
         self.btcd_url = btcd_url
         btcd_authpair = bytes(btcd_user.encode("utf-8")) + b":" + bytes(btcd_password.encode("utf-8"))
         self.btcd_auth_header = b"Basic " + base64.b64encode(btcd_authpair)
         self.btcd_auth_header_async = "Basic " + base64.b64encode(btcd_authpair).decode('utf-8')
         self.network = network
-        if async and async_limit:
-            self.async_lock = asyncio.Semaphore(async_limit)
+        self.async_limit = async_limit
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.amounts_as_satoshis = amounts_as_satoshis
+        self.__json_options = {'parse_float': Decimal}
+        if amounts_as_satoshis:
+            self.__json_options['object_hook'] = satoshis_hook
+        self.session = self.__requests_session()
+        self.__loops_lock = threading.Lock()
+        # event loop: (aiohttp session, semaphore or None)
+        self.__loops = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.session.close()
+        with self.__loops_lock:
+            for session, lock in self.__loops.values():
+                session.close()
+            self.__loops.clear()
+
+    def __requests_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size or 10)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({"content-type": "application/json", "Authorization": self.btcd_auth_header})
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def __loop_resources(self):
+        """
+        (aiohttp session, semaphore) of the current event loop, built on first use since they're bound to it.
+        Resources of closed loops are released.
+        """
+        loop = asyncio.get_event_loop()
+        with self.__loops_lock:
+            for closed in [l for l in self.__loops if l.is_closed()]:
+                self.__loops.pop(closed)[0].close()
+            resources = self.__loops.get(loop)
+            if resources is None or resources[0].closed:
+                connector = aiohttp.TCPConnector(limit=self.pool_size or self.async_limit,
+                                                 conn_timeout=self.timeout,
+                                                 keepalive_timeout=self.keep_alive or 0,
+                                                 force_close=not self.keep_alive,
+                                                 loop=loop)
+                resources = self.__loops[loop] = (
+                    aiohttp.ClientSession(connector=connector, loop=loop),
+                    asyncio.Semaphore(self.async_limit, loop=loop) if self.async_limit else None)
+        return resources
+
+    @property
+    def aiohttp_session(self):
+        """
+        Session of the current event loop
+        """
+        return self.__loop_resources()[0]
+
+    @property
+    def async_lock(self):
+        """
+        Semaphore of the current event loop, None without async_limit
+        """
+        return self.__loop_resources()[1]
 
     def call(self, method, *params, async=False):
         try:
             return self.__call(method, *params, async=async)
-        except ConnectionError:
-            raise BitcoinCliException('', '', '')
+        except (ConnectionError, Timeout) as e:
+            raise BitcoinCliException(e, method, params)
+
+    def call_batch(self, calls, async=False):
+        """
+        JSON-RPC batch: a single POST for many calls.
+        :param calls: iterable of (method, params) tuples
+        :return: responses list, same order of calls. Errors are per-item, it's up to the caller to check them.
+        """
+        try:
+            return self.__call_batch(calls, async=async)
+        except (ConnectionError, Timeout) as e:
+            raise BitcoinCliException(e, 'batch', calls)
 
     def __parse_res(self, r, method, params):
         try:
-            r = json.loads(r, parse_float=Decimal)
+            r = json.loads(r, **self.__json_options)
             if isinstance(r, dict) and r.get('error'):
                 raise BitcoinCliException(r["error"], method, params)
             elif isinstance(r, list) and method == 'getrawmempool':
@@ -41,16 +135,45 @@ class BitcoinCli:
         except ValueError as e:
             raise BitcoinCliException(e, method, params)
 
+    def __parse_batch_res(self, r, calls):
+        try:
+            r = json.loads(r, **self.__json_options)
+        except ValueError as e:
+            raise BitcoinCliException(e, 'batch', calls)
+        if isinstance(r, dict):
+            raise BitcoinCliException(r.get('error'), 'batch', calls)
+        responses = {res.get('id'): res for res in r}
+        try:
+            return [responses[i] for i in range(0, len(calls))]
+        except KeyError as e:
+            raise BitcoinCliException('missing response for id {}'.format(e), 'batch', calls)
+
     @asyncio.coroutine
-    def __aiohttp_routine(self, payload):
+    def __aiohttp_post(self, session, payload):
         btcd_headers = {"content-type": "application/json", "Authorization": self.btcd_auth_header_async}
-        with(yield from self.async_lock):
-            r = yield from aiohttp.request('POST', self.btcd_url,
-                                                   data=json.dumps(payload),
-                                                   headers=btcd_headers)
-            r = yield from r.text()
+        r = yield from session.post(self.btcd_url,
+                                    data=json.dumps(payload),
+                                    headers=btcd_headers)
+        return (yield from r.text())
+
+    @asyncio.coroutine
+    def __aiohttp_routine(self, payload, parse):
+        session, lock = self.__loop_resources()
+        if lock is not None:
+            yield from lock.acquire()
+        try:
+            r = yield from asyncio.wait_for(self.__aiohttp_post(session, payload), self.timeout)
+        except (aiohttp.errors.ClientError, aiohttp.errors.DisconnectedError, asyncio.TimeoutError) as e:
+            raise BitcoinCliException(e, 'async', payload)
+        finally:
+            if lock is not None:
+                lock.release()
+        return parse(r)
 
-            return self.__parse_res(r, payload['method'], payload['params'])
+    def __post(self, payload):
+        return self.session.post(self.btcd_url,
+                                 data=json.dumps(payload),
+                                 timeout=self.timeout).text
 
     def __call(self, method, *params, async=False):
         payload = {
@@ -59,15 +182,36 @@ class BitcoinCli:
             "jsonrpc": "2.0",
             "id": 0,
         }
+        parse = lambda res: self.__parse_res(res, method, params)
         if async:
-            return self.__aiohttp_routine(payload)
+            return self.__aiohttp_routine(payload, parse)
         else:
-            btcd_headers = {"content-type": "application/json", "Authorization": self.btcd_auth_header}
-            res = requests.post(self.btcd_url,
-                                data=json.dumps(payload),
-                                headers=btcd_headers).text
-            return self.__parse_res(res, method, params)
-    
+            return parse(self.__post(payload))
+
+    def __call_batch(self, calls, async=False):
+        calls = [(method, tuple(params)) for method, params in calls]
+        payload = [{"method": method,
+                    "params": params,
+                    "jsonrpc": "2.0",
+                    "id": i} for i, (method, params) in enumerate(calls)]
+        parse = lambda res: self.__parse_batch_res(res, calls)
+        if async:
+            return self.__aiohttp_routine(payload, parse)
+        else:
+            return parse(self.__post(payload))
+
+    def __check_batch_errors(self, responses, method, params, not_found=None, not_found_code=-5):
+        """
+        bitcoind answers a batch even if some calls failed: raise on the first failed item.
+        """
+        for res, param in zip(responses, params):
+            error = res.get('error')
+            if error:
+                if not_found and isinstance(error, dict) and error.get('code') == not_found_code:
+                    raise not_found(error, method, param)
+                raise BitcoinCliException(error, method, param)
+        return responses
+
     def get_raw_transaction(self, txid, async=False):
         try:
             if async:
@@ -87,16 +231,74 @@ class BitcoinCli:
         else:
             return self.call("decoderawtransaction", raw_transaction)
 
-    def get_block(self, block_hash):
+    def get_raw_transactions(self, txids, async=False):
+        """
+        Batched getrawtransaction, raises TransactionNotFound for the first unknown txid.
+        """
+        txids = list(txids)
+        check = lambda res: self.__check_batch_errors(res, 'getrawtransaction', txids,
+                                                       not_found=TransactionNotFound)
+        calls = [("getrawtransaction", (txid,)) for txid in txids]
+        if async:
+            return chain(calls,
+                         lambda calls: self.call_batch(calls, async=async),
+                         asyncio.coroutine(check))
+        else:
+            return check(self.call_batch(calls))
+
+    def decode_raw_transactions(self, raw_transactions, async=False):
+        """
+        Batched decoderawtransaction
+        """
+        raw_transactions = list(raw_transactions)
+        check = lambda res: self.__check_batch_errors(res, 'decoderawtransaction', raw_transactions)
+        calls = [("decoderawtransaction", (rawtx,)) for rawtx in raw_transactions]
+        if async:
+            return chain(calls,
+                         lambda calls: self.call_batch(calls, async=async),
+                         asyncio.coroutine(check))
+        else:
+            return check(self.call_batch(calls))
+
+    @asyncio.coroutine
+    def __not_found(self, call, not_found, code, method, param):
+        """
+        Result of call (an async rpc), its error `code` raised as not_found
+        """
+        try:
+            return (yield from call)
+        except BitcoinCliException as btcde:
+            if isinstance(btcde.msg, dict) and btcde.msg.get('code') == code:
+                raise not_found(btcde.msg, method, param)
+            raise
+
+    def get_block(self, block_hash, verbosity=None, async=False):
+        """
+        :param verbosity: None for the node default (decoded block with txids). 2 embeds decoded
+                          transactions (bitcoind >= 0.15), False (or 0) returns the serialized block.
+        """
+        params = (block_hash,) if verbosity is None else (block_hash, verbosity)
+        if async:
+            return self.__not_found(self.call("getblock", *params, async=True), BlockNotFound, -5,
+                                    'getblock', block_hash)
         try:
-            return self.call("getblock", block_hash)
+            return self.call("getblock", *params)
         except BitcoinCliException as btcde:
-            if btcde.msg.get('code') == -5:
+            if isinstance(btcde.msg, dict) and btcde.msg.get('code') == -5:
                 raise BlockNotFound(btcde.msg, 'getblock', block_hash)
             else:
                 raise btcde
 
-    def get_block_hash(self, block_height):
+    def get_raw_block(self, block_hash, async=False):
+        """
+        getblock <hash> false: the serialized block, hex encoded
+        """
+        return self.get_block(block_hash, verbosity=False, async=async)
+
+    def get_block_hash(self, block_height, async=False):
+        if async:
+            return self.__not_found(self.call("getblockhash", block_height, async=True), BlockNotFound, -8,
+                                    'getblockhash', block_height)
         try:
             return self.call("getblockhash", block_height)
         except BitcoinCliException as btcde:
@@ -108,5 +310,47 @@ class BitcoinCli:
             except AttributeError:
                 raise btcde
 
+    def get_block_count(self):
+        return self.call("getblockcount")
+
+    def get_block_hashes(self, block_heights):
+        """
+        Batched getblockhash, raises BlockNotFound for the first height out of range.
+        """
+        block_heights = list(block_heights)
+        calls = [("getblockhash", (block_height,)) for block_height in block_heights]
+        return self.__check_batch_errors(self.call_batch(calls), 'getblockhash', block_heights,
+                                         not_found=BlockNotFound, not_found_code=-8)
+
+    def get_block_header(self, block_hash):
+        """
+        getblockheader (bitcoind >= 0.12): getblock fields, without tx and size
+        """
+        try:
+            return self.call("getblockheader", block_hash)
+        except BitcoinCliException as btcde:
+            if isinstance(btcde.msg, dict) and btcde.msg.get('code') == -5:
+                raise BlockNotFound(btcde.msg, 'getblockheader', block_hash)
+            else:
+                raise btcde
+
+    def get_block_headers(self, block_hashes):
+        """
+        Batched getblockheader, raises BlockNotFound for the first unknown hash.
+        """
+        block_hashes = list(block_hashes)
+        calls = [("getblockheader", (block_hash,)) for block_hash in block_hashes]
+        return self.__check_batch_errors(self.call_batch(calls), 'getblockheader', block_hashes,
+                                         not_found=BlockNotFound)
+
+    def wait_for_new_block(self, timeout=0):
+        """
+        waitfornewblock (bitcoind >= 0.14): long-polls until the tip changes.
+        The http timeout of the cli, if any, must be longer.
+        :param timeout: seconds, 0 waits forever
+        :return: {'hash': .., 'height': ..} of the tip
+        """
+        return self.call("waitfornewblock", int(timeout * 1000))
+
     def get_raw_mempool(self):
         return self.call("getrawmempool")
@@ -0,0 +1,6 @@
+from bitcoincrawler.components.exceptions import CrawlerException
+
+
+class ReorgTooDeep(CrawlerException):
+    def __init__(self, msg, method, params):
+        super(ReorgTooDeep, self).__init__(msg, method, params)
@@ -1,19 +1,32 @@
 import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from bitcoincrawler.components.base_factory import BaseFactory
-from bitcoincrawler.components.bitcoind.model import BTCDBlock, BTCDTransaction
-from bitcoincrawler.components.tools import chain
+from bitcoincrawler.components.bitcoind.exceptions.client import BitcoinCliException, BlockNotFound
+from bitcoincrawler.components.bitcoind.exceptions.factory import ReorgTooDeep
+from bitcoincrawler.components.model import BlockDisconnected
+from bitcoincrawler.components.bitcoind.model import BTCDBlock, BTCDBlockHeader, BTCDTransaction
+from bitcoincrawler.components.tools import AsyncIterator, chain, chunks
 
 
 class BitcoindFactory(BaseFactory):
-    def __init__(self, bitcoind_cli, async=False):
+    def __init__(self, bitcoind_cli, async=False, batch_size=None, prefetch=0, prefetch_bytes=64 * 2 ** 20):
         """
         :param bitcoind_cli:
+        :param batch_size: if set, transactions are fetched with JSON-RPC batches of batch_size calls
+        :param prefetch: generate_blocks fetches up to prefetch following blocks (by height) in background
+                         threads while the current one is consumed. Keep it within the cli pool_size.
+        :param prefetch_bytes: stop reading ahead when the fetched, not yet consumed, blocks are this big
         :return:
         """
         self.btcd = bitcoind_cli
         self.async = async
         self.network = bitcoind_cli.network
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.prefetch_bytes = prefetch_bytes
 
     def get_mempool_transactions(self, limit=None):
         mempool = self.btcd.get_raw_mempool().get('result')
@@ -32,20 +45,107 @@ class BitcoindFactory(BaseFactory):
             json_obj = self.btcd.decode_raw_transaction(rawtx.get('result'))
             return BTCDTransaction(json_obj.get('result'))
 
+    def _get_transactions_batch(self, txids, parent_block=None):
+        meta = {'parent_block': parent_block}
+        build = lambda json_objs: [BTCDTransaction(json_obj.get('result'), meta=meta) for json_obj in json_objs]
+        if self.async:
+            return chain(txids,
+                         lambda txids: self.btcd.get_raw_transactions(txids, async=True),
+                         lambda rawtxs: self.btcd.decode_raw_transactions([r.get('result') for r in rawtxs],
+                                                                          async=True),
+                         asyncio.coroutine(build))
+        else:
+            rawtxs = self.btcd.get_raw_transactions(txids)
+            return build(self.btcd.decode_raw_transactions([r.get('result') for r in rawtxs]))
+
     def get_transactions(self, txs, parent_block=None):
         if self.async:
             loop = asyncio.get_event_loop()
-            tasks = (self._get_transaction(tx, parent_block=parent_block) for tx in txs)
-            return loop.run_until_complete(asyncio.gather(*tasks))
-        else:
-            return (self._get_transaction(tx) for tx in txs)
+            return loop.run_until_complete(self.get_transactions_async(txs, parent_block=parent_block))
+        if self.batch_size:
+            return (tx for batch in chunks(txs, self.batch_size)
+                    for tx in self._get_transactions_batch(batch, parent_block=parent_block))
+        return (self._get_transaction(tx) for tx in txs)
+
+    @asyncio.coroutine
+    def get_transactions_async(self, txs, parent_block=None):
+        """
+        With async, the rpcs are awaited on the running loop. Otherwise they block it.
+        """
+        if not self.async:
+            return list(self.get_transactions(txs, parent_block=parent_block))
+        if self.batch_size:
+            batches = yield from asyncio.gather(*(self._get_transactions_batch(batch, parent_block=parent_block)
+                                                  for batch in chunks(txs, self.batch_size)))
+            return [tx for batch in batches for tx in batch]
+        return (yield from asyncio.gather(*(self._get_transaction(tx, parent_block=parent_block) for tx in txs)))
+
+    def _fetch_block_at(self, blockheight, fetch):
+        """
+        :return: fetch(hash of the block at blockheight), None beyond the tip
+        """
+        try:
+            blockhash = self.btcd.get_block_hash(blockheight).get('result')
+        except BlockNotFound:
+            return None
+        return fetch(blockhash) if blockhash else None
+
+    def _blocks_from_height(self, blockheight, fetch, size, last_height=None):
+        """
+        fetch(blockhash) results for the blocks from blockheight on, in order. Stops at the tip, or after last_height.
+        With prefetch, fetches run ahead in up to self.prefetch threads.
+        :param size: f(fetch result) -> bytes, buffered results are capped by self.prefetch_bytes
+        """
+        if not self.prefetch:
+            def blocks(blockheight):
+                while last_height is None or blockheight <= last_height:
+                    block = self._fetch_block_at(blockheight, fetch)
+                    if block is None:
+                        return
+                    yield block
+                    blockheight += 1
+            return blocks(blockheight)
+        executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        window = deque()
+
+        def buffered():
+            return sum(size(f.result()) for f in window if f.done() and not f.exception() and f.result())
+
+        def refill(next_height):
+            while len(window) < self.prefetch and (last_height is None or next_height <= last_height):
+                if window and buffered() >= self.prefetch_bytes:
+                    break
+                window.append(executor.submit(self._fetch_block_at, next_height, fetch))
+                next_height += 1
+            return next_height
+
+        def blocks(next_height):
+            try:
+                next_height = refill(next_height)
+                yield
+                while window:
+                    block = window.popleft().result()
+                    if block is None:
+                        return
+                    next_height = refill(next_height)
+                    yield block
+            finally:
+                for f in window:
+                    f.cancel()
+                executor.shutdown(wait=False)
+
+        # started right away: fetches overlap with the consumer work on the current block
+        following = blocks(blockheight)
+        next(following)
+        return following
 
     def generate_blocks(self, blockhash=None,
                         blockheight=None,
                         stop_blockhash=None,
                         stop_blockheight=None,
                         max_iterations=None,
-                        txs_factory=None):
+                        txs_factory=None,
+                        decoded_txs=False):
         """
         A starting point is mandatory. Only one can be specified.
         Stop point is optional. Only one can be specified.
@@ -55,52 +155,248 @@ class BitcoindFactory(BaseFactory):
         :param stop_blockheight: stop point (block height)
         :param max_iterations: stop point (see this as "how many blocks I want to generate?")
         :param txs_factory: atm reserved to the adapter, if used # FIXME - review
-        :return: BTCDBlock objects generator
+        :param decoded_txs: blocks are fetched with getblock <hash> 2 (bitcoind >= 0.15), transactions
+                            come decoded within the block: no rpc at all for block.tx, txs_factory is unused.
+        :return: BTCDBlock objects generator. With prefetch, following blocks are resolved by height:
+                 the generator stops if they do not chain to the produced ones (reorg), as it does
+                 when the produced block is no longer in the main chain (no nextblockhash).
         """
-        if ((stop_blockheight and stop_blockhash) or (stop_blockheight and max_iterations) or (stop_blockhash and max_iterations)):
-            raise ValueError('specify at most one stop condition',
-                             'blocks_from',
-                             'stop_hash: {}, stop_height: {}, max_iterations: {}'.format(stop_blockhash,
-                                                                                         stop_blockheight,
-                                                                                         max_iterations))
-
-        if blockhash and blockheight != None or (not blockhash and blockheight == None):
-            raise ValueError('specify only one (and at least) start condition',
-                             'blocks_from',
-                             'hash: {}, height: {}'.format(blockhash, blockheight))
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
 
         def generator(blockhash=None,
                       blockheight=None,
                       stop_blockhash=None,
                       stop_blockheight=None,
                       max_iterations=None,
-                      txs_factory=None):
+                      txs_factory=None,
+                      decoded_txs=False):
             prev_hash = None
-            if stop_blockheight:
-                stop_check = lambda i, block: block.height > stop_blockheight
-            elif max_iterations:
-                stop_check = lambda i, block: i>= max_iterations
-            else:
-                stop_check = lambda i, block: prev_hash and (prev_hash == stop_blockhash)
+            stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                          stop_blockheight=stop_blockheight,
+                                          max_iterations=max_iterations)
             i = 0
 
+            if decoded_txs:
+                fetch = lambda blockhash: self.btcd.get_block(blockhash, verbosity=2).get('result')
+            else:
+                fetch = lambda blockhash: self.btcd.get_block(blockhash).get('result')
             blockhash = self.btcd.get_block_hash(blockheight).get('result') if not blockhash else blockhash
             print('producing blocks...')
-            while True:
-                jsonblock = self.btcd.get_block(blockhash).get('result')
-                block = BTCDBlock(jsonblock, self if not txs_factory else txs_factory)
-                if stop_check(i, block):
-                    break
-                yield block
-                prev_hash = block.hash
-                blockhash = block.nextblockhash
-                if not blockhash:
-                    break
-                i += 1
+            jsonblock = fetch(blockhash)
+            following = None
+            if self.prefetch:
+                if stop_blockheight:
+                    last_height = stop_blockheight
+                elif max_iterations:
+                    last_height = jsonblock['height'] + max_iterations - 1
+                else:
+                    last_height = None
+                following = self._blocks_from_height(jsonblock['height'] + 1, fetch,
+                                                     lambda jsonblock: jsonblock.get('size', 0),
+                                                     last_height=last_height)
+            try:
+                while True:
+                    block = BTCDBlock(jsonblock, self if not txs_factory else txs_factory)
+                    if stop_check(i, block, prev_hash):
+                        break
+                    yield block
+                    prev_hash = block.hash
+                    if following is not None:
+                        jsonblock = next(following, None)
+                        if not jsonblock or jsonblock.get('previousblockhash') != prev_hash:
+                            break
+                    else:
+                        blockhash = block.nextblockhash
+                        if not blockhash:
+                            break
+                        jsonblock = fetch(blockhash)
+                    i += 1
+            finally:
+                if following is not None:
+                    following.close()
 
         return generator(blockhash=blockhash,
                          blockheight=blockheight,
                          stop_blockhash=stop_blockhash,
                          stop_blockheight=stop_blockheight,
                          max_iterations=max_iterations,
-                         txs_factory=txs_factory)
\ No newline at end of file
+                         txs_factory=txs_factory,
+                         decoded_txs=decoded_txs)
+
+    def generate_blocks_async(self, blockhash=None,
+                              blockheight=None,
+                              stop_blockhash=None,
+                              stop_blockheight=None,
+                              max_iterations=None,
+                              txs_factory=None,
+                              decoded_txs=False):
+        """
+        Same boundaries of generate_blocks, for AsyncBitcoinScanner: getblockhash and getblock are awaited on
+        the running loop (no prefetch), and so are the block.transactions_async() rpcs with an async factory.
+        :return: BTCDBlock objects async iterator
+        """
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
+        stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                      stop_blockheight=stop_blockheight,
+                                      max_iterations=max_iterations)
+        verbosity = 2 if decoded_txs else None
+        prev_hash, i, done = None, 0, False
+
+        @asyncio.coroutine
+        def next_block():
+            nonlocal blockhash, prev_hash, i, done
+            if done:
+                return None
+            if not blockhash:
+                blockhash = (yield from self.btcd.get_block_hash(blockheight, async=True)).get('result')
+            jsonblock = (yield from self.btcd.get_block(blockhash, verbosity=verbosity, async=True)).get('result')
+            block = BTCDBlock(jsonblock, txs_factory or self)
+            if stop_check(i, block, prev_hash):
+                done = True
+                return None
+            prev_hash, blockhash = block.hash, block.nextblockhash
+            done = not blockhash
+            i += 1
+            return block
+
+        return AsyncIterator(next_block)
+
+    def generate_headers(self, blockhash=None,
+                         blockheight=None,
+                         stop_blockhash=None,
+                         stop_blockheight=None,
+                         max_iterations=None,
+                         batch_size=100):
+        """
+        Same boundaries of generate_blocks, header only blocks (time, bits, difficulty, chainwork...):
+        getblockhash and getblockheader (bitcoind >= 0.12) are JSON-RPC batches of batch_size calls,
+        and block.tx is not available.
+        :return: BTCDBlockHeader objects generator
+        """
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
+
+        def generator(blockhash=None,
+                      blockheight=None,
+                      stop_blockhash=None,
+                      stop_blockheight=None,
+                      max_iterations=None):
+            prev_hash = None
+            stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                          stop_blockheight=stop_blockheight,
+                                          max_iterations=max_iterations)
+            i = 0
+            if blockheight is None:
+                blockheight = self.btcd.get_block_header(blockhash).get('result')['height']
+            if stop_blockheight:
+                last_height = stop_blockheight
+            elif max_iterations:
+                last_height = blockheight + max_iterations - 1
+            else:
+                last_height = None
+            tip = self.btcd.get_block_count().get('result')
+            while True:
+                if blockheight > tip:
+                    # the chain may have grown meanwhile
+                    tip = self.btcd.get_block_count().get('result')
+                    if blockheight > tip:
+                        return
+                stop = min(tip, last_height) if last_height is not None else tip
+                heights = range(blockheight, min(blockheight + batch_size - 1, stop) + 1)
+                if not heights:
+                    return
+                hashes = [res.get('result') for res in self.btcd.get_block_hashes(heights)]
+                for header in self.btcd.get_block_headers(hashes):
+                    block = BTCDBlockHeader(header.get('result'))
+                    if stop_check(i, block, prev_hash) or (prev_hash and block.previousblockhash != prev_hash):
+                        return
+                    yield block
+                    prev_hash = block.hash
+                    i += 1
+                blockheight = heights[-1] + 1
+
+        return generator(blockhash=blockhash,
+                         blockheight=blockheight,
+                         stop_blockhash=stop_blockhash,
+                         stop_blockheight=stop_blockheight,
+                         max_iterations=max_iterations)
+
+    def follow_blocks(self, blockhash=None,
+                      blockheight=None,
+                      reorg_window=12,
+                      poll_interval=1.0,
+                      max_poll_interval=30.0,
+                      long_poll=True,
+                      txs_factory=None,
+                      decoded_txs=False):
+        """
+        Like generate_blocks without stop point: at the tip it waits for new blocks, forever.
+        Every new block is checked against the last produced one (previousblockhash): on reorgs
+        BlockDisconnected(block) items are produced for the blocks leaving the main chain, newest first,
+        then the blocks of the new main chain.
+        :param reorg_window: produced blocks kept to handle reorgs, a deeper reorg raises ReorgTooDeep
+        :param long_poll: wait with waitfornewblock (bitcoind >= 0.14), up to max_poll_interval seconds.
+                          Without it (or if the node lacks it) the tip is polled every poll_interval seconds,
+                          doubling up to max_poll_interval while no block comes.
+        :return: BTCDBlock and BlockDisconnected objects generator
+        """
+        self._check_boundaries(blockhash=blockhash, blockheight=blockheight)
+        if decoded_txs:
+            fetch = lambda blockhash: BTCDBlock(self.btcd.get_block(blockhash, verbosity=2).get('result'),
+                                                txs_factory or self)
+        else:
+            fetch = lambda blockhash: BTCDBlock(self.btcd.get_block(blockhash).get('result'), txs_factory or self)
+
+        def block_hash_at(blockheight):
+            try:
+                return self.btcd.get_block_hash(blockheight).get('result')
+            except BlockNotFound:
+                return None
+
+        def generator(blockhash, blockheight, long_poll):
+            recent = deque(maxlen=reorg_window)
+            blockhash = self.btcd.get_block_hash(blockheight).get('result') if not blockhash else blockhash
+            block = fetch(blockhash)
+            recent.append(block)
+            yield block
+            delay = poll_interval
+            while True:
+                tip = recent[-1]
+                blockhash = block_hash_at(tip.height + 1)
+                if blockhash:
+                    block = fetch(blockhash)
+                    if block.previousblockhash == tip.hash:
+                        recent.append(block)
+                        delay = poll_interval
+                        yield block
+                        continue
+                elif block_hash_at(tip.height) == tip.hash:
+                    if long_poll:
+                        try:
+                            self.btcd.wait_for_new_block(max_poll_interval)
+                            continue
+                        except BitcoinCliException as btcde:
+                            if not (isinstance(btcde.msg, dict) and btcde.msg.get('code') == -32601):
+                                raise
+                            long_poll = False
+                    time.sleep(delay)
+                    delay = min(delay * 2, max_poll_interval)
+                    continue
+                while recent and block_hash_at(recent[-1].height) != recent[-1].hash:
+                    yield BlockDisconnected(recent.pop())
+                if not recent:
+                    raise ReorgTooDeep('reorg deeper than {} blocks'.format(reorg_window),
+                                       'follow_blocks', tip.hash)
+
+        return generator(blockhash, blockheight, long_poll)
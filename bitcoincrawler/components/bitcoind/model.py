@@ -1,11 +1,24 @@
-from bitcoincrawler.components.model import Block, Transaction, Vin, Vout
+import asyncio
+
+from bitcoincrawler.components.amounts import Satoshis, btc_to_satoshis, satoshis_to_btc
+from bitcoincrawler.components.model import Block, Transaction, Vin, Vout, ScriptSig, ScriptPubKey
 
 
 class BTCDBlock(Block):
+    __slots__ = ('__json_obj', '__txs_factory')
+
     def __init__(self, json_obj, txs_factory):
+        """
+        json_obj is a getblock result: with verbosity 2 the tx array holds decoded transactions,
+        then txs_factory is not used at all.
+        """
         self.__json_obj = json_obj
         self.__txs_factory = txs_factory
 
+    def __decoded_txs(self):
+        txs = self.__json_obj.get('tx')
+        return bool(txs) and isinstance(txs[0], dict)
+
     @property
     def json(self):
         return self.__json_obj
@@ -32,15 +45,27 @@ class BTCDBlock(Block):
 
     @property
     def tx(self):
+        if self.__decoded_txs():
+            meta = {'parent_block': self.__json_obj['hash']}
+            return (BTCDTransaction(json_obj, meta=meta) for json_obj in self.__json_obj.get('tx'))
         return self.__txs_factory.get_transactions(self.__json_obj.get('tx'),
                                                    parent_block=self.__json_obj['hash'])
 
+    @asyncio.coroutine
+    def transactions_async(self):
+        if self.__decoded_txs():
+            return list(self.tx)
+        return (yield from self.__txs_factory.get_transactions_async(self.__json_obj.get('tx'),
+                                                                     parent_block=self.__json_obj['hash']))
+
     @property
     def time(self):
         return self.__json_obj.get('time')
 
     @property
     def coinbase(self):
+        if self.__decoded_txs():
+            return BTCDTransaction(self.__json_obj.get('tx')[0], meta={'parent_block': self.__json_obj['hash']})
         return next(self.__txs_factory.get_transactions([self.__json_obj.get('tx')[0],]))
 
     @property
@@ -68,7 +93,27 @@ class BTCDBlock(Block):
         return self.__json_obj.get('nextblockhash')
 
 
+class BTCDBlockHeader(BTCDBlock):
+    __slots__ = ()
+
+    def __init__(self, json_obj):
+        """
+        getblockheader result: block metadata only, no transactions at all.
+        """
+        super(BTCDBlockHeader, self).__init__(json_obj, None)
+
+    @property
+    def tx(self):
+        raise NotImplementedError('header only block: {}'.format(self.hash))
+
+    @property
+    def coinbase(self):
+        raise NotImplementedError('header only block: {}'.format(self.hash))
+
+
 class BTCDTransaction(Transaction):
+    __slots__ = ('__parent_block', '__json_obj')
+
     def __init__(self, json_obj, meta=None):
         """
         Thinking about a standard transaction, did you ever felt a lack of data?
@@ -111,10 +156,58 @@ class BTCDTransaction(Transaction):
         return self.__parent_block
 
 
+class BTCDScriptSig(ScriptSig):
+    __slots__ = ('__json_obj',)
+
+    def __init__(self, json_obj):
+        """
+        :param json_obj: the scriptSig object, None for coinbase inputs
+        """
+        self.__json_obj = json_obj or {}
+
+    @property
+    def hex(self):
+        return self.__json_obj.get('hex')
+
+    @property
+    def asm(self):
+        return self.__json_obj.get('asm')
+
+
+class BTCDScriptPubKey(ScriptPubKey):
+    __slots__ = ('__json_obj',)
+
+    def __init__(self, json_obj):
+        self.__json_obj = json_obj or {}
+
+    @property
+    def asm(self):
+        return self.__json_obj.get('asm')
+
+    @property
+    def hex(self):
+        return self.__json_obj.get('hex')
+
+    @property
+    def reqSigs(self):
+        return self.__json_obj.get('reqSigs')
+
+    @property
+    def type(self):
+        return self.__json_obj.get('type')
+
+    @property
+    def addresses(self):
+        return self.__json_obj.get('addresses')
+
+
 class BTCDVin(Vin):
+    __slots__ = ('__json_obj', '__parent_tx', '__script_sig')
+
     def __init__(self, json_obj, parent_tx):
         self.__json_obj = json_obj
         self.__parent_tx = parent_tx
+        self.__script_sig = None
 
     @property
     def json(self):
@@ -126,19 +219,9 @@ class BTCDVin(Vin):
 
     @property
     def scriptSig(self):
-        j = self.__json_obj
-        class ScriptSig:
-            @property
-            def hex(self):
-                try: return j.get('scriptSig').get('hex')
-                except AttributeError: return None
-
-            @property
-            def asm(self):
-                try: return j.get('scriptSig').get('asm')
-                except AttributeError: return None
-
-        return ScriptSig()
+        if self.__script_sig is None:
+            self.__script_sig = BTCDScriptSig(self.__json_obj.get('scriptSig'))
+        return self.__script_sig
 
     @property
     def sequence(self):
@@ -158,9 +241,12 @@ class BTCDVin(Vin):
 
 
 class BTCDVout(Vout):
+    __slots__ = ('__json_obj', '__parent_tx', '__script_pub_key')
+
     def __init__(self, json_obj, parent_tx):
         self.__json_obj = json_obj
         self.__parent_tx = parent_tx
+        self.__script_pub_key = None
 
     @property
     def json(self):
@@ -172,7 +258,13 @@ class BTCDVout(Vout):
 
     @property
     def value(self):
-        return self.__json_obj.get('value')
+        value = self.__json_obj.get('value')
+        return satoshis_to_btc(value) if isinstance(value, Satoshis) else value
+
+    @property
+    def value_sat(self):
+        value = self.__json_obj.get('value')
+        return value if isinstance(value, Satoshis) or value is None else btc_to_satoshis(value)
 
     @property
     def n(self):
@@ -180,31 +272,6 @@ class BTCDVout(Vout):
 
     @property
     def scriptPubKey(self):
-        j = self.__json_obj
-        class ScriptPubKey:
-            @property
-            def asm(self):
-                try: return j.get('scriptPubKey').get('asm')
-                except AttributeError: return None
-
-            @property
-            def hex(self):
-                try: return j.get('scriptPubKey').get('hex')
-                except AttributeError: return None
-
-            @property
-            def reqSigs(self):
-                try: return j.get('scriptPubKey').get('reqSigs')
-                except AttributeError: return None
-
-            @property
-            def type(self):
-                try: return j.get('scriptPubKey').get('type')
-                except AttributeError: return None
-
-            @property
-            def addresses(self):
-                try: return j.get('scriptPubKey').get('addresses')
-                except AttributeError: return None
-
-        return ScriptPubKey()
\ No newline at end of file
+        if self.__script_pub_key is None:
+            self.__script_pub_key = BTCDScriptPubKey(self.__json_obj.get('scriptPubKey'))
+        return self.__script_pub_key
\ No newline at end of file
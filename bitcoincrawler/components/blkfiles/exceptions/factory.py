@@ -0,0 +1,8 @@
+# the bitcoind one: a single BlockNotFound to catch, whatever the factory
+from bitcoincrawler.components.bitcoind.exceptions.client import BlockNotFound
+from bitcoincrawler.components.exceptions import CrawlerException
+
+
+class BlkFileException(CrawlerException):
+    def __init__(self, msg, method, params):
+        super(BlkFileException, self).__init__(msg, method, params)
@@ -0,0 +1,185 @@
+from bitcoincrawler.components.base_factory import BaseFactory
+from bitcoincrawler.components.blkfiles.exceptions.factory import BlkFileException, BlockNotFound
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.components.pybitcointools.serialization import double_sha256, hash_to_hex, HEADER_SIZE
+from collections import deque
+import binascii
+import glob
+import mmap
+import os
+import struct
+
+MAGIC = {"main": b'\xf9\xbe\xb4\xd9',
+         "testnet": b'\x0b\x11\x09\x07',
+         "regtest": b'\xfa\xbf\xb5\xda'}
+
+
+def block_work(bits):
+    target = (bits & 0x00ffffff) * 256 ** ((bits >> 24) - 3)
+    return 2 ** 256 // (target + 1)
+
+
+class BlkFilesFactory(BaseFactory):
+    """
+    Reads bitcoind blocks/blk*.dat files through mmap, no rpc at all: meant for historical backfills.
+    Files are indexed once (headers only) on first use, then the main chain is the most-work chain
+    found following previousblockhash, so out of order and stale blocks are handled.
+    Blocks are PyBitcoinToolsBlock objects, as with PyBitcoinToolsFactory(raw_blocks=True).
+    """
+    def __init__(self, blocks_dir, network="main", base_height=0):
+        """
+        :param blocks_dir: bitcoind blocks directory (the one with blk00000.dat)
+        :param base_height: height of the first block of the chain. 0 (genesis) unless files are partial.
+        """
+        self.blocks_dir = blocks_dir
+        self.network = network
+        self.magic = MAGIC[network]
+        self.base_height = base_height
+        self.__maps = []
+        self.__records = None
+        self.__chain = None
+        self.__heights = None
+
+    def close(self):
+        for f, m in self.__maps:
+            try:
+                m.close()
+            except BufferError:
+                # blocks still read from it: unmapped once they are collected
+                pass
+            f.close()
+        self.__maps = []
+        self.__records = self.__chain = self.__heights = None
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.blocks_dir, 'blk*.dat')))
+
+    def _index_file(self, file_index, data):
+        offset = 0
+        while offset + 8 <= len(data):
+            magic = data[offset:offset + 4]
+            if magic != self.magic:
+                if magic == b'\x00\x00\x00\x00':
+                    # bitcoind preallocates files, the tail is zeroed
+                    break
+                raise BlkFileException('unexpected magic bytes {}'.format(binascii.hexlify(magic)),
+                                       'index', (file_index, offset))
+            size = struct.unpack_from('<I', data, offset + 4)[0]
+            start = offset + 8
+            if size < HEADER_SIZE or start + size > len(data):
+                raise BlkFileException('truncated block record', 'index', (file_index, offset))
+            header = data[start:start + HEADER_SIZE]
+            bits = struct.unpack_from('<I', header, 72)[0]
+            self.__records[double_sha256(header)] = (file_index, start, size, header[4:36], bits)
+            offset = start + size
+
+    def _index(self):
+        """
+        hash -> (file index, offset, size, previous hash, bits) for every block record, then the main chain
+        """
+        if self.__chain is not None:
+            return
+        self.__records = {}
+        try:
+            for path in self._files():
+                f = open(path, 'rb')
+                if not os.fstat(f.fileno()).st_size:
+                    f.close()
+                    continue
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.__maps.append((f, m))
+                self._index_file(len(self.__maps) - 1, m)
+        except BlkFileException:
+            self.close()
+            raise
+        self.__chain = self._main_chain()
+        self.__heights = {h: i for i, h in enumerate(self.__chain)}
+
+    def _main_chain(self):
+        children = {}
+        roots = []
+        for h, record in self.__records.items():
+            if record[3] in self.__records:
+                children.setdefault(record[3], []).append(h)
+            else:
+                roots.append(h)
+        best, best_work = None, -1
+        work = {}
+        queue = deque()
+        for root in roots:
+            work[root] = block_work(self.__records[root][4])
+            queue.append(root)
+        while queue:
+            h = queue.popleft()
+            if work[h] > best_work:
+                best, best_work = h, work[h]
+            for child in children.get(h, ()):
+                work[child] = work[h] + block_work(self.__records[child][4])
+                queue.append(child)
+        chain = []
+        while best is not None:
+            chain.append(best)
+            prev = self.__records[best][3]
+            best = prev if prev in self.__records else None
+        chain.reverse()
+        return chain
+
+    def _get_block(self, position):
+        file_index, start, size = self.__records[self.__chain[position]][:3]
+        nextblockhash = hash_to_hex(self.__chain[position + 1]) if position + 1 < len(self.__chain) else None
+        # a view on the map: the block is not copied
+        return PyBitcoinToolsBlock(memoryview(self.__maps[file_index][1])[start:start + size],
+                                   height=self.base_height + position,
+                                   network=self.network,
+                                   nextblockhash=nextblockhash)
+
+    @property
+    def tip_height(self):
+        self._index()
+        return self.base_height + len(self.__chain) - 1
+
+    def generate_blocks(self, blockhash=None,
+                        blockheight=None,
+                        stop_blockhash=None,
+                        stop_blockheight=None,
+                        max_iterations=None,
+                        txs_factory=None):
+        """
+        Same boundaries of BitcoindFactory.generate_blocks.
+        txs_factory is ignored: transactions already are in the block.
+        :return: PyBitcoinToolsBlock objects generator
+        """
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
+        self._index()
+        if blockhash:
+            position = self.__heights.get(binascii.unhexlify(blockhash)[::-1])
+            if position is None:
+                raise BlockNotFound('block not in main chain', 'generate_blocks', blockhash)
+        else:
+            position = blockheight - self.base_height
+            if not 0 <= position < len(self.__chain):
+                raise BlockNotFound('height out of range', 'generate_blocks', blockheight)
+
+        def generator(position, stop_blockhash=None, stop_blockheight=None, max_iterations=None):
+            prev_hash = None
+            stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                          stop_blockheight=stop_blockheight,
+                                          max_iterations=max_iterations)
+            i = 0
+            while position < len(self.__chain):
+                block = self._get_block(position)
+                if stop_check(i, block, prev_hash):
+                    break
+                yield block
+                prev_hash = block.hash
+                position += 1
+                i += 1
+
+        return generator(position,
+                         stop_blockhash=stop_blockhash,
+                         stop_blockheight=stop_blockheight,
+                         max_iterations=max_iterations)
@@ -0,0 +1,161 @@
+from array import array
+import binascii
+
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder
+from bitcoincrawler.components.pybitcointools.serialization import RawTransaction
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SCRIPT_TYPES = ('nonstandard', 'pubkey', 'pubkeyhash', 'scripthash', 'multisig', 'nulldata',
+                'witness_v0_keyhash', 'witness_v0_scripthash', 'witness_unknown')
+SCRIPT_TYPE_CODES = {script_type: code for code, script_type in enumerate(SCRIPT_TYPES)}
+# prevout index of coinbase inputs
+NO_PREVOUT = 0xffffffff
+
+
+class BlockColumns:
+    """
+    Inputs and outputs of a block in parallel typed arrays, for analytics observers (on_block_columns)
+    that would otherwise loop over tx.vin/tx.vout:
+
+    out_value    int64, satoshis
+    out_type     uint8, index in SCRIPT_TYPES
+    out_tx       uint32, index in txids
+    out_n        uint32
+    out_script   uint32 offsets in out_scripts: output i script is out_scripts[out_script[i]:out_script[i + 1]]
+    in_tx        uint32, index in txids
+    in_prevout_n uint32, NO_PREVOUT for coinbase inputs
+    in_prevout   32 bytes per input in in_prevout_txids, display byte order (as the txid hex)
+    in_sequence  uint32
+    in_script    uint32 offsets in in_scripts, like out_script
+    """
+    def __init__(self, blockhash, height):
+        self.hash = blockhash
+        self.height = height
+        self.txids = []
+        self.out_value = array('q')
+        self.out_type = array('B')
+        self.out_tx = array('I')
+        self.out_n = array('I')
+        self.out_script = array('I', [0])
+        self.out_scripts = bytearray()
+        self.in_tx = array('I')
+        self.in_prevout_n = array('I')
+        self.in_prevout_txids = bytearray()
+        self.in_sequence = array('I')
+        self.in_script = array('I', [0])
+        self.in_scripts = bytearray()
+
+    @classmethod
+    def from_block(cls, block):
+        """
+        :param block: any Block. Serialized blocks (PyBitcoinToolsBlock) are read straight from their bytes,
+                      the others through the models
+        """
+        columns = cls(block.hash, block.height)
+        if hasattr(block, 'raw_transactions'):
+            for txid, tx in block.raw_transactions():
+                columns.add_raw_transaction(txid, RawTransaction(tx))
+        else:
+            for tx in block.tx:
+                columns.add_transaction(tx)
+        return columns
+
+    def add_transaction(self, tx):
+        i = len(self.txids)
+        self.txids.append(tx.txid)
+        for vin in tx.vin:
+            self.in_tx.append(i)
+            if vin.coinbase is not None:
+                self.in_prevout_n.append(NO_PREVOUT)
+                self.in_prevout_txids.extend(bytes(32))
+                self.in_scripts.extend(binascii.unhexlify(vin.coinbase))
+            else:
+                self.in_prevout_n.append(vin.vout)
+                self.in_prevout_txids.extend(binascii.unhexlify(vin.txid))
+                self.in_scripts.extend(binascii.unhexlify(vin.scriptSig.hex))
+            self.in_sequence.append(vin.sequence)
+            self.in_script.append(len(self.in_scripts))
+        for vout in tx.vout:
+            self.out_tx.append(i)
+            self.out_n.append(vout.n)
+            self.out_value.append(vout.value_sat)
+            self.out_type.append(SCRIPT_TYPE_CODES.get(vout.scriptPubKey.type, 0))
+            self.out_scripts.extend(binascii.unhexlify(vout.scriptPubKey.hex))
+            self.out_script.append(len(self.out_scripts))
+
+    def add_raw_transaction(self, txid, tx):
+        """
+        :param tx: RawTransaction
+        """
+        i = len(self.txids)
+        self.txids.append(txid)
+        data = tx.data
+        coinbase = tx.is_coinbase()
+        for offset, script_start, script_end in tx.inputs:
+            self.in_tx.append(i)
+            if coinbase:
+                self.in_prevout_n.append(NO_PREVOUT)
+                self.in_prevout_txids.extend(bytes(32))
+            else:
+                self.in_prevout_n.append(int.from_bytes(data[offset + 32:offset + 36], 'little'))
+                self.in_prevout_txids.extend(bytes(data[offset:offset + 32])[::-1])
+            self.in_sequence.append(int.from_bytes(data[script_end:script_end + 4], 'little'))
+            self.in_scripts.extend(data[script_start:script_end])
+            self.in_script.append(len(self.in_scripts))
+        for n, (offset, script_start, script_end) in enumerate(tx.outputs):
+            script = data[script_start:script_end]
+            self.out_tx.append(i)
+            self.out_n.append(n)
+            self.out_value.append(int.from_bytes(data[offset:offset + 8], 'little'))
+            self.out_type.append(SCRIPT_TYPE_CODES[VOUTDecoder.script_type(script)])
+            self.out_scripts.extend(script)
+            self.out_script.append(len(self.out_scripts))
+
+    @property
+    def outputs(self):
+        return len(self.out_value)
+
+    @property
+    def inputs(self):
+        return len(self.in_tx)
+
+    def output_script(self, i):
+        return memoryview(self.out_scripts)[self.out_script[i]:self.out_script[i + 1]]
+
+    def input_script(self, i):
+        return memoryview(self.in_scripts)[self.in_script[i]:self.in_script[i + 1]]
+
+    def input_prevout(self, i):
+        """
+        :return: (txid hex, n), None for coinbase inputs
+        """
+        if self.in_prevout_n[i] == NO_PREVOUT:
+            return None
+        return binascii.hexlify(self.in_prevout_txids[i * 32:i * 32 + 32]).decode('utf-8'), self.in_prevout_n[i]
+
+    def value_by_type(self):
+        """
+        :return: {script type: satoshis}
+        """
+        totals = [0] * len(SCRIPT_TYPES)
+        for code, value in zip(self.out_type, self.out_value):
+            totals[code] += value
+        return {SCRIPT_TYPES[code]: total for code, total in enumerate(totals) if total}
+
+    def to_numpy(self):
+        """
+        The arrays as NumPy arrays, sharing memory (no copy).
+        :return: {column name: numpy.ndarray}
+        """
+        if numpy is None:
+            raise ImportError('numpy is required by BlockColumns.to_numpy')
+        columns = {name: numpy.frombuffer(getattr(self, name), dtype=dtype) for name, dtype in (
+            ('out_value', numpy.int64), ('out_type', numpy.uint8), ('out_tx', numpy.uint32),
+            ('out_n', numpy.uint32), ('out_script', numpy.uint32), ('in_tx', numpy.uint32),
+            ('in_prevout_n', numpy.uint32), ('in_sequence', numpy.uint32), ('in_script', numpy.uint32))}
+        columns['in_prevout'] = numpy.frombuffer(self.in_prevout_txids, dtype=numpy.uint8).reshape(-1, 32)
+        return columns
@@ -1,4 +1,17 @@
+from collections import namedtuple
+import asyncio
+import binascii
+import struct
+
+# field names observers can declare in `needs`, see observers.needs_of
+FIELDS = frozenset(('tx.txid', 'tx.version', 'tx.locktime',
+                    'vin.txid', 'vin.vout', 'vin.sequence', 'vin.coinbase', 'vin.hex', 'vin.asm',
+                    'vout.value', 'vout.n', 'vout.hex', 'vout.asm', 'vout.type', 'vout.reqSigs', 'vout.addresses'))
+COINBASE_OUTPOINT = b'\x00' * 32 + b'\xff' * 4
+
 class Block:
+    __slots__ = ()
+
     @property
     def hash(self):
         raise NotImplementedError()
@@ -19,7 +32,17 @@ class Block:
     def timestamp(self):
         raise NotImplementedError()
 
+    @asyncio.coroutine
+    def transactions_async(self):
+        """
+        The transactions (tx) as a list, for AsyncBitcoinScanner: models fetching them with rpcs await
+        their factory get_transactions_async.
+        """
+        return list(self.tx)
+
 class Transaction:
+    __slots__ = ()
+
     def hash(self):
         raise NotImplementedError()
 
@@ -43,18 +66,64 @@ class Transaction:
     def is_coinbase(self):
         raise NotImplementedError()
 
-class Vin:
+    def raw_outputs(self):
+        """
+        Outputs as read from the serialization, for filters.OutputFilter: models over raw transactions
+        override it to skip building the outputs.
+        :return: [(satoshis, script bytes), ...]
+        """
+        return [(vout.value_sat, binascii.unhexlify(vout.scriptPubKey.hex)) for vout in self.vout]
+
+    def raw_inputs(self):
+        """
+        :return: [outpoint, ...], the 36 bytes serialized outpoints (txid little endian, index) of the inputs,
+                 for filters.InputFilter. Coinbase inputs have a null txid and 0xffffffff index.
+        """
+        return [COINBASE_OUTPOINT if vin.coinbase else binascii.unhexlify(vin.txid)[::-1] + struct.pack('<I', vin.vout)
+                for vin in self.vin]
+
+class ScriptSig:
+    """
+    Views on the scripts are created once per Vin/Vout, by the models
+    """
+    __slots__ = ()
+
+    @property
+    def hex(self):
+        raise NotImplementedError()
+
     @property
-    def scriptSig(self):
-        class ScriptSig:
-            @property
-            def hex(self):
-                raise NotImplementedError()
+    def asm(self):
+        raise NotImplementedError()
 
-            @property
-            def asm(self):
-                raise NotImplementedError()
+class ScriptPubKey:
+    __slots__ = ()
+
+    @property
+    def asm(self):
+        raise NotImplementedError()
+
+    @property
+    def hex(self):
+        raise NotImplementedError()
+
+    @property
+    def reqSigs(self):
+        raise NotImplementedError()
 
+    @property
+    def type(self):
+        raise NotImplementedError()
+
+    @property
+    def addresses(self):
+        raise NotImplementedError()
+
+class Vin:
+    __slots__ = ()
+
+    @property
+    def scriptSig(self):
         return ScriptSig()
 
     @property
@@ -70,35 +139,25 @@ class Vin:
         raise NotImplementedError()
 
 class Vout:
+    __slots__ = ()
+
     @property
     def value(self):
         raise NotImplementedError()
 
+    @property
+    def value_sat(self):
+        raise NotImplementedError()
+
     @property
     def n(self):
         raise NotImplementedError()
 
     @property
     def scriptPubKey(self):
-        class ScriptPubKey:
-            @property
-            def asm(self):
-                raise NotImplementedError()
-
-            @property
-            def hex(self):
-                raise NotImplementedError()
-
-            @property
-            def reqSigs(self):
-                raise NotImplementedError()
-
-            @property
-            def type(self):
-                raise NotImplementedError()
-
-            @property
-            def addresses(self):
-                raise NotImplementedError()
+        return ScriptPubKey()
 
-        return ScriptPubKey()
\ No newline at end of file
+class BlockDisconnected(namedtuple('BlockDisconnected', ['block'])):
+    """
+    Produced by follow mode generators when block leaves the main chain (reorg)
+    """
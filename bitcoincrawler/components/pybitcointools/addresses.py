@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from hashlib import sha256
+import threading
+
+from bitcoin import bin_hash160
+
+B58_DIGITS = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+# every base58 pair of digits, for two digits per division
+B58_PAIRS = [a + b for a in B58_DIGITS for b in B58_DIGITS]
+
+
+def b58check_encode(payload, version):
+    """
+    :param payload: bytes, 20 bytes hash160 for addresses
+    :param version: version byte, e.g. 0x00 for main network P2PKH
+    """
+    data = bytes((version,)) + bytes(payload)
+    data += sha256(sha256(data).digest()).digest()[:4]
+    n = int.from_bytes(data, 'big')
+    chars = []
+    while n:
+        n, r = divmod(n, 3364)
+        chars.append(B58_PAIRS[r])
+    encoded = ''.join(reversed(chars)).lstrip('1')
+    return '1' * (len(data) - len(data.lstrip(b'\x00'))) + encoded
+
+
+def b58check_decode(address):
+    """
+    :return: (version byte, payload bytes) of a base58check string
+    :raise ValueError: not base58, or wrong checksum
+    """
+    n = 0
+    for c in address:
+        digit = B58_DIGITS.find(c)
+        if digit < 0:
+            raise ValueError('invalid base58 string', 'b58check_decode', address)
+        n = n * 58 + digit
+    data = b'\x00' * (len(address) - len(address.lstrip('1'))) + n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    if len(data) < 5 or sha256(sha256(data[:-4]).digest()).digest()[:4] != data[-4:]:
+        raise ValueError('invalid base58 checksum', 'b58check_decode', address)
+    return data[0], data[1:-4]
+
+
+def hash160_to_address(h, version):
+    return b58check_encode(h, version)
+
+
+def pubkey_to_address(pubkey, version):
+    return b58check_encode(bin_hash160(bytes(pubkey)), version)
+
+
+class AddressCache:
+    """
+    Bounded LRU of derived addresses, keyed by (payload, version): payload is a 20 bytes hash160 or
+    a 33/65 bytes public key, hashed on misses.
+    hits and misses are counted to size the cache on a real block range.
+    Thread safe: PipelinedScanner parse workers share it.
+    """
+    def __init__(self, maxsize=2**16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__addresses = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def address(self, payload, version):
+        key = (bytes(payload), version)
+        with self.__lock:
+            address = self.__addresses.get(key)
+            if address is not None:
+                self.hits += 1
+                self.__addresses.move_to_end(key)
+                return address
+            self.misses += 1
+        address = hash160_to_address(key[0], version) if len(key[0]) == 20 \
+            else pubkey_to_address(key[0], version)
+        if self.maxsize:
+            with self.__lock:
+                self.__addresses[key] = address
+                self.__addresses.move_to_end(key)
+                if len(self.__addresses) > self.maxsize:
+                    self.__addresses.popitem(last=False)
+        return address
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self.__addresses)
+
+    def clear(self):
+        with self.__lock:
+            self.__addresses.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+address_cache = AddressCache()
@@ -1,17 +1,31 @@
 from bitcoin import deserialize_script
-from bitcoincrawler.components.pybitcointools.scripts import SCRIPTS
-from bitcoin import pubtoaddr, hex_to_b58check
-from decimal import Decimal
+from bitcoincrawler.components.pybitcointools.scripts import SCRIPTS, vin_asm, vout_asm
+from bitcoincrawler.components.pybitcointools.addresses import address_cache
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.components.amounts import satoshis_to_btc
 from bitcoincrawler.components.pybitcointools.exceptions.decoders import VoutDecoderException
 import binascii
 
+WITNESS_TYPES = ('witness_v0_keyhash', 'witness_v0_scripthash', 'witness_unknown')
+
+
+def script_bytes(io):
+    """
+    :param io: pybitcointools input/output dict, or RawInput/RawOutput with the raw bytes as script_bytes
+    """
+    script = getattr(io, 'script_bytes', None)
+    return binascii.unhexlify(io['script']) if script is None else script
+
 
 class VINDecoder:
     @classmethod
-    def decode(cls, vin):
+    def decode(cls, vin, asm=True):
+        """
+        :param asm: False leaves scriptSig.asm to None, to be rendered with vin_asm when needed
+        """
         if not int(vin['outpoint']['hash'], 16):
             return VINDecoder._decode_coinbase(vin)
-        return VINDecoder._decode_script(vin)
+        return VINDecoder._decode_script(vin, asm=asm)
 
     @classmethod
     def _decode_coinbase(cls, vin):
@@ -19,27 +33,11 @@ class VINDecoder:
                 'sequence': vin['sequence']}
 
     @classmethod
-    def _decode_script(cls, vin):
-        ds = [0 if x == None else x for x in deserialize_script(vin['script'])]
-        asm = ''
-        for i, x in enumerate(ds):
-            try:
-                y = int(x, 16) if isinstance(x, str) else x
-                if 256 > y > 128 and y not in range(139, 176):
-                    asm += '{}'.format(128 - y)
-                else:
-                    asm += '{}'.format(SCRIPTS[y] if len(ds) > 1 else int().from_bytes(binascii.unhexlify(y),
-                                                                                       byteorder='little'))
-            except:
-                to_int = int().from_bytes(binascii.unhexlify(x), byteorder="little")
-                # FIXME - Sometimes bytes wrap into hex, sometimes into dec
-                asm += str(to_int if to_int < 1418797546 else x)
-            if i < len(ds)-1:
-                asm += ' '
+    def _decode_script(cls, vin, asm=True):
         return {'txid': vin['outpoint']['hash'],
                 'vout': vin['outpoint']['index'],
                 'scriptSig': {'hex': vin['script'],
-                              'asm': asm
+                              'asm': vin_asm(script_bytes(vin)) if asm else None
                               },
                 'sequence': vin['sequence']}
 
@@ -57,7 +55,7 @@ class VOUTDecoder:
                       req_sigs=None,
                       script_type=None,
                       addresses=None):
-        v = (Decimal(value) / Decimal(100000000)) if value else Decimal('0.0')
+        v = satoshis_to_btc(value or 0)
         r = {'value': v,
                 'n': n,
                 'scriptPubKey': {'asm': asm,
@@ -69,12 +67,145 @@ class VOUTDecoder:
         return r
 
     @classmethod
-    def decode(cls, vout, n, network):
+    def decode(cls, vout, n, network, asm=True, addresses=True):
+        """
+        Standard scripts are matched on their raw bytes, the others go through the tokenizer.
+        :param vout: {'value': satoshis, 'script': hex}, RawOutput views provide the bytes as script_bytes
+        :param asm: False leaves scriptPubKey.asm to None, to be rendered with vout_asm when needed
+        :param addresses: False skips public keys validation and hashing: the type is the same,
+                          scriptPubKey has no addresses nor reqSigs
+        Decoded scripts are kept in script_cache.
+        """
+        script = script_bytes(vout)
+        entry = script_cache.get(script, network, addresses=addresses, asm=asm)
+        if entry is None:
+            decoded = VOUTDecoder.decode_script(vout, n, network, asm=asm, addresses=addresses)
+            script_cache.put(script, network, decoded['scriptPubKey'], addresses=addresses)
+            return decoded
+        return VOUTDecoder.from_entry(vout, n, entry, asm=asm, addresses=addresses)
+
+    @classmethod
+    def from_entry(cls, vout, n, entry, asm=True, addresses=True):
+        """
+        decode, the script already decoded as entry (ScriptEntry)
+        """
+        derived = addresses and entry.addresses
+        return VOUTDecoder.__return_script(value=vout['value'],
+                                           n=n,
+                                           hex_script=vout['script'],
+                                           asm=entry.asm if asm else None,
+                                           addresses=list(entry.addresses) if derived else None,
+                                           req_sigs=entry.reqSigs if derived else None,
+                                           script_type=entry.type)
+
+    @classmethod
+    def decode_script(cls, vout, n, network, asm=True, addresses=True):
+        """
+        decode, without the cache
+        """
+        script = script_bytes(vout)
+        template = VOUTDecoder.match_template(script, network, addresses=addresses)
+        if template is None:
+            return VOUTDecoder.decode_tokenized(vout, n, network, asm=asm, addresses=addresses)
+        script_type, addresses, reqsigs = template
+        return VOUTDecoder.__return_script(value=vout['value'],
+                                           n=n,
+                                           hex_script=vout['script'],
+                                           asm=vout_asm(script, script_type == 'nulldata') if asm else None,
+                                           addresses=addresses if addresses else None,
+                                           req_sigs=reqsigs if addresses else None,
+                                           script_type=script_type)
+
+    @classmethod
+    def asm(cls, script, network, nulldata=False):
+        """
+        vout_asm, through script_cache
+        """
+        entry = script_cache.get(script, network, asm=True)
+        if entry is not None:
+            return entry.asm
+        asm = vout_asm(script, nulldata)
+        script_cache.put_asm(script, network, asm)
+        return asm
+
+    @classmethod
+    def template_type(cls, script):
+        """
+        Classifies P2PKH, P2SH, witness programs, P2PK, bare multisig and OP_RETURN scripts by length
+        and fixed bytes.
+        :param script: raw script, bytes or memoryview
+        :return: script type, None if the script does not fit a template
+        """
+        size = len(script)
+        if size == 25 and script[0] == 0x76 and script[1] == 0xa9 and script[2] == 0x14 \
+                and script[23] == 0x88 and script[24] == 0xac:
+            return 'pubkeyhash'
+        elif size == 23 and script[0] == 0xa9 and script[1] == 0x14 and script[22] == 0x87:
+            return 'scripthash'
+        elif 4 <= size <= 42 and script[1] == size - 2 and (script[0] == 0 or 0x51 <= script[0] <= 0x60):
+            return _witness_type(script[0] and script[0] - 0x50, size - 2)
+        elif size in (35, 67) and script[0] == size - 2 and script[-1] == 0xac:
+            return 'pubkey'
+        elif size and script[0] == 0x6a:
+            # longer pushes are nonstandard
+            if size == 1 or size - 2 == script[1] and 0 < script[1] <= 40:
+                return 'nulldata'
+        elif size > 3 and script[-1] == 0xae and 0x51 <= script[0] <= 0x60 and 0x51 <= script[-2] <= 0x60:
+            if _multisig_pubkeys(script) is not None:
+                return 'multisig'
+        return None
+
+    @classmethod
+    def script_type(cls, script):
+        """
+        :param script: raw script, bytes or memoryview
+        :return: the scriptPubKey type, without deriving addresses for the standard scripts
+        """
+        script_type = VOUTDecoder.template_type(script)
+        if script_type is None:
+            vout = {'script': binascii.hexlify(script).decode('utf-8'), 'value': 0}
+            script_type = VOUTDecoder.decode_tokenized(vout, 0, "main", asm=False,
+                                                       addresses=False)['scriptPubKey']['type']
+        return script_type
+
+    @classmethod
+    def match_template(cls, script, network, addresses=True):
+        """
+        :param script: raw script, bytes or memoryview
+        :param addresses: False returns (script_type, [], None) for every template
+        :return: (script_type, addresses, reqsigs) or None if the script does not fit a template
+        """
+        script_type = VOUTDecoder.template_type(script)
+        if script_type is not None and not addresses:
+            return script_type, [], None
+        elif script_type == 'pubkeyhash':
+            return script_type, [address_cache.address(script[3:23], 0x00 if network == "main" else 0x6F)], 1
+        elif script_type == 'scripthash':
+            return script_type, [address_cache.address(script[2:22], 0x05 if network == "main" else 0xC4)], 1
+        elif script_type == 'pubkey':
+            pubkey = script[1:-1]
+            return script_type, [address_cache.address(pubkey, 0x00)] if _is_valid_pubkey(pubkey) else [], 1
+        elif script_type in ('nulldata', 'nonstandard') or script_type in WITNESS_TYPES:
+            # witness programs addresses (bech32) are not derived
+            return script_type, [], None
+        elif script_type == 'multisig':
+            return (script_type,
+                    [address_cache.address(k, 0x00) for k in _multisig_pubkeys(script) if _is_valid_pubkey(k)],
+                    script[0] - 0x50)
+        return None
+
+    @classmethod
+    def decode_tokenized(cls, vout, n, network, asm=True, addresses=True):
+        """
+        General path: the script is tokenized with deserialize_script and matched as a list.
+        """
         hex_script = vout['script']
         script = [0 if x == None else x for x in deserialize_script(hex_script)]
         data = {'hs': hex_script,
+                'b': script_bytes(vout) if asm else None,
                 'd': vout,
                 'n': n,
+                'a': addresses,
                 's': script,
                 'p': {'pub': 0x00 if network == "main" else 0x6F,
                       'p2sh': 0x05 if network == "main" else 0xC4}}
@@ -92,15 +223,8 @@ class VOUTDecoder:
                     reqsigs = VOUTDecoder.get_reqsigs(data['s'], script_type) if addresses else None
                 except VoutDecoderException:
                     return VOUTDecoder.__decode(data, script_type="nonstandard")
-            try:
-                asm = VOUTDecoder.get_asm(data, script_type)
-            except VoutDecoderException:
-                if script_type != 'nonstandard':
-                    return VOUTDecoder.__decode(data, script_type="nonstandard")
-                else:
-                    raise Exception()
-            return VOUTDecoder.__return_script(value=Decimal('{}'.format(data['d']['value'])) \
-                                                     if data['d']['value'] else None,
+            asm = vout_asm(data['b'], script_type == 'nulldata') if data['b'] is not None else None
+            return VOUTDecoder.__return_script(value=data['d']['value'],
                                                        n=data['n'],
                                                        hex_script=data['hs'],
                                                        asm=asm,
@@ -115,22 +239,22 @@ class VOUTDecoder:
         candidate_nonstandard = False
         try:
             if script_type == "pubkeyhash" and len(data['s'][2]) == 40:
-                return [hex_to_b58check(data['s'][2].encode('utf-8'), data['p']['pub'])]
+                return [address_cache.address(binascii.unhexlify(data['s'][2]), data['p']['pub'])] if data['a'] else []
             elif script_type == "scripthash" and len(data['s'][1]) == 40:
-                return [hex_to_b58check(data['s'][1].encode('utf-8'), data['p']['p2sh'])]
+                return [address_cache.address(binascii.unhexlify(data['s'][1]), data['p']['p2sh'])] if data['a'] else []
             elif script_type == "multisig":
                 addrs = []
                 for i in range(1, int(SCRIPTS[data['s'][-2]])+1):
                     if len(data['s'][i]) not in (130, 66, 78):
                         candidate_nonstandard = True
-                    if isValidPubKey(data['s'][i]):
-                        k = pubtoaddr(data['s'][i].encode('utf-8'))
+                    if data['a'] and isValidPubKey(data['s'][i]):
+                        k = address_cache.address(binascii.unhexlify(data['s'][i]), 0x00)
                         addrs.append(k)
                 if candidate_nonstandard:
                     raise VoutDecoderException('','','')
                 return addrs
-            elif script_type == "pubkey":
-                return [pubtoaddr(data['s'][0].encode('utf-8'), 0x00)] if isValidPubKey(data['s'][0]) else []
+            elif script_type == "pubkey" and data['a']:
+                return [address_cache.address(binascii.unhexlify(data['s'][0]), 0x00)] if isValidPubKey(data['s'][0]) else []
         except (AttributeError, TypeError):
             raise VoutDecoderException('','','')
         return []
@@ -149,10 +273,15 @@ class VOUTDecoder:
     @classmethod
     def get_script_type(cls, script):
         try:
-            if len(script) == 5 and script[1] == 169 and script[-2] == 136 and script[-1] == 172:
+            if len(script) == 2 and isinstance(script[0], int) and 0 <= script[0] <= 16 \
+                    and isinstance(script[1], str) and 2 <= len(script[1]) // 2 <= 40:
+                return _witness_type(script[0], len(script[1]) // 2)
+            elif len(script) == 5 and script[1] == 169 and script[-2] == 136 and script[-1] == 172:
                 return "pubkeyhash"
             elif script[0] == 106 and len(script) < 3:
-                return "nulldata"
+                # pushes over 40 bytes are nonstandard
+                return "nulldata" if len(script) == 1 or not isinstance(script[1], str) or len(script[1]) <= 80 \
+                    else "nonstandard"
             elif len(script) == 3 and script[0] == 169 and script[2] == 135:
                 return "scripthash"
             elif script[1] == 172 and len(script[0]) in (66, 68, 76, 128, 130) and len(script) == 2:
@@ -165,38 +294,41 @@ class VOUTDecoder:
         except (IndexError, KeyError):
             return 'nonstandard'
 
-    @classmethod
-    def get_asm(cls, data, script_type):
-        asm = ''
-        for i, b in enumerate(data['s']):
-            try:
-                if i == (len(data['s']) -1) and script_type not in ('nulldata', 'nonstandard') and len(data['s']) > 1:
-                    try:
-                        if isinstance(b, int):
-                            asm += SCRIPTS[b]
-                        else:
-                            asm += b
-                    except KeyError:
-                        asm += "[error]"
-                else:
-                    asm += SCRIPTS[b]
-            except KeyError:
-                if isinstance(b, int) and b < 255:
-                    asm += 'OP_UNKNOWN'
-                elif script_type == 'nulldata':
-                    if isinstance(b, str):
-                        if len(b) > 80:
-                            raise VoutDecoderException('Failure', '', '')
-                        to_int = int().from_bytes(binascii.unhexlify(b), byteorder="little")
-                        asm += str(to_int if len(b) <= 8 else b)
-                    else:
-                        asm += str(b)
-                else:
-                    asm += str(b)
-            if i < len(data['s'])-1: asm += ' '
-        return asm
-    
-        
+
+def _witness_type(version, program_size):
+    """
+    Witness programs types, as bitcoind Solver: version 0 programs are P2WPKH or P2WSH, or nonstandard
+    """
+    if version:
+        return 'witness_unknown'
+    elif program_size == 20:
+        return 'witness_v0_keyhash'
+    elif program_size == 32:
+        return 'witness_v0_scripthash'
+    return 'nonstandard'
+
+
+def _multisig_pubkeys(script):
+    """
+    :return: the 33/65 bytes public keys of a OP_m <pubkeys> OP_n OP_CHECKMULTISIG script, None if malformed
+    """
+    pubkeys = []
+    pos = 1
+    for _ in range(0, script[-2] - 0x50):
+        if pos >= len(script) - 2 or script[pos] not in (33, 65):
+            return None
+        pubkeys.append(script[pos + 1:pos + 1 + script[pos]])
+        pos += 1 + script[pos]
+    return pubkeys if pos == len(script) - 2 else None
+
+
+def _is_valid_pubkey(pubkey):
+    """
+    isValidPubKey, on raw bytes
+    """
+    return len(pubkey) == 33 and pubkey[0] in (2, 3) or len(pubkey) == 65 and pubkey[0] in (4, 6, 7)
+
+
 def isValidPubKey(pubkey):
     """
     https://github.com/bitcoin/bitcoin/blob/master/src/pubkey.h#L48
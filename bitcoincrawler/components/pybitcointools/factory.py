@@ -1,15 +1,98 @@
+from bitcoincrawler.components.bitcoind.exceptions.client import BlockNotFound
 from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
-from bitcoincrawler.components.tools import chain
-from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsTransaction
+from bitcoincrawler.components.tools import AsyncIterator, chain, chunks
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsTransaction, PyBitcoinToolsBlock
+from concurrent.futures import ProcessPoolExecutor
 import asyncio
+import binascii
+
+
+def parse_transactions(rawtxs, network, needs=None):
+    """
+    Parse stage run in the worker processes: module level, so the pool can pickle it.
+    :param rawtxs: [(txid, raw hex), ...]
+    :return: [(txid, raw bytes, decode_scripts()), ...]: bytes and tuples of strings, cheap to pickle back.
+             PyBitcoinToolsTransaction(raw, txid, scripts=scripts) rebuilds the transaction without decoding.
+    """
+    parsed = []
+    for txid, rawtx in rawtxs:
+        tx = PyBitcoinToolsTransaction(binascii.unhexlify(rawtx), txid, network=network, needs=needs)
+        parsed.append((txid, tx._hex, tx.decode_scripts()))
+    return parsed
+
 
 class PyBitcoinToolsFactory(BitcoindFactory):
     """
     Extension of bitcoind component, use local parser instead of decoderawtransaction.
     Looks faster and surely consume less network resources, but it's _HIGHLY EXPERIMENTAL__.
     """
-    def __init__(self, bitcoind_cli, async=False):
-        super(PyBitcoinToolsFactory, self).__init__(bitcoind_cli, async=async)
+    def __init__(self, bitcoind_cli, async=False, batch_size=None, raw_blocks=False, prefetch=0,
+                 prefetch_bytes=64 * 2 ** 20, parse_workers=0, parse_batch_size=50, needs=None):
+        """
+        :param raw_blocks: generate_blocks fetches serialized blocks (getblock <hash> false) and splits
+                           transactions locally: one rpc per block, no -txindex needed.
+        :param parse_workers: with async, the scripts of the raw transactions are decoded by a pool of
+                              parse_workers processes instead of the event loop thread. get_transactions
+                              fetches every transaction first, then splits them among the workers.
+                              Without async, or with raw_blocks (the transactions are in the blocks,
+                              parsed by whoever reads them), there is no pool: ValueError.
+        :param parse_batch_size: transactions per worker job
+        :param needs: fields read by the observers, e.g. observers.needs_of(scanner.observers): the decoding
+                      of the others is skipped. None decodes everything.
+        """
+        if parse_workers and (not async or raw_blocks):
+            raise ValueError('parse_workers needs async and no raw_blocks', 'PyBitcoinToolsFactory',
+                             {'async': async, 'raw_blocks': raw_blocks, 'parse_workers': parse_workers})
+        super(PyBitcoinToolsFactory, self).__init__(bitcoind_cli, async=async, batch_size=batch_size,
+                                                    prefetch=prefetch, prefetch_bytes=prefetch_bytes)
+        self.raw_blocks = raw_blocks
+        self.parse_workers = parse_workers
+        self.parse_batch_size = parse_batch_size
+        self.needs = needs
+        self.__parse_pool = None
+
+    @property
+    def parse_pool(self):
+        if self.__parse_pool is None and self.parse_workers:
+            self.__parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        return self.__parse_pool
+
+    def close(self):
+        """
+        Shuts the parse pool down, if any.
+        """
+        if self.__parse_pool is not None:
+            self.__parse_pool.shutdown()
+            self.__parse_pool = None
+
+    @asyncio.coroutine
+    def _parse_in_pool(self, txids, rawtxs, meta):
+        loop = asyncio.get_event_loop()
+        jobs = [loop.run_in_executor(self.parse_pool, parse_transactions, job, self.network, self.needs)
+                for job in chunks(zip(txids, rawtxs), self.parse_batch_size)]
+        parsed = yield from asyncio.gather(*jobs)
+        return [PyBitcoinToolsTransaction(raw, txid, network=self.network, meta=meta, needs=self.needs,
+                                          scripts=scripts) for job in parsed for txid, raw, scripts in job]
+
+    @asyncio.coroutine
+    def _get_parsed_transactions(self, txids, parent_block=None):
+        """
+        The raw transactions of txids, fetched in batch_size batches (or one by one), then parsed in the pool
+        """
+        if self.batch_size:
+            batches = yield from asyncio.gather(*(self.btcd.get_raw_transactions(batch, async=True)
+                                                  for batch in chunks(txids, self.batch_size)))
+            rawtxs = [rawtx for batch in batches for rawtx in batch]
+        else:
+            rawtxs = yield from asyncio.gather(*(self.btcd.get_raw_transaction(txid, async=True) for txid in txids))
+        return (yield from self._parse_in_pool(txids, [rawtx.get('result') for rawtx in rawtxs],
+                                               {'parent_block': parent_block}))
+
+    @asyncio.coroutine
+    def get_transactions_async(self, txs, parent_block=None):
+        if self.parse_workers:
+            return (yield from self._get_parsed_transactions(list(txs), parent_block=parent_block))
+        return (yield from super(PyBitcoinToolsFactory, self).get_transactions_async(txs, parent_block=parent_block))
 
     def _get_transaction(self, txid, parent_block=None):
         meta = {'parent_block': parent_block}
@@ -22,8 +105,152 @@ class PyBitcoinToolsFactory(BitcoindFactory):
                          asyncio.coroutine(lambda rawtx: PyBitcoinToolsTransaction(rawtx.get('result'),
                                                                                    txid,
                                                                                    network=self.network,
-                                                                                   meta=meta)))
+                                                                                   meta=meta,
+                                                                                   needs=self.needs)))
         else:
             return PyBitcoinToolsTransaction(self.btcd.get_raw_transaction(txid).get('result'),
                                              txid,
-                                             meta=meta)
\ No newline at end of file
+                                             network=self.network,
+                                             meta=meta,
+                                             needs=self.needs)
+
+    def _get_transactions_batch(self, txids, parent_block=None):
+        meta = {'parent_block': parent_block}
+        build = lambda rawtxs: [PyBitcoinToolsTransaction(rawtx.get('result'),
+                                                          txid,
+                                                          network=self.network,
+                                                          meta=meta,
+                                                          needs=self.needs) for rawtx, txid in zip(rawtxs, txids)]
+        if self.async:
+            return chain(txids,
+                         lambda txids: self.btcd.get_raw_transactions(txids, async=True),
+                         asyncio.coroutine(build))
+        else:
+            return build(self.btcd.get_raw_transactions(txids))
+
+    def generate_blocks(self, blockhash=None,
+                        blockheight=None,
+                        stop_blockhash=None,
+                        stop_blockheight=None,
+                        max_iterations=None,
+                        txs_factory=None):
+        """
+        Same boundaries of BitcoindFactory.generate_blocks.
+        With raw_blocks, PyBitcoinToolsBlock objects are produced, and txs_factory is ignored:
+        transactions already are in the block.
+        """
+        if not self.raw_blocks:
+            return super(PyBitcoinToolsFactory, self).generate_blocks(blockhash=blockhash,
+                                                                      blockheight=blockheight,
+                                                                      stop_blockhash=stop_blockhash,
+                                                                      stop_blockheight=stop_blockheight,
+                                                                      max_iterations=max_iterations,
+                                                                      txs_factory=txs_factory)
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
+
+        def generator(blockhash=None,
+                      blockheight=None,
+                      stop_blockhash=None,
+                      stop_blockheight=None,
+                      max_iterations=None):
+            """
+            Serialized blocks have no height nor nextblockhash: walk the chain by height.
+            """
+            prev_hash = None
+            stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                          stop_blockheight=stop_blockheight,
+                                          max_iterations=max_iterations)
+            i = 0
+            if blockheight is None:
+                blockheight = self.btcd.get_block(blockhash).get('result').get('height')
+            if stop_blockheight:
+                last_height = stop_blockheight
+            elif max_iterations:
+                last_height = blockheight + max_iterations - 1
+            else:
+                last_height = None
+            fetch = lambda blockhash: self.btcd.get_raw_block(blockhash).get('result')
+            rawblock = fetch(blockhash) if blockhash else self._fetch_block_at(blockheight, fetch)
+            following = self._blocks_from_height(blockheight + 1, fetch,
+                                                 lambda rawblock: len(rawblock) // 2,
+                                                 last_height=last_height)
+            try:
+                while rawblock is not None:
+                    block = PyBitcoinToolsBlock(rawblock, height=blockheight, network=self.network,
+                                                needs=self.needs)
+                    if stop_check(i, block, prev_hash) or (prev_hash and block.previousblockhash != prev_hash):
+                        break
+                    yield block
+                    prev_hash = block.hash
+                    rawblock = next(following, None)
+                    blockheight += 1
+                    i += 1
+            finally:
+                following.close()
+
+        return generator(blockhash=blockhash,
+                         blockheight=blockheight,
+                         stop_blockhash=stop_blockhash,
+                         stop_blockheight=stop_blockheight,
+                         max_iterations=max_iterations)
+
+    def generate_blocks_async(self, blockhash=None,
+                              blockheight=None,
+                              stop_blockhash=None,
+                              stop_blockheight=None,
+                              max_iterations=None,
+                              txs_factory=None):
+        """
+        Same boundaries of generate_blocks, rpcs awaited on the running loop (see BitcoindFactory).
+        With raw_blocks, PyBitcoinToolsBlock objects are produced, walking the chain by height.
+        """
+        if not self.raw_blocks:
+            return super(PyBitcoinToolsFactory, self).generate_blocks_async(blockhash=blockhash,
+                                                                            blockheight=blockheight,
+                                                                            stop_blockhash=stop_blockhash,
+                                                                            stop_blockheight=stop_blockheight,
+                                                                            max_iterations=max_iterations,
+                                                                            txs_factory=txs_factory)
+        self._check_boundaries(blockhash=blockhash,
+                               blockheight=blockheight,
+                               stop_blockhash=stop_blockhash,
+                               stop_blockheight=stop_blockheight,
+                               max_iterations=max_iterations)
+        stop_check = self._stop_check(stop_blockhash=stop_blockhash,
+                                      stop_blockheight=stop_blockheight,
+                                      max_iterations=max_iterations)
+        last_height = stop_blockheight
+        prev_hash, i, done = None, 0, False
+
+        @asyncio.coroutine
+        def next_block():
+            nonlocal blockheight, last_height, prev_hash, i, done
+            if blockheight is None:
+                blockheight = (yield from self.btcd.get_block(blockhash, async=True)).get('result').get('height')
+            if max_iterations and last_height is None:
+                last_height = blockheight + max_iterations - 1
+            if done or (last_height is not None and blockheight > last_height):
+                return None
+            if prev_hash is None and blockhash:
+                cur_hash = blockhash
+            else:
+                try:
+                    cur_hash = (yield from self.btcd.get_block_hash(blockheight, async=True)).get('result')
+                except BlockNotFound:
+                    done = True
+                    return None
+            rawblock = (yield from self.btcd.get_raw_block(cur_hash, async=True)).get('result')
+            block = PyBitcoinToolsBlock(rawblock, height=blockheight, network=self.network, needs=self.needs)
+            if stop_check(i, block, prev_hash) or (prev_hash and block.previousblockhash != prev_hash):
+                done = True
+                return None
+            prev_hash = block.hash
+            blockheight += 1
+            i += 1
+            return block
+
+        return AsyncIterator(next_block)
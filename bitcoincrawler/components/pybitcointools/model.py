@@ -1,27 +1,145 @@
-from bitcoincrawler.components.model import Transaction, Vin, Vout
-from bitcoin import deserialize
-from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder, VINDecoder
-from decimal import Decimal
+from bitcoincrawler.components.amounts import satoshis_to_btc
+from bitcoincrawler.components.model import Block, Transaction, Vin, Vout, ScriptSig, ScriptPubKey
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder, VINDecoder, script_bytes
+from bitcoincrawler.components.pybitcointools.script_cache import ScriptEntry
+from bitcoincrawler.components.pybitcointools.scripts import vin_asm
+from bitcoincrawler.components.pybitcointools.serialization import parse_header, split_transactions, RawTransaction
+import binascii
+import struct
+
+class PyBitcoinToolsBlock(Block):
+    """
+    A serialized block (getblock <hash> 0, or blk*.dat), parsed locally.
+    Transactions are split and hashed only when .tx is accessed, and no rpc is needed at all.
+    The wire format doesn't carry height and chain links, they're provided by who built the block.
+    """
+    __slots__ = ('__raw', '__header', '__height', '__network', '__nextblockhash', '__txs', '__needs')
+
+    def __init__(self, rawblock, height=None, network="main", nextblockhash=None, needs=None):
+        """
+        :param needs: fields read from the transactions, see PyBitcoinToolsTransaction
+        """
+        self.__raw = binascii.unhexlify(rawblock) if isinstance(rawblock, str) else rawblock
+        self.__header = parse_header(self.__raw)
+        self.__height = height
+        self.__network = network
+        self.__nextblockhash = nextblockhash
+        self.__txs = None
+        self.__needs = needs
+
+    def _split(self):
+        if self.__txs is None:
+            self.__txs = split_transactions(self.__raw)
+        return self.__txs
+
+    def raw_transactions(self):
+        """
+        :return: [(txid, non-witness serialization), ...]
+        """
+        return self._split()
+
+    @property
+    def json(self):
+        r = dict(self.__header)
+        r.update({'size': self.size,
+                  'height': self.height,
+                  'tx': [txid for txid, tx in self._split()]})
+        if self.__nextblockhash:
+            r['nextblockhash'] = self.__nextblockhash
+        return r
+
+    @property
+    def hash(self):
+        return self.__header['hash']
+
+    @property
+    def size(self):
+        return len(self.__raw)
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def version(self):
+        return self.__header['version']
+
+    @property
+    def merkleroot(self):
+        return self.__header['merkleroot']
+
+    @property
+    def tx(self):
+        meta = {'parent_block': self.hash}
+        return (PyBitcoinToolsTransaction(tx, txid,
+                                          network=self.__network,
+                                          meta=meta,
+                                          needs=self.__needs) for txid, tx in self._split())
+
+    @property
+    def time(self):
+        return self.__header['time']
+
+    @property
+    def coinbase(self):
+        return next(self.tx)
+
+    @property
+    def nonce(self):
+        return self.__header['nonce']
+
+    @property
+    def bits(self):
+        return self.__header['bits']
+
+    @property
+    def difficulty(self):
+        return self.__header['difficulty']
+
+    @property
+    def chainwork(self):
+        return None
+
+    @property
+    def previousblockhash(self):
+        return self.__header['previousblockhash']
+
+    @property
+    def nextblockhash(self):
+        return self.__nextblockhash
 
 class PyBitcoinToolsTransaction(Transaction):
-    def __init__(self, hextx, txid, network="main", meta=None):
+    __slots__ = ('_hex', '_txid', '__raw', '__network', '__parent_block', '__needs', '__scripts')
+
+    def __init__(self, hextx, txid, network="main", meta=None, needs=None, scripts=None):
+        """
+        :param hextx: the serialized transaction, hex or bytes
+        :param needs: fields read by the observers (model.FIELDS), None for all of them.
+                      Inputs and outputs skip the asm rendering and the addresses derivation nobody needs,
+                      json leaves them out (asm None, no addresses nor reqSigs). They're still
+                      decoded if accessed anyway.
+        :param scripts: decode_scripts() of the same transaction, decoded elsewhere (a parse worker process):
+                        inputs and outputs are built on it instead of decoding their scripts again
+        """
         self._hex = hextx
         self._txid = txid
-        self.__json_obj = None
+        self.__raw = None
         self.__network = network
+        self.__needs = needs
+        self.__scripts = scripts
         meta = meta if meta else dict()
         self.__parent_block = meta.get('parent_block')
 
     def _deserialize(self):
-        if not self.__json_obj:
-            self.__json_obj = deserialize(self._hex)
+        if not self.__raw:
+            self.__raw = RawTransaction(binascii.unhexlify(self._hex) if isinstance(self._hex, str) else self._hex)
 
     @property
     def json(self):
         self._deserialize()
         decoderawtransaction = {"txid" : self.txid,
-                                "version" : self.__json_obj.get('version'),
-			                    "locktime" : self.__json_obj.get('locktime'),
+                                "version" : self.__raw.version,
+			                    "locktime" : self.__raw.locktime,
 			                    "vin" : [],
 			                    "vout" : []
 			                    }
@@ -34,7 +152,7 @@ class PyBitcoinToolsTransaction(Transaction):
     @property
     def is_coinbase(self):
         self._deserialize()
-        return bool(VINDecoder.decode(self.__json_obj.get('ins')[0]).get('coinbase'))
+        return self.__raw.is_coinbase()
 
     @property
     def txid(self):
@@ -43,38 +161,122 @@ class PyBitcoinToolsTransaction(Transaction):
     @property
     def version(self):
         self._deserialize()
-        return self.__json_obj.get('version')
+        return self.__raw.version
 
     @property
     def locktime(self):
         self._deserialize()
-        return self.__json_obj.get('locktime')
+        return self.__raw.locktime
 
     @property
     def vin(self):
         self._deserialize()
-        return (PyBitcoinToolsVin(vin, self.txid) for vin in self.__json_obj.get('ins'))
+        if self.__scripts is not None:
+            return (PyBitcoinToolsVin(vin, self.txid, needs=self.__needs, asm=asm)
+                    for vin, asm in zip(self.__raw.ins, self.__scripts[0]))
+        return (PyBitcoinToolsVin(vin, self.txid, needs=self.__needs) for vin in self.__raw.ins)
 
     @property
     def vout(self):
         self._deserialize()
+        entries = self.__scripts[1] if self.__scripts is not None else None
         i = 0
-        for vout in self.__json_obj.get('outs'):
-            yield PyBitcoinToolsVout(vout, i, self.__network, self.txid)
+        for vout in self.__raw.outs:
+            yield PyBitcoinToolsVout(vout, i, self.__network, self.txid, needs=self.__needs,
+                                     entry=entries and entries[i])
             i += 1
 
+    def decode_scripts(self):
+        """
+        Decodes the inputs and outputs scripts as needs asks.
+        :return: ((scriptSig asm, ...), (scriptPubKey ScriptEntry, ...)), tuples of strings: cheap to pickle,
+                 to build the transaction in another process with scripts
+        """
+        return tuple(vin._asm_or_none() for vin in self.vin), tuple(vout._entry() for vout in self.vout)
+
+    def raw_outputs(self):
+        self._deserialize()
+        data = self.__raw.data
+        return [(struct.unpack_from('<Q', data, offset)[0], bytes(data[start:end]))
+                for offset, start, end in self.__raw.outputs]
+
+    def raw_inputs(self):
+        self._deserialize()
+        data = self.__raw.data
+        return [bytes(data[offset:offset + 36]) for offset, start, end in self.__raw.inputs]
+
     @property
     def parent(self):
         return self.__parent_block
 
+class PyBitcoinToolsScriptSig(ScriptSig):
+    __slots__ = ('__vin',)
+
+    def __init__(self, vin):
+        self.__vin = vin
+
+    @property
+    def hex(self):
+        script_sig = self.__vin._decoded.get('scriptSig')
+        return script_sig and script_sig.get('hex')
+
+    @property
+    def asm(self):
+        return self.__vin._asm()
+
+
+class PyBitcoinToolsScriptPubKey(ScriptPubKey):
+    __slots__ = ('__vout',)
+
+    def __init__(self, vout):
+        self.__vout = vout
+
+    @property
+    def asm(self):
+        return self.__vout._asm()
+
+    @property
+    def hex(self):
+        return self.__vout._decoded['scriptPubKey'].get('hex')
+
+    @property
+    def reqSigs(self):
+        return self.__vout._addresses().get('reqSigs')
+
+    @property
+    def type(self):
+        return self.__vout._decoded['scriptPubKey'].get('type')
+
+    @property
+    def addresses(self):
+        return self.__vout._addresses().get('addresses')
+
+
 class PyBitcoinToolsVin(Vin):
-    def __init__(self, vin, parent_tx):
+    __slots__ = ('__json_obj', '_vin', '__parent_tx', '__script_sig', '__needs', '__asm')
+
+    def __init__(self, vin, parent_tx, needs=None, asm=None):
+        """
+        :param asm: scriptSig asm, if already rendered
+        """
         self.__json_obj = None
         self._vin = vin
         self.__parent_tx = parent_tx
+        self.__script_sig = None
+        self.__needs = needs
+        self.__asm = asm
 
     @property
     def json(self):
+        if self.__needs is None or 'vin.asm' in self.__needs:
+            self._asm()
+        return self._decoded
+
+    @property
+    def _decoded(self):
+        """
+        json, with scriptSig.asm still None if not rendered yet
+        """
         self._deserialize()
         return self.__json_obj
 
@@ -84,28 +286,30 @@ class PyBitcoinToolsVin(Vin):
 
     def _deserialize(self):
         if not self.__json_obj:
-            self.__json_obj = VINDecoder.decode(self._vin)
-
-    @property
-    def scriptSig(self):
-        self._deserialize()
-        class ScriptSig:
-            def __init__(self, up):
-                self.up = up
+            self.__json_obj = VINDecoder.decode(self._vin, asm=False)
+            if self.__asm is not None:
+                self.__json_obj['scriptSig']['asm'] = self.__asm
 
-            @property
-            def hex(self):
-                self.up._deserialize()
-                try: return self.up.json.get('scriptSig').get('hex')
-                except AttributeError: return None
+    def _asm_or_none(self):
+        """
+        scriptSig asm if needs asks for it, None otherwise
+        """
+        return self._asm() if self.__needs is None or 'vin.asm' in self.__needs else None
 
-            @property
-            def asm(self):
-                self.up._deserialize()
-                try: return self.up.json.get('scriptSig').get('asm')
-                except AttributeError: return None
+    def _asm(self):
+        self._deserialize()
+        script_sig = self.__json_obj.get('scriptSig')
+        if script_sig is None:
+            return None
+        if script_sig['asm'] is None:
+            script_sig['asm'] = vin_asm(script_bytes(self._vin))
+        return script_sig['asm']
 
-        return ScriptSig(self)
+    @property
+    def scriptSig(self):
+        if self.__script_sig is None:
+            self.__script_sig = PyBitcoinToolsScriptSig(self)
+        return self.__script_sig
 
     @property
     def sequence(self):
@@ -128,15 +332,37 @@ class PyBitcoinToolsVin(Vin):
         return self.__json_obj.get('coinbase')
 
 class PyBitcoinToolsVout(Vout):
-    def __init__(self, vout, n, network, parent_tx):
+    __slots__ = ('__json_obj', '_vout', '_n', '__network', '__parent_tx', '__script_pub_key', '__needs',
+                 '__with_addresses', '__entry')
+
+    def __init__(self, vout, n, network, parent_tx, needs=None, entry=None):
+        """
+        :param entry: ScriptEntry of the script, if already decoded: addresses None if not derived
+        """
         self.__json_obj = None
         self._vout = vout
         self._n = n
         self.__network = network
         self.__parent_tx = parent_tx
+        self.__script_pub_key = None
+        self.__needs = needs
+        self.__entry = entry
+        if entry is not None:
+            self.__with_addresses = entry.addresses is not None
+        else:
+            self.__with_addresses = needs is None or 'vout.addresses' in needs or 'vout.reqSigs' in needs
 
     @property
     def json(self):
+        if self.__needs is None or 'vout.asm' in self.__needs:
+            self._asm()
+        return self._decoded
+
+    @property
+    def _decoded(self):
+        """
+        json, with scriptPubKey.asm still None if not rendered yet
+        """
         self._deserialize()
         return self.__json_obj
 
@@ -146,48 +372,56 @@ class PyBitcoinToolsVout(Vout):
 
     def _deserialize(self):
         if not self.__json_obj:
-            self.__json_obj = VOUTDecoder.decode(self._vout, self._n, self.__network)
+            if self.__entry is not None:
+                self.__json_obj = VOUTDecoder.from_entry(self._vout, self._n, self.__entry,
+                                                         addresses=self.__with_addresses)
+            else:
+                self.__json_obj = VOUTDecoder.decode(self._vout, self._n, self.__network, asm=False,
+                                                     addresses=self.__with_addresses)
+
+    def _entry(self):
+        """
+        ScriptEntry of the script, decoded as needs asks
+        """
+        script_pub_key = self.json['scriptPubKey']
+        return ScriptEntry(script_pub_key['type'], script_pub_key.get('reqSigs'),
+                           tuple(script_pub_key.get('addresses', ())) if self.__with_addresses else None,
+                           script_pub_key['asm'])
+
+    def _addresses(self):
+        """
+        scriptPubKey, deriving the addresses left out by needs
+        """
+        self._deserialize()
+        if not self.__with_addresses:
+            asm = self.__json_obj['scriptPubKey']['asm']
+            self.__json_obj = VOUTDecoder.decode(self._vout, self._n, self.__network, asm=False)
+            self.__json_obj['scriptPubKey']['asm'] = asm
+            self.__with_addresses = True
+        return self.__json_obj['scriptPubKey']
+
+    def _asm(self):
+        self._deserialize()
+        script_pub_key = self.__json_obj['scriptPubKey']
+        if script_pub_key['asm'] is None:
+            script_pub_key['asm'] = VOUTDecoder.asm(script_bytes(self._vout), self.__network,
+                                                    script_pub_key['type'] == 'nulldata')
+        return script_pub_key['asm']
 
     @property
     def value(self):
-        self._deserialize()
-        return Decimal('{0:.8f}'.format(self.__json_obj.get('value')))
+        return satoshis_to_btc(self._vout['value'])
+
+    @property
+    def value_sat(self):
+        return self._vout['value']
 
     @property
     def n(self):
-        self._deserialize()
-        return self.__json_obj.get('n')
+        return self._n
 
     @property
     def scriptPubKey(self):
-        self._deserialize()
-        class ScriptPubKey:
-            def __init__(self, up):
-                self.up = up
-                self.up._deserialize()
-
-            @property
-            def asm(self):
-                try: return self.up.json.get('scriptPubKey').get('asm')
-                except AttributeError: return None
-
-            @property
-            def hex(self):
-                try: return self.up.json.get('scriptPubKey').get('hex')
-                except AttributeError: return None
-
-            @property
-            def reqSigs(self):
-                try: return self.up.json.get('scriptPubKey').get('reqSigs')
-                except AttributeError: return None
-
-            @property
-            def type(self):
-                try: return self.up.json.get('scriptPubKey').get('type')
-                except AttributeError: return None
-
-            @property
-            def addresses(self):
-                try: return self.up.json.get('scriptPubKey').get('addresses')
-                except AttributeError: return None
-        return ScriptPubKey(self)
+        if self.__script_pub_key is None:
+            self.__script_pub_key = PyBitcoinToolsScriptPubKey(self)
+        return self.__script_pub_key
@@ -0,0 +1,121 @@
+from collections import OrderedDict, namedtuple
+import threading
+
+# approximate size of an entry beyond its strings and script: key and entry tuples, ordered dict link
+ENTRY_OVERHEAD = 320
+
+
+class ScriptEntry(namedtuple('ScriptEntry', ['type', 'reqSigs', 'addresses', 'asm'])):
+    """
+    Decoded scriptPubKey: addresses is a tuple, None if not derived yet (see VOUTDecoder.decode addresses),
+    asm None if not rendered yet.
+    """
+    __slots__ = ()
+
+    def size(self, script):
+        return len(script) + ENTRY_OVERHEAD + len(self.asm or '') + sum(len(a) + 50 for a in self.addresses or ())
+
+
+class ScriptCache:
+    """
+    Bounded LRU of decoded output scripts, keyed by (script bytes, network): reused addresses and
+    P2SH scripts are decoded once. Evicts the least recently used entries over maxbytes (approximate
+    size of scripts, addresses and asm). maxbytes=0 disables it.
+    Thread safe: PipelinedScanner parse workers share it.
+    """
+    def __init__(self, maxbytes=32 * 2**20):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, script, network, addresses=False, asm=False):
+        """
+        :param addresses: entries without addresses are misses
+        :param asm: entries without asm are misses
+        :return: ScriptEntry, None on misses
+        """
+        key = (bytes(script), network)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or addresses and entry.addresses is None or asm and entry.asm is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return entry
+
+    def put(self, script, network, script_pub_key, addresses=True):
+        """
+        Stores (or completes) the entry of script from a decoded scriptPubKey.
+        :param addresses: False if script_pub_key was decoded without addresses
+        """
+        if not self.maxbytes:
+            return
+        key = (bytes(script), network)
+        with self.__lock:
+            old = self.__entries.get(key)
+            if addresses:
+                entry = ScriptEntry(script_pub_key['type'], script_pub_key.get('reqSigs'),
+                                    tuple(script_pub_key.get('addresses', ())), script_pub_key['asm'])
+            else:
+                entry = ScriptEntry(script_pub_key['type'], old and old.reqSigs, old and old.addresses,
+                                    script_pub_key['asm'])
+            if entry.asm is None and old is not None:
+                entry = entry._replace(asm=old.asm)
+            self.__store(key, old, entry)
+
+    def put_asm(self, script, network, asm):
+        """
+        Adds the rendered asm to the entry of script, if cached.
+        """
+        key = (bytes(script), network)
+        with self.__lock:
+            old = self.__entries.get(key)
+            if old is not None and old.asm is None:
+                self.__store(key, old, old._replace(asm=asm))
+
+    def __store(self, key, old, entry):
+        """
+        Called with the lock held
+        """
+        if old is not None:
+            self.bytes -= old.size(key[0])
+        self.__entries[key] = entry
+        self.__entries.move_to_end(key)
+        self.bytes += entry.size(key[0])
+        while self.bytes > self.maxbytes and self.__entries:
+            evicted_key, evicted = self.__entries.popitem(last=False)
+            self.bytes -= evicted.size(evicted_key[0])
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self.__lock:
+            return {'entries': len(self.__entries),
+                    'bytes': self.bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': self.hit_rate,
+                    'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+script_cache = ScriptCache()
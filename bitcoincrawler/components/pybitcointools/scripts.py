@@ -1,3 +1,5 @@
+import binascii
+
 # TODO - Review
 
 SCRIPTS = {0: "0",
@@ -133,4 +135,98 @@ SCRIPTS = {0: "0",
            182: "OP_NOP7",
            183: "OP_NOP8",
            184: "OP_NOP9",
-           185: "OP_NOP10"}
\ No newline at end of file
+           185: "OP_NOP10"}
+
+def _opcode_name(code, vin):
+    if code == 0 or code == 80:
+        return '0'
+    elif code == 79:
+        return '-1' if vin else 'OP_UNKNOWN'
+    elif code <= 96:
+        return str(code - 80)
+    elif vin and 128 < code and code not in range(139, 176):
+        return str(128 - code)
+    return SCRIPTS.get(code, 'OP_UNKNOWN')
+
+# ASM of every non push opcode, for output and input scripts (input scripts render some opcodes as numbers)
+VOUT_OPCODES = [_opcode_name(code, False) for code in range(0, 256)]
+VIN_OPCODES = [_opcode_name(code, True) for code in range(0, 256)]
+
+
+def _vin_push(data, single):
+    """
+    ASM of data pushed in an input script: small values as numbers (or their opcode name), the others as hex.
+    :param single: data is the only token of the script
+    """
+    if not data:
+        return '0'
+    value = int.from_bytes(data, 'big')
+    if 128 < value < 256 and value not in range(139, 176):
+        return str(128 - value)
+    elif not single and value in SCRIPTS:
+        return SCRIPTS[value]
+    value = int.from_bytes(data, 'little')
+    return str(value) if value < 1418797546 else binascii.hexlify(data).decode('utf-8')
+
+# ASM of one byte pushes in input scripts
+VIN_PUSH1 = [_vin_push(bytes((b,)), False) for b in range(0, 256)]
+
+
+def _nulldata_push(data):
+    return str(int.from_bytes(data, 'little')) if len(data) <= 4 else binascii.hexlify(data).decode('utf-8')
+
+
+def iter_script(script):
+    """
+    Walks a raw script once, like deserialize_script: truncated pushes yield the available bytes.
+    :return: (opcode, pushed data or None)
+    """
+    pos, size = 0, len(script)
+    while pos < size:
+        code = script[pos]
+        if 0 < code <= 75:
+            yield code, script[pos + 1:pos + 1 + code]
+            pos += 1 + code
+        elif 76 <= code <= 78:
+            szsz = 1 << (code - 76)
+            sz = int.from_bytes(script[pos + 1:pos + 1 + szsz], 'little')
+            yield code, script[pos + 1 + szsz:pos + 1 + szsz + sz]
+            pos += 1 + szsz + sz
+        else:
+            yield code, None
+            pos += 1
+
+
+def vout_asm(script, nulldata=False):
+    """
+    :param script: raw output script, bytes or memoryview
+    :param nulldata: OP_RETURN scripts render small pushes as numbers
+    """
+    tokens = []
+    for code, data in iter_script(script):
+        if data is None:
+            tokens.append(VOUT_OPCODES[code])
+        elif nulldata:
+            tokens.append(_nulldata_push(bytes(data)))
+        else:
+            tokens.append(binascii.hexlify(data).decode('utf-8'))
+    return ' '.join(tokens)
+
+
+def vin_asm(script):
+    """
+    :param script: raw input script, bytes or memoryview
+    """
+    tokens = []
+    last = None
+    for code, data in iter_script(script):
+        if data is None:
+            tokens.append(VIN_OPCODES[code])
+        elif len(data) == 1:
+            tokens.append(VIN_PUSH1[data[0]])
+        else:
+            tokens.append(_vin_push(bytes(data), False))
+        last = data
+    if len(tokens) == 1 and last is not None:
+        tokens[0] = _vin_push(bytes(last), True)
+    return ' '.join(tokens)
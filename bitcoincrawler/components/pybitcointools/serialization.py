@@ -0,0 +1,228 @@
+"""
+Bitcoin wire format helpers: block headers and transaction boundaries, straight from bytes.
+"""
+from hashlib import sha256
+import binascii
+import struct
+
+HEADER_SIZE = 80
+
+
+def double_sha256(data):
+    return sha256(sha256(data).digest()).digest()
+
+
+def hash_to_hex(h):
+    """
+    Hashes are displayed (rpc, explorers) in reversed byte order
+    """
+    return binascii.hexlify(h[::-1]).decode('utf-8')
+
+
+def read_varint(data, offset):
+    """
+    :return: (value, offset of the first byte after the varint)
+    """
+    prefix = data[offset]
+    if prefix < 0xfd:
+        return prefix, offset + 1
+    elif prefix == 0xfd:
+        return struct.unpack_from('<H', data, offset + 1)[0], offset + 3
+    elif prefix == 0xfe:
+        return struct.unpack_from('<I', data, offset + 1)[0], offset + 5
+    return struct.unpack_from('<Q', data, offset + 1)[0], offset + 9
+
+
+def bits_to_difficulty(bits):
+    """
+    Same floating point steps of bitcoind GetDifficulty()
+    """
+    shift = (bits >> 24) & 0xff
+    difficulty = float(0x0000ffff) / float(bits & 0x00ffffff)
+    while shift < 29:
+        difficulty *= 256.0
+        shift += 1
+    while shift > 29:
+        difficulty /= 256.0
+        shift -= 1
+    return difficulty
+
+
+def parse_header(data, offset=0):
+    header = bytes(data[offset:offset + HEADER_SIZE])
+    version, prev_hash, merkleroot, time, bits, nonce = struct.unpack('<I32s32sIII', header)
+    return {'hash': hash_to_hex(double_sha256(header)),
+            'version': version,
+            'previousblockhash': hash_to_hex(prev_hash),
+            'merkleroot': hash_to_hex(merkleroot),
+            'time': time,
+            'bits': '{:08x}'.format(bits),
+            'nonce': nonce,
+            'difficulty': bits_to_difficulty(bits)}
+
+
+def split_transaction(data, offset):
+    """
+    Walks a serialized transaction, segwit included.
+    :return: (txid, non-witness serialization, offset of the first byte after the transaction)
+    """
+    start = offset
+    offset += 4
+    segwit = data[offset] == 0 and data[offset + 1] != 0
+    if segwit:
+        offset += 2
+    body_start = offset
+    n_in, offset = read_varint(data, offset)
+    for _ in range(0, n_in):
+        script_len, offset = read_varint(data, offset + 36)
+        offset += script_len + 4
+    n_out, offset = read_varint(data, offset)
+    for _ in range(0, n_out):
+        script_len, offset = read_varint(data, offset + 8)
+        offset += script_len
+    body_end = offset
+    if segwit:
+        for _ in range(0, n_in):
+            items, offset = read_varint(data, offset)
+            for _ in range(0, items):
+                item_len, offset = read_varint(data, offset)
+                offset += item_len
+    offset += 4
+    if segwit:
+        tx = bytes(data[start:start + 4]) + bytes(data[body_start:body_end]) + bytes(data[offset - 4:offset])
+    else:
+        tx = bytes(data[start:offset])
+    return hash_to_hex(double_sha256(tx)), tx, offset
+
+
+def split_transactions(data, offset=HEADER_SIZE):
+    """
+    :return: [(txid, non-witness serialization), ...] for every transaction of a serialized block
+    """
+    data = memoryview(data)
+    count, offset = read_varint(data, offset)
+    txs = []
+    for _ in range(0, count):
+        txid, tx, offset = split_transaction(data, offset)
+        txs.append((txid, tx))
+    return txs
+
+
+class RawTransaction:
+    """
+    A serialized transaction (segwit included), walked once to record the offsets of inputs, outputs and
+    scripts. Fields are sliced out of the buffer only when accessed.
+    """
+    __slots__ = ('data', 'start', 'segwit', 'inputs', 'outputs', 'locktime_offset', 'end')
+
+    def __init__(self, data, offset=0):
+        """
+        :param data: bytes-like (bytes, memoryview, mmap...), not copied
+        """
+        self.data = data = memoryview(data)
+        self.start = offset
+        offset += 4
+        self.segwit = data[offset] == 0 and data[offset + 1] != 0
+        if self.segwit:
+            offset += 2
+        n_in, offset = read_varint(data, offset)
+        self.inputs = []
+        for _ in range(0, n_in):
+            script_len, script_start = read_varint(data, offset + 36)
+            self.inputs.append((offset, script_start, script_start + script_len))
+            offset = script_start + script_len + 4
+        n_out, offset = read_varint(data, offset)
+        self.outputs = []
+        for _ in range(0, n_out):
+            script_len, script_start = read_varint(data, offset + 8)
+            self.outputs.append((offset, script_start, script_start + script_len))
+            offset = script_start + script_len
+        if self.segwit:
+            for _ in range(0, n_in):
+                items, offset = read_varint(data, offset)
+                for _ in range(0, items):
+                    item_len, offset = read_varint(data, offset)
+                    offset += item_len
+        self.locktime_offset = offset
+        self.end = offset + 4
+
+    @property
+    def version(self):
+        return struct.unpack_from('<I', self.data, self.start)[0]
+
+    @property
+    def locktime(self):
+        return struct.unpack_from('<I', self.data, self.locktime_offset)[0]
+
+    @property
+    def ins(self):
+        return [RawInput(self, i) for i in range(0, len(self.inputs))]
+
+    @property
+    def outs(self):
+        return [RawOutput(self, i) for i in range(0, len(self.outputs))]
+
+    def is_coinbase(self):
+        outpoint = self.inputs[0][0]
+        return not any(self.data[outpoint:outpoint + 32])
+
+
+class RawInput:
+    """
+    Lazy view on an input, readable as the pybitcointools deserialize() dict:
+    {'outpoint': {'hash': .., 'index': ..}, 'script': hex, 'sequence': ..}
+    """
+    __slots__ = ('tx', 'offset', 'script_start', 'script_end')
+
+    def __init__(self, tx, i):
+        self.tx = tx
+        self.offset, self.script_start, self.script_end = tx.inputs[i]
+
+    @property
+    def script_bytes(self):
+        return self.tx.data[self.script_start:self.script_end]
+
+    def __getitem__(self, key):
+        data = self.tx.data
+        if key == 'outpoint':
+            return {'hash': hash_to_hex(bytes(data[self.offset:self.offset + 32])),
+                    'index': struct.unpack_from('<I', data, self.offset + 32)[0]}
+        elif key == 'script':
+            return binascii.hexlify(self.script_bytes).decode('utf-8')
+        elif key == 'sequence':
+            return struct.unpack_from('<I', data, self.script_end)[0]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class RawOutput:
+    """
+    Lazy view on an output, readable as the pybitcointools deserialize() dict: {'value': satoshis, 'script': hex}
+    """
+    __slots__ = ('tx', 'offset', 'script_start', 'script_end')
+
+    def __init__(self, tx, i):
+        self.tx = tx
+        self.offset, self.script_start, self.script_end = tx.outputs[i]
+
+    @property
+    def script_bytes(self):
+        return self.tx.data[self.script_start:self.script_end]
+
+    def __getitem__(self, key):
+        if key == 'value':
+            return struct.unpack_from('<Q', self.tx.data, self.offset)[0]
+        elif key == 'script':
+            return binascii.hexlify(self.script_bytes).decode('utf-8')
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
@@ -1,7 +1,33 @@
 import asyncio
+from itertools import islice
 
 @asyncio.coroutine
 def chain(obj, *funcs):
     for f in funcs:
         obj = yield from f(obj)
-    return obj
\ No newline at end of file
+    return obj
+
+class AsyncIterator:
+    """
+    Async iterator over the results of next_item, a coroutine function returning None at the end
+    """
+    def __init__(self, next_item):
+        self.__next_item = next_item
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        item = yield from self.__next_item()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+def chunks(iterable, size):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
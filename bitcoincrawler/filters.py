@@ -0,0 +1,165 @@
+import binascii
+import struct
+
+from bitcoincrawler.components.columns import SCRIPT_TYPES
+from bitcoincrawler.components.pybitcointools.addresses import address_cache, b58check_decode
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder, _is_valid_pubkey, _multisig_pubkeys
+
+# address version bytes, main and test networks
+PUBKEYHASH_VERSIONS = (0x00, 0x6F)
+SCRIPTHASH_VERSIONS = (0x05, 0xC4)
+
+
+def address_script(address):
+    """
+    :return: the scriptPubKey paying a P2PKH or P2SH address, whatever its network
+    :raise ValueError: not a P2PKH/P2SH base58check address
+    """
+    return _address_script(address, *b58check_decode(address))
+
+
+def _address_script(address, version, h):
+    if len(h) == 20 and version in PUBKEYHASH_VERSIONS:
+        return b'\x76\xa9\x14' + h + b'\x88\xac'
+    elif len(h) == 20 and version in SCRIPTHASH_VERSIONS:
+        return b'\xa9\x14' + h + b'\x87'
+    raise ValueError('unsupported address', 'address_script', address)
+
+
+def op_return_data(script):
+    """
+    :return: the data pushed right after OP_RETURN (b'' without push), None if script is not OP_RETURN
+    """
+    if not script or script[0] != 0x6a:
+        return None
+    if len(script) < 2:
+        return b''
+    op = script[1]
+    if op <= 0x4b:
+        return bytes(script[2:2 + op])
+    elif op == 0x4c and len(script) > 2:
+        return bytes(script[3:3 + script[2]])
+    elif op == 0x4d and len(script) > 3:
+        return bytes(script[4:4 + (script[2] | script[3] << 8)])
+    return b''
+
+
+class OutputFilter:
+    """
+    Outputs an observer wants, matched on their value and raw script before any output is built
+    or decoded. Every given criterion must match:
+    addresses        P2PKH/P2SH addresses: outputs paying them, P2PK and bare multisig outputs whose
+                     keys hash to a watched P2PKH address included (as VOUTDecoder derives their addresses).
+                     Watched addresses are kept as the scripts paying them, in a set: a lookup per output,
+                     whatever the watch-list size.
+    script_types     types as VOUTDecoder.script_type classifies the script
+    min_value        satoshis
+    op_return_prefix bytes (or hex) the data of OP_RETURN outputs starts with
+
+    Observers in outputs_observers declare it as `output_filter`:
+    class Watcher(OutputObserver):
+        output_filter = OutputFilter(addresses=watch_list)
+    and get on_output (on_outputs) for the matching outputs only.
+    """
+    def __init__(self, addresses=None, script_types=None, min_value=None, op_return_prefix=None):
+        self.scripts = None
+        self.pubkey_addresses = None
+        if addresses is not None:
+            scripts, pubkey_addresses = set(), set()
+            for address in addresses:
+                version, h = b58check_decode(address)
+                scripts.add(_address_script(address, version, h))
+                if version == 0x00:
+                    # P2PK and multisig outputs addresses are main network P2PKH ones
+                    pubkey_addresses.add(address)
+            self.scripts = frozenset(scripts)
+            self.pubkey_addresses = frozenset(pubkey_addresses) or None
+        if script_types is not None:
+            unknown = set(script_types) - set(SCRIPT_TYPES)
+            if unknown:
+                raise ValueError('unknown script types', 'OutputFilter', sorted(unknown))
+            script_types = frozenset(script_types)
+        self.script_types = script_types
+        self.min_value = min_value
+        if isinstance(op_return_prefix, str):
+            op_return_prefix = binascii.unhexlify(op_return_prefix)
+        self.op_return_prefix = op_return_prefix
+
+    def match(self, value, script):
+        """
+        :param value: satoshis
+        :param script: scriptPubKey bytes
+        """
+        if self.min_value is not None and value < self.min_value:
+            return False
+        if self.op_return_prefix is not None:
+            data = op_return_data(script)
+            if data is None or not data.startswith(self.op_return_prefix):
+                return False
+        if self.script_types is not None and VOUTDecoder.script_type(script) not in self.script_types:
+            return False
+        if self.scripts is not None and script not in self.scripts:
+            return self.__pays_pubkey(script)
+        return True
+
+    def __pays_pubkey(self, script):
+        """
+        P2PK and bare multisig scripts with a key hashing to a watched P2PKH address, through address_cache
+        """
+        if self.pubkey_addresses is None \
+                or not (len(script) in (35, 67) and script[-1] == 0xac or script and script[-1] == 0xae):
+            return False
+        script_type = VOUTDecoder.template_type(script)
+        if script_type == 'pubkey':
+            keys = [script[1:-1]]
+        elif script_type == 'multisig':
+            keys = _multisig_pubkeys(script)
+        else:
+            return False
+        return any(_is_valid_pubkey(k) and address_cache.address(k, 0x00) in self.pubkey_addresses for k in keys)
+
+    def select(self, outputs):
+        """
+        :param outputs: Transaction.raw_outputs()
+        :return: indexes of the matching outputs
+        """
+        if self.scripts is not None and self.min_value is None and self.script_types is None \
+                and self.op_return_prefix is None:
+            scripts, pays_pubkey = self.scripts, self.__pays_pubkey
+            return [i for i, (value, script) in enumerate(outputs) if script in scripts or pays_pubkey(script)]
+        match = self.match
+        return [i for i, (value, script) in enumerate(outputs) if match(value, script)]
+
+
+class InputFilter:
+    """
+    Inputs an observer wants: the ones spending watched outpoints, matched on the serialized
+    outpoint before any input is built.
+    Observers in inputs_observers declare it as `input_filter`, and get on_input (on_inputs) for
+    the matching inputs only.
+    """
+    def __init__(self, outpoints):
+        """
+        :param outpoints: iterable of (txid, n)
+        """
+        self.outpoints = frozenset(binascii.unhexlify(txid)[::-1] + struct.pack('<I', n) for txid, n in outpoints)
+
+    def match(self, outpoint):
+        return outpoint in self.outpoints
+
+    def select(self, inputs):
+        """
+        :param inputs: Transaction.raw_inputs()
+        :return: indexes of the matching inputs
+        """
+        outpoints = self.outpoints
+        return [i for i, outpoint in enumerate(inputs) if outpoint in outpoints]
+
+
+def filter_of(observer, name):
+    """
+    :param name: 'output_filter' or 'input_filter'
+    :return: the filter observer declares as name, None if it has none
+    """
+    f = getattr(observer, name, None)
+    return f if isinstance(f, (OutputFilter, InputFilter)) else None
@@ -1,7 +1,13 @@
 import asyncio
+from time import perf_counter
+from bitcoincrawler.blockchain_scanner import _TransactionDispatch, _split_items_observers
 
-class MempoolInspector:
-    def __init__(self, node_backend, async=True, limit=None):
+class MempoolInspector(_TransactionDispatch):
+    def __init__(self, node_backend, async=True, limit=None, profiler=None):
+        """
+        :param profiler: a profiling.ScanProfiler: every inspect() is a "block", fetch being the mempool
+                         transactions retrieval
+        """
         self.limit = limit
         self.node_backend = node_backend
         self.mempool_txs = {}
@@ -11,46 +17,43 @@ class MempoolInspector:
         self.transaction_part_mempool_observers = []
         self.inputs_part_mempool_observers = []
         self.outputs_part_mempool_observers = []
+        self._join_observers = None
+        self._part_observers = None
 
         if async:
             self.loop = asyncio.get_event_loop()
         else:
             self.loop = None
 
-    def _notify_transaction(self, cur_tx, tx_observers, in_observers, out_observers):
-        for n in tx_observers:
-            if self.loop:
-                self.loop.run_until_complete(asyncio.coroutine(lambda: n.on_transaction(cur_tx))())
-            else:
-                n.on_transaction(cur_tx)
+        self.profiler = profiler
+        if profiler:
+            self._profile_transactions()
 
-        if len(in_observers) > 0:
-            for vin in cur_tx.vin:
-                for i_n in in_observers:
-                    if self.loop:
-                        self.loop.run_until_complete(asyncio.coroutine(lambda: i_n.on_input(vin))())
-                    else:
-                        i_n.on_input(vin)
+    def _call(self, method, *args):
+        if self.loop:
+            self.loop.run_until_complete(asyncio.coroutine(method)(*args))
+        else:
+            method(*args)
 
-        if len(out_observers) > 0:
-            for vout in cur_tx.vout:
-                for o_n in out_observers:
-                    if self.loop:
-                        self.loop.run_until_complete(asyncio.coroutine(lambda: o_n.on_output(vout))())
-                    else:
-                        o_n.on_output(vout)
+    def _split_observers(self):
+        """
+        Splits the observers as BitcoinScanner does (per item, bulk, filtered), once per inspect():
+        call it after changing the observers to notify transactions out of inspect().
+        """
+        self._join_observers = (self.transaction_join_mempool_observers,) + _split_items_observers(
+            self.inputs_join_mempool_observers, self.outputs_join_mempool_observers)
+        self._part_observers = (self.transaction_part_mempool_observers,) + _split_items_observers(
+            self.inputs_part_mempool_observers, self.outputs_part_mempool_observers)
 
     def notify_transaction_join_mempool(self, cur_tx):
-        self._notify_transaction(
-            cur_tx, self.transaction_join_mempool_observers,
-            self.inputs_join_mempool_observers, self.outputs_join_mempool_observers
-        )
+        if self._join_observers is None:
+            self._split_observers()
+        self._notify_transaction(cur_tx, *self._join_observers)
 
     def notify_transaction_part_mempool(self, cur_tx):
-        self._notify_transaction(
-            cur_tx, self.transaction_part_mempool_observers,
-            self.inputs_part_mempool_observers, self.outputs_part_mempool_observers
-        )
+        if self._part_observers is None:
+            self._split_observers()
+        self._notify_transaction(cur_tx, *self._part_observers)
 
     def inspect(self):
         notify_mempool_tx = lambda: len(self.transaction_join_mempool_observers) > 0 \
@@ -62,9 +65,14 @@ class MempoolInspector:
                                       or len(self.outputs_part_mempool_observers) > 0
 
         if notify_mempool_tx():
+            self._split_observers()
+            if self.profiler:
+                s = perf_counter()
             new_mempool = self.node_backend.btcd.get_raw_mempool().get('result')
             fetch = [txid for txid in new_mempool if txid not in self.mempool_txs.keys()]
             transactions = self.node_backend.get_transactions(fetch)
+            if self.profiler:
+                fetched = perf_counter()
             for tx in transactions:
                 self.mempool_txs[tx.txid] = tx
                 self.notify_transaction_join_mempool(tx)
@@ -72,4 +80,6 @@ class MempoolInspector:
                 diff = [tx for tx in self.mempool_txs if tx not in new_mempool]
                 for txid in diff:
                     self.notify_transaction_part_mempool(self.mempool_txs[txid])
-                    self.mempool_txs.pop(txid)
\ No newline at end of file
+                    self.mempool_txs.pop(txid)
+            if self.profiler:
+                self.profiler.block_done(None, fetched - s, perf_counter() - fetched)
\ No newline at end of file
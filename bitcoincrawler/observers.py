@@ -1,7 +1,16 @@
+from bitcoincrawler.components.model import FIELDS
+
+
 class BlockObserver(object):
     def on_block(self, block):
         raise NotImplementedError
 
+    def on_block_disconnected(self, block):
+        """
+        Follow mode: block, already notified with on_block, left the main chain
+        """
+        pass
+
 class TransactionObserver(object):
     def on_transaction(self, transaction):
         raise NotImplementedError
@@ -13,3 +22,63 @@ class InputObserver(object):
 class OutputObserver(object):
     def on_output(self, output):
         raise NotImplementedError
+
+class BlockTransactionsObserver(object):
+    def on_block_transactions(self, block, transactions):
+        """
+        Bulk on_transaction, once per block. Registered in transactions_observers: observers whose class
+        defines it get no on_transaction calls.
+        :param transactions: list of the block transactions
+        """
+        raise NotImplementedError
+
+class InputsObserver(object):
+    def on_inputs(self, transaction, inputs):
+        """
+        Bulk on_input, once per transaction. Registered in inputs_observers, in place of on_input.
+        Inputs are read from the serialization, no input is built.
+        :param inputs: [(n, outpoint), ...], outpoint as in Transaction.raw_inputs()
+        """
+        raise NotImplementedError
+
+class OutputsObserver(object):
+    def on_outputs(self, transaction, outputs):
+        """
+        Bulk on_output, once per transaction. Registered in outputs_observers, in place of on_output.
+        Outputs are read from the serialization, no output is built.
+        :param outputs: [(n, satoshis, script bytes), ...]
+        """
+        raise NotImplementedError
+
+class BlockColumnsObserver(object):
+    def on_block_columns(self, columns):
+        """
+        :param columns: BlockColumns of the block, built once for all the columns observers
+        """
+        raise NotImplementedError
+
+class MergeableObserver(object):
+    def merge(self, other):
+        """
+        Folds the state of other (same observer, scanned over a later range) into self.
+        Used by ShardedScanner to reduce the shards.
+        """
+        raise NotImplementedError
+
+
+def needs_of(observers):
+    """
+    Fields read by a set of observers, to be given to the factory (PyBitcoinToolsFactory needs=...):
+    observers declare them as a `needs` attribute, e.g. needs = {'vout.value', 'vout.addresses'}.
+    :return: the union of the declared fields, None (every field) if an observer has no needs
+    """
+    needs = set()
+    for observer in observers:
+        observer_needs = getattr(observer, 'needs', None)
+        if observer_needs is None:
+            return None
+        unknown = set(observer_needs) - FIELDS
+        if unknown:
+            raise ValueError('unknown fields', 'needs_of', sorted(unknown))
+        needs.update(observer_needs)
+    return frozenset(needs)
@@ -0,0 +1,272 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner, _bulk_inputs, _bulk_outputs, _selected, _split, \
+    _split_items_observers
+from bitcoincrawler.components.columns import BlockColumns
+from bitcoincrawler.components.model import BlockDisconnected
+
+STAGES = ('fetch', 'parse', 'dispatch')
+
+
+def _decode(vins, vouts, needs):
+    """
+    Decodes the fields of inputs and outputs the observers read: models decode them lazily, on first
+    access, that would be on the dispatch thread.
+    :param needs: the observers needs, None for every field
+    """
+    vin_asm = needs is None or 'vin.asm' in needs
+    vout_asm = needs is None or 'vout.asm' in needs
+    vout_addresses = needs is None or 'vout.addresses' in needs or 'vout.reqSigs' in needs
+    vout_type = vout_asm or vout_addresses or 'vout.type' in needs
+    for vin in vins:
+        if vin.coinbase is None and vin_asm:
+            vin.scriptSig.asm
+    for vout in vouts if vout_type else ():
+        script_pub_key = vout.scriptPubKey
+        script_pub_key.type
+        if vout_addresses:
+            script_pub_key.addresses
+        if vout_asm:
+            script_pub_key.asm
+
+
+class PipelinedScanner(BitcoinScanner):
+    """
+    BitcoinScanner with fetch, parse and dispatch in stages running at the same time:
+    fetch    a thread iterating blocks_generator (its own read ahead is the factory prefetch)
+    parse    parse_workers threads building the transactions, inputs and outputs (and BlockColumns) of
+             the fetched blocks: block.tx rpcs of BitcoindFactory blocks run here too, async factories
+             on an event loop of the worker thread
+    dispatch the thread calling scan(), notifying the observers, in blocks order
+    Parsed blocks wait in a queue of queue_size blocks: when observers fall behind, fetch and parse stop
+    there. Observers are called from one thread only, as with BitcoinScanner.
+
+    scanner = PipelinedScanner(factory.generate_blocks(blockheight=0), parse_workers=4, queue_size=16)
+    scanner.outputs_observers.append(observer)
+    scanner.scan()
+    scanner.stats()  # also during the scan, from another thread
+    """
+    def __init__(self, blocks_generator, parse_workers=2, queue_size=8, mempool_storage=None, checkpoint=None,
+                 factory=None):
+        super(PipelinedScanner, self).__init__(blocks_generator, mempool_storage=mempool_storage,
+                                               checkpoint=checkpoint, factory=factory)
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.__queue = None
+        self.__lock = threading.Lock()
+        self.__loops = []
+        self.__reset_stats()
+
+    def __reset_stats(self):
+        self.__busy = {stage: 0.0 for stage in STAGES}
+        self.__items = {stage: 0 for stage in STAGES}
+        self.__max_depth = 0
+        self.__started = None
+        self.__stopped = None
+
+    def __account(self, stage, elapsed):
+        with self.__lock:
+            self.__busy[stage] += elapsed
+            self.__items[stage] += 1
+
+    @property
+    def queue_depth(self):
+        """
+        Blocks fetched (being parsed or parsed) and not dispatched yet
+        """
+        return self.__queue.qsize() if self.__queue else 0
+
+    def stats(self):
+        """
+        :return: {'queue_depth': .., 'max_queue_depth': .., 'elapsed': seconds,
+                  stage: {'blocks': .., 'busy': seconds, 'utilization': busy / (elapsed * threads)}, ...}
+        """
+        if self.__started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.__stopped or time.time()) - self.__started
+        with self.__lock:
+            r = {'queue_depth': self.queue_depth, 'max_queue_depth': self.__max_depth, 'elapsed': elapsed}
+            for stage in STAGES:
+                threads = self.parse_workers if stage == 'parse' else 1
+                r[stage] = {'blocks': self.__items[stage],
+                            'busy': self.__busy[stage],
+                            'utilization': self.__busy[stage] / (elapsed * threads) if elapsed else 0.0}
+        return r
+
+    def __worker_loop(self):
+        """
+        Sets an event loop in the parse worker thread, if it has none yet: async factories run
+        their rpcs on asyncio.get_event_loop(). Closed at the end of the scan.
+        """
+        try:
+            asyncio.get_event_loop()
+        except RuntimeError:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            with self.__lock:
+                self.__loops.append(loop)
+
+    def _parse(self, cur_block, inputs, outputs, bulk_inputs=False, bulk_outputs=False,
+               filtered_inputs=(), filtered_outputs=(), needs=None):
+        """
+        Filters are evaluated here too, and the inputs and outputs fields in needs are decoded.
+        :param inputs: build the inputs, for on_input observers
+        :param bulk_inputs: read the raw inputs, for on_inputs observers
+        :param filtered_inputs: [(observer, InputFilter), ...]
+        :param filtered_outputs: [(observer, OutputFilter), ...]
+        :param needs: fields read by the observers (BitcoinScanner.needs), None for all of them
+        :return: (block, BlockColumns or None,
+                  [(tx, vins or None, vouts or None, bulk inputs or None, bulk outputs or None,
+                    selected inputs, selected outputs), ...] or None),
+                 bulk items as given by blockchain_scanner._bulk_inputs/_bulk_outputs,
+                 selections as given by blockchain_scanner._selected
+        """
+        s = time.time()
+        if isinstance(cur_block, BlockDisconnected):
+            return cur_block, None, None
+        self.__worker_loop()
+        columns = BlockColumns.from_block(cur_block) if self.columns_observers else None
+        txs = None
+        if self.transactions_observers or inputs or outputs or bulk_inputs or bulk_outputs \
+                or filtered_inputs or filtered_outputs:
+            txs = [(tx, list(tx.vin) if inputs else None, list(tx.vout) if outputs else None,
+                    _bulk_inputs(tx.raw_inputs()) if bulk_inputs else None,
+                    _bulk_outputs(tx.raw_outputs()) if bulk_outputs else None,
+                    _selected(tx, filtered_inputs, 'raw_inputs', 'vin'),
+                    _selected(tx, filtered_outputs, 'raw_outputs', 'vout'))
+                   for tx in cur_block.tx]
+            for tx, vins, vouts, bulk_vins, bulk_vouts, selected_vins, selected_vouts in txs:
+                _decode(vins or (), vouts or (), needs)
+                for n, selected in selected_vins:
+                    if not hasattr(type(n), 'on_inputs'):
+                        _decode(selected, (), needs)
+                for n, selected in selected_vouts:
+                    if not hasattr(type(n), 'on_outputs'):
+                        _decode((), selected, needs)
+        self.__account('parse', time.time() - s)
+        return cur_block, columns, txs
+
+    def __put(self, item, stop):
+        while not stop.is_set():
+            try:
+                self.__queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def __fetch(self, pool, stop, split, needs):
+        """
+        :param split: the inputs/outputs observers, as _split_items_observers splits them
+        :param needs: the observers needs
+        Whatever happens, queues the error (if any), then None.
+        """
+        inputs, outputs, bulk_inputs, bulk_outputs, filtered_inputs, filtered_outputs = split
+        blocks = None
+        try:
+            blocks = iter(self.blocks_generator)
+            while not stop.is_set():
+                s = time.time()
+                cur_block = next(blocks, None)
+                if cur_block is None:
+                    break
+                self.__account('fetch', time.time() - s)
+                self.__put(pool.submit(self._parse, cur_block, bool(inputs), bool(outputs),
+                                       bool(bulk_inputs), bool(bulk_outputs),
+                                       filtered_inputs, filtered_outputs, needs), stop)
+        except Exception as e:
+            error = Future()
+            error.set_exception(e)
+            self.__put(error, stop)
+        finally:
+            self.__put(None, stop)
+            if blocks is not None and stop.is_set() and hasattr(blocks, 'close'):
+                blocks.close()
+
+    def _dispatch(self, cur_block, columns, txs, tx_observers, bulk_tx_observers, in_observers,
+                  bulk_in_observers, out_observers, bulk_out_observers):
+        self._notify_block(cur_block)
+        for n in self.columns_observers:
+            n.on_block_columns(columns)
+        if txs is None:
+            return
+        if bulk_tx_observers:
+            self._notify_block_transactions(cur_block, [tx[0] for tx in txs], bulk_tx_observers)
+        for tx, vins, vouts, bulk_vins, bulk_vouts, selected_vins, selected_vouts in txs:
+            for n in tx_observers:
+                n.on_transaction(tx)
+            for n in bulk_in_observers:
+                n.on_inputs(tx, bulk_vins)
+            for vin in vins if in_observers else ():
+                for n in in_observers:
+                    n.on_input(vin)
+            for n, selected in selected_vins:
+                self._notify_selected(tx, n, selected, 'on_input', 'on_inputs')
+            for n in bulk_out_observers:
+                n.on_outputs(tx, bulk_vouts)
+            for vout in vouts if out_observers else ():
+                for n in out_observers:
+                    n.on_output(vout)
+            for n, selected in selected_vouts:
+                self._notify_selected(tx, n, selected, 'on_output', 'on_outputs')
+
+    def scan(self):
+        notify_tx = self.transactions_observers or self.inputs_observers or self.outputs_observers
+        if not (self.blocks_observers or self.columns_observers or notify_tx) or self.blocks_generator is None:
+            return
+        observers = self.observers
+        # computed here: a wrong observer (e.g. unknown needs) raises to the caller, before any thread starts
+        needs = self.needs
+        split = _split_items_observers(self.inputs_observers, self.outputs_observers)
+        tx_observers, bulk_tx_observers = _split(self.transactions_observers, 'on_block_transactions')
+        in_observers, out_observers, bulk_in_observers, bulk_out_observers = split[:4]
+        self._apply_needs()
+        if self.checkpoint:
+            self.checkpoint.restore(observers)
+        self.__reset_stats()
+        self.__queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=self.parse_workers)
+        fetcher = threading.Thread(target=self.__fetch, args=(pool, stop, split, needs), daemon=True)
+        self.__started = time.time()
+        fetcher.start()
+        prev_block = None
+        completed = False
+        try:
+            while True:
+                depth = self.__queue.qsize()
+                if depth > self.__max_depth:
+                    self.__max_depth = depth
+                parsed = self.__queue.get()
+                if parsed is None:
+                    break
+                cur_block, columns, txs = parsed.result()
+                s = time.time()
+                if isinstance(cur_block, BlockDisconnected):
+                    self._notify_block_disconnected(cur_block.block)
+                    continue
+                if self.checkpoint and prev_block is None:
+                    self._check_checkpoint(cur_block)
+                self._dispatch(cur_block, columns, txs, tx_observers, bulk_tx_observers, in_observers,
+                               bulk_in_observers, out_observers, bulk_out_observers)
+                prev_block = cur_block
+                if self.checkpoint:
+                    self.checkpoint.block_done(cur_block, observers)
+                self.__account('dispatch', time.time() - s)
+            if self.checkpoint and prev_block:
+                self.checkpoint.save(prev_block, observers)
+            completed = True
+        finally:
+            stop.set()
+            fetcher.join()
+            pool.shutdown()
+            for loop in self.__loops:
+                loop.close()
+            self.__loops = []
+            self.__stopped = time.time()
+            if self.checkpoint:
+                self.checkpoint.flush(raise_error=completed)
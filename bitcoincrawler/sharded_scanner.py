@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+
+_worker = {}
+
+
+def tx_count(block):
+    return len(block.json.get('tx') or ())
+
+
+def interpolate(samples, start, stop):
+    """
+    :param samples: [(height, tx count), ...] sorted by height
+    :return: estimated tx count for every height in [start, stop), linear between samples
+    """
+    heights = [height for height, count in samples]
+    counts = []
+    for height in range(start, stop):
+        j = bisect_right(heights, height) - 1
+        if j < 0:
+            counts.append(samples[0][1])
+        elif j >= len(samples) - 1:
+            counts.append(samples[-1][1])
+        else:
+            (h0, c0), (h1, c1) = samples[j], samples[j + 1]
+            counts.append(c0 + (c1 - c0) * (height - h0) / (h1 - h0))
+    return counts
+
+
+def plan_shards(start, stop, shards, tx_counts):
+    """
+    Splits [start, stop) in contiguous ranges with about the same transactions each.
+    :param tx_counts: (estimated) tx count of every height in [start, stop)
+    :return: [(start, stop), ...]
+    """
+    total = sum(tx_counts) or 1
+    bounds = []
+    acc, shard_start = 0, start
+    for offset, count in enumerate(tx_counts):
+        acc += count
+        if len(bounds) < shards - 1 and acc >= total * (len(bounds) + 1) / shards:
+            bounds.append((shard_start, start + offset + 1))
+            shard_start = start + offset + 1
+    if shard_start < stop:
+        bounds.append((shard_start, stop))
+    return bounds
+
+
+class WorkerStats(namedtuple('WorkerStats', ['worker', 'shards', 'blocks', 'transactions', 'elapsed'])):
+    @property
+    def throughput(self):
+        """
+        transactions per second
+        """
+        return self.transactions / self.elapsed if self.elapsed else 0.0
+
+
+class ShardCounter:
+    def __init__(self):
+        self.blocks = 0
+        self.transactions = 0
+
+    def on_block(self, block):
+        self.blocks += 1
+        self.transactions += tx_count(block)
+
+
+def _init_worker(make_factory, make_observers):
+    _worker['factory'] = make_factory()
+    _worker['make_observers'] = make_observers
+
+
+def _scan_shard(shard):
+    index, start, stop = shard
+    observers = _worker['make_observers']()
+    counter = ShardCounter()
+    scanner = BitcoinScanner(_worker['factory'].generate_blocks(blockheight=start, max_iterations=stop - start))
+    register(scanner, observers)
+    scanner.blocks_observers.append(counter)
+    s = time.time()
+    scanner.scan()
+    return index, observers, WorkerStats(os.getpid(), 1, counter.blocks, counter.transactions, time.time() - s)
+
+
+def register(scanner, observers):
+    """
+    Observers are bound to the scanner lists by the callbacks they implement, bulk ones
+    (on_block_transactions, on_inputs, on_outputs) included.
+    """
+    for observer in observers:
+        if hasattr(observer, 'on_block'):
+            scanner.blocks_observers.append(observer)
+        if hasattr(observer, 'on_transaction') or hasattr(observer, 'on_block_transactions'):
+            scanner.transactions_observers.append(observer)
+        if hasattr(observer, 'on_input') or hasattr(observer, 'on_inputs'):
+            scanner.inputs_observers.append(observer)
+        if hasattr(observer, 'on_output') or hasattr(observer, 'on_outputs'):
+            scanner.outputs_observers.append(observer)
+        if hasattr(observer, 'on_block_columns'):
+            scanner.columns_observers.append(observer)
+
+
+class ShardedScanner:
+    """
+    Scans a height range with worker processes, each with its own factory (so its own BitcoinCli).
+    Every shard gets fresh observers from make_observers(), then their state is reduced in
+    height order into a last set of observers with observer.merge(shard_observer) (see MergeableObserver).
+    Shards are balanced by transaction count: modern blocks are far heavier than early ones.
+    make_factory and make_observers must be picklable if the multiprocessing start method is not fork.
+    """
+    def __init__(self, make_factory, make_observers, workers=None, shards_per_worker=4, samples=64):
+        """
+        :param make_factory: f() -> blocks factory, called once in every worker (and once here, for sampling)
+        :param make_observers: f() -> [observer, ...], fresh (empty) observers
+        :param shards_per_worker: more shards than workers, so faster workers pick up more of them
+        :param samples: blocks fetched to estimate the tx count along the range
+        """
+        self.make_factory = make_factory
+        self.make_observers = make_observers
+        self.workers = workers or multiprocessing.cpu_count()
+        self.shards_per_worker = shards_per_worker
+        self.samples = samples
+        self.workers_stats = []
+
+    def sample_tx_counts(self, start, stop):
+        """
+        :return: [(height, tx count), ...] for about self.samples heights evenly spaced in [start, stop)
+        """
+        factory = self.make_factory()
+        step = max(1, (stop - start) // self.samples)
+        heights = list(range(start, stop, step))
+        if heights[-1] != stop - 1:
+            heights.append(stop - 1)
+        return [(height, tx_count(next(factory.generate_blocks(blockheight=height, max_iterations=1))))
+                for height in heights]
+
+    def plan(self, start, stop):
+        shards = self.workers * self.shards_per_worker
+        tx_counts = interpolate(self.sample_tx_counts(start, stop), start, stop)
+        return plan_shards(start, stop, shards, tx_counts)
+
+    def scan(self, blockheight, stop_blockheight):
+        """
+        :param blockheight: first block
+        :param stop_blockheight: last block, included
+        :return: the merged observers, per worker throughput is in self.workers_stats
+        """
+        if stop_blockheight < blockheight:
+            raise ValueError('stop_blockheight before blockheight', 'scan', (blockheight, stop_blockheight))
+        shards = self.plan(blockheight, stop_blockheight + 1)
+        pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                    initargs=(self.make_factory, self.make_observers))
+        try:
+            results = sorted(pool.imap_unordered(_scan_shard, [(i,) + shard for i, shard in enumerate(shards)]),
+                             key=lambda result: result[0])
+        finally:
+            pool.close()
+            pool.join()
+        observers = self.make_observers()
+        stats = {}
+        for index, shard_observers, shard_stats in results:
+            for observer, shard_observer in zip(observers, shard_observers):
+                observer.merge(shard_observer)
+            w = stats.get(shard_stats.worker, WorkerStats(shard_stats.worker, 0, 0, 0, 0.0))
+            stats[shard_stats.worker] = WorkerStats(w.worker,
+                                                    w.shards + 1,
+                                                    w.blocks + shard_stats.blocks,
+                                                    w.transactions + shard_stats.transactions,
+                                                    w.elapsed + shard_stats.elapsed)
+        self.workers_stats = sorted(stats.values())
+        return observers
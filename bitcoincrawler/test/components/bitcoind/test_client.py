@@ -1,9 +1,13 @@
 from unittest import TestCase
 from requests.exceptions import ConnectionError
+from bitcoincrawler.components.amounts import Satoshis
 from bitcoincrawler.components.bitcoind.client import BitcoinCli
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
 from bitcoincrawler.components.bitcoind.exceptions.client import BitcoinCliException, TransactionNotFound, BlockNotFound
+from bitcoincrawler.test.mocks.components.bitcoind.server import FakeBitcoind
 import httpretty
 from httpretty import httprettified
+import asyncio
 import json
 from decimal import Decimal
 
@@ -17,6 +21,52 @@ class TestBitcoinCliAsync(TestCase):
         self.assertEqual(self.sut.btcd_auth_header_async, self.async_auth_string)
 
 
+class TestBitcoinCliSessions(TestCase):
+    def setUp(self):
+        self.server = FakeBitcoind().start()
+        self.txid = 'fde6328ec671e4d0ffd857911851a180dc04b7b909076b1cdaae23db14c888f1'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_sync_session_is_reused(self):
+        with BitcoinCli('username', 'password', self.server.url) as sut:
+            session = sut.session
+            r1 = sut.get_raw_transaction(self.txid)
+            r2 = sut.get_raw_transaction(self.txid)
+            self.assertIs(sut.session, session)
+            self.assertEqual(r1, r2)
+            self.assertEqual(r1['result'], self.server.rawtransactions[self.txid])
+        self.assertEqual(self.server.requests, 2)
+
+    def test_async_session_is_reused(self):
+        loop = asyncio.get_event_loop()
+        with BitcoinCli('username', 'password', self.server.url, async=True, async_limit=10) as sut:
+            tasks = [sut.get_raw_transaction(self.txid, async=True) for i in range(0, 20)]
+            session = sut.aiohttp_session
+            results = loop.run_until_complete(asyncio.gather(*tasks))
+            self.assertIs(sut.aiohttp_session, session)
+            self.assertEqual(set(r['result'] for r in results), {self.server.rawtransactions[self.txid]})
+            batch = loop.run_until_complete(sut.get_raw_transactions([self.txid, self.txid], async=True))
+            self.assertEqual(len(batch), 2)
+        self.assertTrue(session.closed)
+
+    def test_async_connection_error(self):
+        loop = asyncio.get_event_loop()
+        self.server.stop()
+        sut = BitcoinCli('username', 'password', self.server.url, async=True)
+        with self.assertRaises(BitcoinCliException):
+            loop.run_until_complete(sut.call('getrawmempool', async=True))
+        sut.close()
+        self.server = FakeBitcoind().start()
+
+    def test_keep_alive_disabled(self):
+        sut = BitcoinCli('username', 'password', self.server.url, keep_alive=0)
+        self.assertEqual(sut.session.headers['Connection'], 'close')
+        sut.get_raw_mempool()
+        sut.close()
+
+
 class TestBitcoinCli(TestCase):
     def register_call(self, response):
         if isinstance(response, dict) or isinstance(response, list):
@@ -48,6 +98,30 @@ class TestBitcoinCli(TestCase):
         with self.assertRaises(BitcoinCliException):
             self.sut.call('method', 'param')
 
+    @httprettified
+    def test_call_amounts_as_satoshis(self):
+        self.register_call('{"result": {"vout": [{"value": 25.08039992, "n": 0}, {"value": 1.00000000, "n": 1}, '
+                           '{"value": 1e-05, "n": 2}, {"value": -0.5, "n": 3}, {"value": 1, "n": 4}], '
+                           '"fee": 0.0001, "difficulty": 1.5, "chainwork": 0.000000001, '
+                           '"stats": {"value": 0.123456789}}}')
+        sut = BitcoinCli('username', 'password', 'http://bitcoin_url/', amounts_as_satoshis=True)
+        result = sut.call('getrawtransaction', 'txid', 1)['result']
+        self.assertEqual([vout['value'] for vout in result['vout']],
+                         [2508039992, 100000000, 1000, -50000000, 100000000])
+        self.assertTrue(all(isinstance(vout['value'], Satoshis) for vout in result['vout']))
+        self.assertEqual([vout['n'] for vout in result['vout']], [0, 1, 2, 3, 4])
+        self.assertNotIsInstance(result['vout'][1]['n'], Satoshis)
+        self.assertEqual(result['fee'], 10000)
+        self.assertIsInstance(result['fee'], Satoshis)
+        # only the amounts: other floats stay Decimals
+        self.assertEqual(result['difficulty'], Decimal('1.5'))
+        self.assertNotIsInstance(result['difficulty'], Satoshis)
+        self.assertEqual(BTCDBlock(result, None).difficulty, Decimal('1.5'))
+        self.assertEqual(result['chainwork'], Decimal('0.000000001'))
+        self.assertEqual(result['stats']['value'], Decimal('0.123456789'))
+        self.assertEqual(self.sut.call('getrawtransaction', 'txid', 1)['result']['vout'][0]['value'],
+                         Decimal('25.08039992'))
+
     @httprettified
     def test_call_successful_response(self):
         response = {'result': 'a successful result'}
@@ -189,6 +263,31 @@ class TestBitcoinCli(TestCase):
         self.assertEqual(payload.get('method'), 'getblock')
         self.assertEqual(payload.get('params')[0], '000000000000c5e7fb216de3593318708b3372afb511f3824c4a9f7300a39529')
 
+    @httprettified
+    def test_get_block_verbosity(self):
+        self.register_call({'result': {'hash': 'block_hash', 'tx': [{'txid': 'txid1'}]}})
+        r = self.sut.get_block('block_hash', verbosity=2)
+        self.assertEqual(r['result']['tx'][0]['txid'], 'txid1')
+        payload = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual(payload.get('method'), 'getblock')
+        self.assertEqual(payload.get('params'), ['block_hash', 2])
+
+    @httprettified
+    def test_get_raw_block(self):
+        response = {'result': '0100000081ae17...'}
+        self.register_call(response)
+        r = self.sut.get_raw_block('block_hash')
+        self.assertEqual(r, response)
+        payload = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual(payload.get('method'), 'getblock')
+        self.assertEqual(payload.get('params'), ['block_hash', False])
+
+    @httprettified
+    def test_get_raw_block_invalid_hash(self):
+        self.register_call({'error': {"code": -5, "message": "Block not found"}})
+        with self.assertRaises(BlockNotFound):
+            self.sut.get_raw_block('invalid_block_hash')
+
     @httprettified
     def test_get_block_invalid_hash(self):
         response = {'error':{"code":-5,"message":"Block not found"}}
@@ -250,4 +349,82 @@ class TestBitcoinCli(TestCase):
         self.assertEqual(exception.method, 'getblockhash')
         payload = json.loads(httpretty.last_request().body.decode('utf-8'))
         self.assertEqual(payload.get('method'), 'getblockhash')
-        self.assertEqual(payload.get('params')[0], 999999999)
\ No newline at end of file
+        self.assertEqual(payload.get('params')[0], 999999999)
+
+    @httprettified
+    def test_call_batch(self):
+        response = [{'id': 1, 'result': 'second', 'error': None},
+                    {'id': 0, 'result': 'first', 'error': None}]
+        self.register_call(response)
+        r = self.sut.call_batch([('method1', ('param1',)), ('method2', ('param2',))])
+        self.assertEqual([x['result'] for x in r], ['first', 'second'])
+        payload = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual([x.get('method') for x in payload], ['method1', 'method2'])
+        self.assertEqual([x.get('params') for x in payload], [['param1'], ['param2']])
+        self.assertEqual([x.get('id') for x in payload], [0, 1])
+
+    @httprettified
+    def test_call_batch_missing_response(self):
+        self.register_call([{'id': 0, 'result': 'first', 'error': None}])
+        with self.assertRaises(BitcoinCliException):
+            self.sut.call_batch([('method1', ('param1',)), ('method2', ('param2',))])
+
+    @httprettified
+    def test_call_batch_rejected(self):
+        self.register_call({'result': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+        with self.assertRaises(BitcoinCliException) as raised:
+            self.sut.call_batch([('method1', ('param1',))])
+        self.assertEqual(raised.exception.method, 'batch')
+
+    @httprettified
+    def test_get_raw_transactions(self):
+        response = [{'id': 0, 'result': 'rawtx1', 'error': None},
+                    {'id': 1, 'result': 'rawtx2', 'error': None}]
+        self.register_call(response)
+        r = self.sut.get_raw_transactions(['txid1', 'txid2'])
+        self.assertEqual(r, response)
+        payload = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual([x.get('method') for x in payload], ['getrawtransaction', 'getrawtransaction'])
+        self.assertEqual([x.get('params')[0] for x in payload], ['txid1', 'txid2'])
+
+    @httprettified
+    def test_get_raw_transactions_unknown_tx(self):
+        response = [{'id': 0, 'result': 'rawtx1', 'error': None},
+                    {'id': 1, 'result': None,
+                     'error': {'message': 'No information available about transaction', 'code': -5}}]
+        self.register_call(response)
+        with self.assertRaises(TransactionNotFound) as assertion:
+            self.sut.get_raw_transactions(['txid1', 'unknown_but_valid_txid'])
+        exception = assertion.exception
+        self.assertEqual(exception.params, 'unknown_but_valid_txid')
+        self.assertEqual(exception.method, 'getrawtransaction')
+
+    @httprettified
+    def test_decode_raw_transactions_wrong_rawtx(self):
+        response = [{'id': 0, 'result': None, 'error': {'message': 'TX Decode failed', 'code': -22}}]
+        self.register_call(response)
+        with self.assertRaises(BitcoinCliException) as assertion:
+            self.sut.decode_raw_transactions(['invalid_rawtx'])
+        self.assertEqual(assertion.exception.params, 'invalid_rawtx')
+        self.assertEqual(assertion.exception.method, 'decoderawtransaction')
+
+    @httprettified
+    def test_get_block_headers(self):
+        response = [{'id': 0, 'result': {'hash': 'block_hash_1'}, 'error': None},
+                    {'id': 1, 'result': {'hash': 'block_hash_2'}, 'error': None}]
+        self.register_call(response)
+        r = self.sut.get_block_headers(['block_hash_1', 'block_hash_2'])
+        self.assertEqual(r, response)
+        payload = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertEqual([x.get('method') for x in payload], ['getblockheader', 'getblockheader'])
+        self.assertEqual([x.get('params') for x in payload], [['block_hash_1'], ['block_hash_2']])
+
+    @httprettified
+    def test_get_block_hashes_out_of_range(self):
+        response = [{'id': 0, 'result': 'block_hash_1', 'error': None},
+                    {'id': 1, 'result': None, 'error': {'message': 'Block height out of range', 'code': -8}}]
+        self.register_call(response)
+        with self.assertRaises(BlockNotFound) as assertion:
+            self.sut.get_block_hashes([1, 999999999])
+        self.assertEqual(assertion.exception.params, 999999999)
+        self.assertEqual(assertion.exception.method, 'getblockhash')
@@ -1,7 +1,15 @@
 from unittest import TestCase
 from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
 from bitcoincrawler.components.bitcoind.model import BTCDTransaction, BTCDBlock, BTCDVin, BTCDVout
+from bitcoincrawler.components.bitcoind.exceptions.client import BlockNotFound
+from bitcoincrawler.components.bitcoind.exceptions.factory import ReorgTooDeep
+from bitcoincrawler.components.model import BlockDisconnected
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.test.mocks.components.bitcoind.node import FakeNode
+from itertools import islice
 from types import GeneratorType
+import threading
+import time
 
 from mock import Mock
 
@@ -42,6 +50,22 @@ class TestBitcoindFactory(TestCase):
             self.assertEqual(x.txid, decode_raw_transactions_response[i]['result']['txid'])
         self.assertEqual(i+1, len(request))
 
+    def test_get_transactions_batched(self):
+        self.sut = BitcoindFactory(self.btcd, batch_size=2)
+        request = ["txid1", "txid2", "txid3"]
+        get_raw_transactions_response = [[{"result": "rawtx1"}, {"result": "rawtx2"}],
+                                         [{"result": "rawtx3"}]]
+        decode_raw_transactions_response = [[{"result": {"txid": "hash1"}}, {"result": {"txid": "hash2"}}],
+                                            [{"result": {"txid": "hash3"}}]]
+        self.btcd.get_raw_transactions.side_effect = get_raw_transactions_response
+        self.btcd.decode_raw_transactions.side_effect = decode_raw_transactions_response
+        r = [x for x in self.sut.get_transactions(request, parent_block='block_hash')]
+        self.assertEqual([x.txid for x in r], ["hash1", "hash2", "hash3"])
+        self.assertEqual([x.parent for x in r], ['block_hash'] * 3)
+        self.assertEqual(self.btcd.get_raw_transactions.call_count, 2)
+        self.btcd.decode_raw_transactions.assert_called_with(["rawtx3"])
+        self.assertFalse(self.btcd.get_raw_transaction.called)
+
     def test_generate_blocks_from_height_explicit_stop_with_limit(self):
         i, limit = 0, 3
         get_block_hash_response = [{"result": "block_hash_1"},
@@ -95,6 +119,81 @@ class TestBitcoindFactory(TestCase):
             self.assertEqual(block.hash, get_block_response[i]['result']['hash'])
         self.assertEqual(i+1, limit)
 
+    def test_generate_blocks_decoded_txs(self):
+        get_block_response = [{"result": {'nextblockhash': 'block_hash_2', 'hash': 'block_hash_1',
+                                          'tx': [{'txid': 'txid1'}, {'txid': 'txid2'}]}},
+                              {"result": {'nextblockhash': None, 'hash': 'block_hash_2',
+                                          'tx': [{'txid': 'txid3'}]}}]
+        self.btcd.get_block.side_effect = get_block_response
+        blocks = list(self.sut.generate_blocks(blockhash='block_hash_1', decoded_txs=True))
+        self.btcd.get_block.assert_called_with('block_hash_2', verbosity=2)
+        self.assertEqual([[tx.txid for tx in block.tx] for block in blocks], [['txid1', 'txid2'], ['txid3']])
+        self.assertEqual([tx.parent for tx in blocks[0].tx], ['block_hash_1'] * 2)
+        self.assertFalse(self.btcd.get_raw_transaction.called)
+        self.assertFalse(self.btcd.decode_raw_transaction.called)
+
+    def chain_mock(self, tip, gate=None):
+        def get_block_hash(height):
+            if height > tip:
+                raise BlockNotFound('', 'getblockhash', height)
+            return {"result": 'block_hash_{}'.format(height)}
+
+        def get_block(blockhash):
+            if gate and threading.current_thread() is not threading.main_thread():
+                gate.wait()
+            height = int(blockhash.split('_')[-1])
+            return {"result": {'hash': blockhash, 'height': height, 'size': 10,
+                               'previousblockhash': 'block_hash_{}'.format(height - 1),
+                               'nextblockhash': 'block_hash_{}'.format(height + 1) if height < tip else None}}
+        self.btcd.get_block_hash.side_effect = get_block_hash
+        self.btcd.get_block.side_effect = get_block
+
+    def test_generate_blocks_prefetch_natural_stop(self):
+        self.sut = BitcoindFactory(self.btcd, prefetch=3)
+        self.chain_mock(tip=10)
+        blocks = list(self.sut.generate_blocks(blockheight=1))
+        self.assertEqual([block.height for block in blocks], list(range(1, 11)))
+
+    def test_generate_blocks_prefetch_stops_at_limit(self):
+        self.sut = BitcoindFactory(self.btcd, prefetch=3)
+        self.chain_mock(tip=100)
+        blocks = list(self.sut.generate_blocks(blockhash='block_hash_5', max_iterations=4))
+        self.assertEqual([block.height for block in blocks], [5, 6, 7, 8])
+        self.assertEqual(self.btcd.get_block.call_count, 4)
+        blocks = list(self.sut.generate_blocks(blockheight=5, stop_blockheight=7))
+        self.assertEqual([block.height for block in blocks], [5, 6, 7])
+
+    def test_generate_blocks_prefetch_reorg(self):
+        self.sut = BitcoindFactory(self.btcd, prefetch=3)
+        self.chain_mock(tip=10)
+        get_block = self.btcd.get_block.side_effect
+
+        def reorged_get_block(blockhash):
+            block = get_block(blockhash)
+            if block['result']['height'] == 4:
+                block['result']['previousblockhash'] = 'other_block_hash_3'
+            return block
+        self.btcd.get_block.side_effect = reorged_get_block
+        blocks = list(self.sut.generate_blocks(blockheight=1))
+        self.assertEqual([block.height for block in blocks], [1, 2, 3])
+
+    def test_generate_blocks_prefetch_bytes(self):
+        self.sut = BitcoindFactory(self.btcd, prefetch=4, prefetch_bytes=15)
+        gate = threading.Event()
+        self.chain_mock(tip=100, gate=gate)
+        blocks = self.sut.generate_blocks(blockhash='block_hash_1')
+        next(blocks)
+        # the first block is consumed while the window is still in flight: all the 4 slots are used
+        self.assertEqual(self.btcd.get_block_hash.call_count, 4)
+        gate.set()
+        while self.btcd.get_block.call_count < 5:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        next(blocks)
+        # 3 buffered blocks, 30 bytes, no more reads
+        self.assertEqual(self.btcd.get_block_hash.call_count, 4)
+        blocks.close()
+
     def test_generate_blocks_from_height_explicit_natural_stop(self):
         get_block_hash_response = [{"result": "block_hash_1"},
                                    {"result": "block_hash_2"},
@@ -152,4 +251,63 @@ class TestBitcoindFactory(TestCase):
 
     def test_blocks_generator_multiple_stops_hash_and_height(self):
          with self.assertRaises(ValueError):
-            self.sut.generate_blocks(stop_blockhash=1, stop_blockheight=10)
\ No newline at end of file
+            self.sut.generate_blocks(stop_blockhash=1, stop_blockheight=10)
+
+class TestBitcoindFactoryFollow(TestCase):
+    def setUp(self):
+        self.node = FakeNode(blocks=3)
+        self.sut = BitcoindFactory(self.node)
+
+    def test_follow_blocks_waits_at_tip(self):
+        blocks = self.sut.follow_blocks(blockheight=0, max_poll_interval=5)
+        self.assertEqual([next(blocks).height for _ in range(0, 3)], [0, 1, 2])
+        threading.Timer(0.05, self.node.mine).start()
+        block = next(blocks)
+        self.assertEqual(block.height, 3)
+        self.assertEqual(block.hash, self.node.chain[3])
+        self.assertEqual(self.node.waits, 1)
+
+    def test_follow_blocks_polling(self):
+        self.node.long_poll = False
+        blocks = self.sut.follow_blocks(blockhash=self.node.chain[2], poll_interval=0.01, max_poll_interval=0.04)
+        self.assertEqual(next(blocks).height, 2)
+        threading.Timer(0.1, self.node.mine).start()
+        self.assertEqual(next(blocks).height, 3)
+
+    def test_follow_blocks_reorg(self):
+        blocks = self.sut.follow_blocks(blockheight=0)
+        produced = [next(blocks) for _ in range(0, 3)]
+        self.node.reorg(2, 3)
+        events = [next(blocks) for _ in range(0, 5)]
+        self.assertEqual([e.block.hash for e in events[:2]], [produced[2].hash, produced[1].hash])
+        for e in events[:2]:
+            self.assertIsInstance(e, BlockDisconnected)
+        self.assertEqual([e.hash for e in events[2:]], self.node.chain[1:])
+        self.assertEqual(events[2].previousblockhash, produced[0].hash)
+
+    def test_follow_blocks_shorter_chain(self):
+        blocks = self.sut.follow_blocks(blockheight=0)
+        produced = [next(blocks) for _ in range(0, 3)]
+        self.node.reorg(1, 1)
+        self.assertEqual(next(blocks).block.hash, produced[2].hash)
+        self.assertEqual(next(blocks).hash, self.node.chain[2])
+
+    def test_follow_blocks_reorg_too_deep(self):
+        blocks = self.sut.follow_blocks(blockheight=0, reorg_window=2)
+        [next(blocks) for _ in range(0, 3)]
+        self.node.reorg(3, 4)
+        self.assertIsInstance(next(blocks), BlockDisconnected)
+        self.assertIsInstance(next(blocks), BlockDisconnected)
+        with self.assertRaises(ReorgTooDeep):
+            next(blocks)
+
+    def test_scan_follow_blocks(self):
+        observer = Mock()
+        blocks = self.sut.follow_blocks(blockheight=0)
+        produced = [next(blocks) for _ in range(0, 3)]
+        self.node.reorg(1, 2)
+        scanner = BitcoinScanner(islice(blocks, 3))
+        scanner.blocks_observers.append(observer)
+        scanner.scan()
+        observer.on_block_disconnected.assert_called_once_with(produced[2])
+        self.assertEqual([c[0][0].hash for c in observer.on_block.call_args_list], self.node.chain[2:])
@@ -1,6 +1,8 @@
 from unittest import TestCase
-from bitcoincrawler.components.bitcoind.model import BTCDBlock, BTCDTransaction, BTCDVin, BTCDVout
+from bitcoincrawler.components.bitcoind.model import BTCDBlock, BTCDBlockHeader, BTCDTransaction, BTCDVin, BTCDVout
+from bitcoincrawler.components.amounts import Satoshis
 from mock import Mock
+from decimal import Decimal
 
 class TestBTCDBlockModel(TestCase):
     def setUp(self):
@@ -46,6 +48,30 @@ class TestBTCDBlockModel(TestCase):
         coinbase = self.sut.coinbase
         self.assertIsInstance(coinbase, BTCDTransaction)
 
+    def test_BTCBlock_decoded_transactions(self):
+        block_obj = dict(self.block_obj, tx=[{'txid': txid, 'vin': [], 'vout': []} for txid in self.block_obj['tx']])
+        self.sut = BTCDBlock(block_obj, self.txs_factory)
+        txs = [tx for tx in self.sut.tx]
+        self.assertEqual([tx.txid for tx in txs], self.block_obj['tx'])
+        self.assertEqual([tx.parent for tx in txs], [self.block_obj['hash']] * 2)
+        self.assertEqual(self.sut.coinbase.txid, self.block_obj['tx'][0])
+        self.assertEqual(self.sut.coinbase.parent, self.block_obj['hash'])
+        self.assertFalse(self.txs_factory.get_transactions.called)
+
+
+    def test_BTCDBlockHeader(self):
+        header_obj = {k: v for k, v in self.block_obj.items() if k not in ('tx', 'size')}
+        self.sut = BTCDBlockHeader(header_obj)
+        self.assertEqual(self.sut.hash, self.block_obj['hash'])
+        self.assertEqual(self.sut.height, self.block_obj['height'])
+        self.assertEqual(self.sut.chainwork, self.block_obj['chainwork'])
+        self.assertEqual(self.sut.difficulty, self.block_obj['difficulty'])
+        with self.assertRaises(NotImplementedError):
+            self.sut.tx
+        with self.assertRaises(NotImplementedError):
+            self.sut.coinbase
+
+
 class TestBTCDTransactionModel(TestCase):
     def setUp(self):
         self.coinbase_obj = {"txid": "0128d4ee91f5ccc61ef9ffe868a874f7b38a7e78cb7510cc576de989832d9345",
@@ -150,3 +176,17 @@ class TestBTCDVout(TestCase):
         self.assertEqual(self.sut.scriptPubKey.hex, self.vout_obj['scriptPubKey']['hex'])
         self.assertEqual(self.sut.scriptPubKey.asm, self.vout_obj['scriptPubKey']['asm'])
 
+    def test_Vout_value_sat(self):
+        self.sut = BTCDVout(self.vout_obj, self.parent_tx)
+        self.assertEqual(self.sut.value_sat, 1997000000)
+        self.sut = BTCDVout(dict(self.vout_obj, value=Decimal('19.97')), self.parent_tx)
+        self.assertEqual(self.sut.value_sat, 1997000000)
+        self.sut = BTCDVout(dict(self.vout_obj, value=Satoshis(1997000000)), self.parent_tx)
+        self.assertEqual(self.sut.value_sat, 1997000000)
+        self.assertEqual(str(self.sut.value), '19.97000000')
+
+    def test_Vout_script_view(self):
+        self.sut = BTCDVout(self.vout_obj, self.parent_tx)
+        self.assertIs(self.sut.scriptPubKey, self.sut.scriptPubKey)
+        self.assertFalse(hasattr(self.sut, '__dict__'))
+        self.assertIsNone(BTCDVout({}, self.parent_tx).scriptPubKey.addresses)
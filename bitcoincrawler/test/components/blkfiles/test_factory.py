@@ -0,0 +1,101 @@
+from unittest import TestCase
+from bitcoincrawler.components.blkfiles.factory import BlkFilesFactory, MAGIC
+from bitcoincrawler.components.blkfiles.exceptions.factory import BlkFileException, BlockNotFound
+from bitcoincrawler.components.bitcoind.exceptions import client
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.test.mocks.components.bitcoind.client import get_block, get_block_hash, serialize_block, PREFIX
+from mock import Mock
+import binascii
+import json
+import os
+import struct
+import shutil
+import tempfile
+
+
+class TestBlkFilesFactory(TestCase):
+    """
+    Synthetic blk files, built from the fixtures: blocks 115000-115006 spread over two files,
+    out of order, with a stale block and a zeroed tail.
+    """
+    def setUp(self):
+        with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+            rawtransactions = json.load(f)
+        self.blocks = [get_block(get_block_hash(height)['result'])['result'] for height in range(115000, 115007)]
+        raw = [serialize_block(block, rawtransactions) for block in self.blocks]
+        stale = dict(self.blocks[3], nonce=42, tx=self.blocks[3]['tx'])
+        stale['previousblockhash'] = self.blocks[2]['hash']
+        stale_raw = serialize_block(stale, rawtransactions)
+        self.dir = tempfile.mkdtemp()
+        self.write('blk00000.dat', [raw[0], raw[2], raw[1], stale_raw], padding=1024)
+        self.write('blk00001.dat', [raw[4], raw[3], raw[5], raw[6]])
+        self.sut = BlkFilesFactory(self.dir, base_height=115000)
+
+    def tearDown(self):
+        self.sut.close()
+        shutil.rmtree(self.dir)
+
+    def write(self, name, raw_blocks, padding=0):
+        with open(os.path.join(self.dir, name), 'wb') as f:
+            for raw in raw_blocks:
+                f.write(MAGIC['main'] + struct.pack('<I', len(raw)) + raw)
+            f.write(b'\x00' * padding)
+
+    def test_generate_blocks_from_height(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115000))
+        self.assertEqual([block.hash for block in blocks], [block['hash'] for block in self.blocks])
+        self.assertEqual([block.height for block in blocks], list(range(115000, 115007)))
+        self.assertEqual([block.nextblockhash for block in blocks], [block['nextblockhash'] for block in self.blocks])
+        for block, json_block in zip(blocks, self.blocks):
+            self.assertIsInstance(block, PyBitcoinToolsBlock)
+            self.assertEqual([tx.txid for tx in block.tx], json_block['tx'])
+        self.assertEqual(self.sut.tip_height, 115006)
+
+    def test_generate_blocks_explicit_stop_with_limit(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115001, max_iterations=3))
+        self.assertEqual([block.height for block in blocks], [115001, 115002, 115003])
+
+    def test_generate_blocks_explicit_stop_height(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115001, stop_blockheight=115002))
+        self.assertEqual([block.height for block in blocks], [115001, 115002])
+
+    def test_generate_blocks_from_hash_explicit_stop_hash(self):
+        blocks = list(self.sut.generate_blocks(blockhash=self.blocks[2]['hash'],
+                                               stop_blockhash=self.blocks[4]['hash']))
+        self.assertEqual([block.hash for block in blocks], [block['hash'] for block in self.blocks[2:5]])
+
+    def test_generate_blocks_unknown_start(self):
+        with self.assertRaises(BlockNotFound):
+            self.sut.generate_blocks(blockheight=115007)
+        with self.assertRaises(BlockNotFound):
+            self.sut.generate_blocks(blockhash='00' * 32)
+
+        self.assertIs(BlockNotFound, client.BlockNotFound)
+
+    def test_blocks_are_not_copied(self):
+        block = next(self.sut.generate_blocks(blockheight=115000))
+        self.assertEqual(block.hash, self.blocks[0]['hash'])
+        self.assertIsInstance(block._PyBitcoinToolsBlock__raw, memoryview)
+        # blocks still alive keep their map
+        self.sut.close()
+        self.assertEqual([tx.txid for tx in block.tx], self.blocks[0]['tx'])
+
+    def test_blocks_generator_multiple_starts(self):
+        with self.assertRaises(ValueError):
+            self.sut.generate_blocks(blockhash='cafe', blockheight=1)
+
+    def test_corrupted_file(self):
+        with open(os.path.join(self.dir, 'blk00002.dat'), 'wb') as f:
+            f.write(b'\x01\x02\x03\x04' + b'\x00' * 100)
+        with self.assertRaises(BlkFileException):
+            self.sut.generate_blocks(blockheight=115000)
+
+    def test_scanner(self):
+        observer = Mock()
+        scanner = BitcoinScanner(self.sut.generate_blocks(blockheight=115000, max_iterations=5))
+        scanner.blocks_observers.append(observer)
+        scanner.transactions_observers.append(observer)
+        scanner.scan()
+        self.assertEqual(observer.on_block.call_count, 5)
+        self.assertEqual(observer.on_transaction.call_count, sum(len(block['tx']) for block in self.blocks[:5]))
@@ -0,0 +1,38 @@
+from unittest import TestCase
+import binascii
+from bitcoin import bin_to_b58check, pubtoaddr
+from bitcoincrawler.components.pybitcointools.addresses import AddressCache, b58check_decode, b58check_encode
+
+
+class TestAddresses(TestCase):
+    def test_b58check_encode(self):
+        for payload in (b'\x00' * 20, b'\x00\x00\x01' + b'\xff' * 17, b'\xff' * 20,
+                        binascii.unhexlify('f5118746a4dce6ac146077f73fea49e10b1e908e')):
+            for version in (0x00, 0x05, 0x6F, 0xC4):
+                self.assertEqual(b58check_encode(payload, version), bin_to_b58check(payload, version))
+        self.assertEqual(b58check_encode(binascii.unhexlify('f5118746a4dce6ac146077f73fea49e10b1e908e'), 0),
+                         '1PLoYttF6YdytJRzdnyubpEethhn5B8836')
+
+    def test_b58check_decode(self):
+        for payload in (b'\x00' * 20, b'\x00\x00\x01' + b'\xff' * 17, b'\xff' * 20):
+            for version in (0x00, 0x05, 0x6F, 0xC4):
+                self.assertEqual(b58check_decode(b58check_encode(payload, version)), (version, payload))
+        with self.assertRaises(ValueError):
+            b58check_decode('1PLoYttF6YdytJRzdnyubpEethhn5B8837')
+        with self.assertRaises(ValueError):
+            b58check_decode('bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq')
+
+    def test_address_cache(self):
+        pubkey = binascii.unhexlify('024d57123256b2a84e6618bc12b08f81cd54ec79fcd7a55a129eee9402bac8d5f7')
+        sut = AddressCache(maxsize=2)
+        self.assertEqual(sut.address(pubkey, 0x00), pubtoaddr(pubkey, 0x00))
+        self.assertEqual(sut.address(memoryview(pubkey), 0x00), pubtoaddr(pubkey, 0x00))
+        self.assertEqual(sut.address(pubkey, 0x6F), pubtoaddr(pubkey, 0x6F))
+        self.assertEqual((sut.hits, sut.misses), (1, 2))
+        sut.address(pubkey, 0x00)
+        sut.address(b'\x01' * 20, 0x00)
+        self.assertEqual(len(sut), 2)
+        sut.address(pubkey, 0x00)
+        sut.address(pubkey, 0x6F)
+        self.assertEqual((sut.hits, sut.misses), (3, 4))
+        self.assertEqual(sut.hit_rate, 3 / 7)
@@ -1,8 +1,11 @@
 from unittest import TestCase
 from bitcoincrawler.components.pybitcointools.decoders import VINDecoder, VOUTDecoder
 from bitcoin import deserialize
+from bitcoincrawler.components.pybitcointools.serialization import RawTransaction
+import binascii
 import json
 from decimal import Decimal
+from mock import patch
 
 class TestVINDecoder(TestCase):
     def test_Vin(self):
@@ -701,3 +704,50 @@ class TestVOUTDecoder(TestCase):
         self.assertEqual(sut, vout)
         self.assertEqual(sut_in, vin)
 
+
+    def test_match_template(self):
+        scripts = {'76a914' + '11' * 20 + '88ac': 'pubkeyhash',
+                   'a914' + '11' * 20 + '87': 'scripthash',
+                   '21' + '02' + '11' * 32 + 'ac': 'pubkey',
+                   '41' + '04' + '11' * 64 + 'ac': 'pubkey',
+                   '5121' + '02' + '11' * 32 + '41' + '04' + '11' * 64 + '52ae': 'multisig',
+                   '6a': 'nulldata',
+                   '6a0401020304': 'nulldata',
+                   '6a28' + 'ab' * 40: 'nulldata',
+                   '6a4c29' + 'ab' * 41: None,
+                   '0014' + '11' * 20: 'witness_v0_keyhash',
+                   '0020' + '11' * 32: 'witness_v0_scripthash',
+                   '5120' + '11' * 32: 'witness_unknown',
+                   '6002' + '1111': 'witness_unknown',
+                   '0015' + '11' * 21: 'nonstandard',
+                   '0014' + '11' * 21: None,
+                   '76a914' + '11' * 20 + '88ac61': None,
+                   '5121' + '02' + '11' * 32 + '42' + '04' + '11' * 65 + '52ae': None}
+        for hex_script, script_type in scripts.items():
+            template = VOUTDecoder.match_template(binascii.unhexlify(hex_script), "main")
+            self.assertEqual(template and template[0], script_type)
+            for network in ("main", "testnet"):
+                vout = {'value': 5000, 'script': hex_script}
+                self.assertEqual(VOUTDecoder.decode(vout, 1, network), VOUTDecoder.decode_tokenized(vout, 1, network))
+
+    def test_decode_without_addresses(self):
+        scripts = ['76a914' + '11' * 20 + '88ac', 'a914' + '11' * 20 + '87', '21' + '02' + '11' * 32 + 'ac',
+                   '5121' + '02' + '11' * 32 + '41' + '04' + '11' * 64 + '52ae', '6a0401020304',
+                   '5121' + '02' + '11' * 32 + '42' + '04' + '11' * 65 + '52ae', '76a90488ac', '51']
+        for hex_script in scripts:
+            vout = {'value': 5000, 'script': hex_script}
+            expected = VOUTDecoder.decode(vout, 1, "main")
+            expected['scriptPubKey'].pop('addresses', None)
+            expected['scriptPubKey'].pop('reqSigs', None)
+            with patch('bitcoincrawler.components.pybitcointools.decoders.address_cache') as cache:
+                self.assertEqual(VOUTDecoder.decode(vout, 1, "main", addresses=False), expected)
+                self.assertEqual(VOUTDecoder.decode_tokenized(vout, 1, "main", addresses=False), expected)
+                self.assertFalse(cache.address.called)
+
+    def test_decode_script_bytes(self):
+        rawtransaction = "0100000001a305620dcdee909a90d7367ceaf55e859417a53ffda6190086110b7f8a4b4d22010000000201" \
+                         "51ffffffff0140420f00000000001976a914f5118746a4dce6ac146077f73fea49e10b1e908e88ac00000000"
+        vout = RawTransaction(binascii.unhexlify(rawtransaction)).outs[0]
+        self.assertEqual(VOUTDecoder.decode(vout, 0, "main"), VOUTDecoder.decode_tokenized(vout, 0, "main"))
+        self.assertEqual(VOUTDecoder.decode(vout, 0, "main")['scriptPubKey']['addresses'],
+                         ["1PLoYttF6YdytJRzdnyubpEethhn5B8836"])
@@ -1,7 +1,12 @@
 from unittest import TestCase
 from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory, PyBitcoinToolsTransaction
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
 from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.bitcoind.exceptions.client import BlockNotFound
+from bitcoincrawler.test.mocks.components.bitcoind.client import get_raw_block, bitcoin_cli_mock, PREFIX
+from copy import deepcopy
 from types import GeneratorType
+import json
 
 from mock import Mock
 
@@ -38,6 +43,60 @@ class TestPyBitcoinToolsFactory(TestCase):
             self.assertEqual(x.txid, request[i])
         self.assertEqual(i+1, len(request))
 
+    def test_get_transactions_batched(self):
+        self.sut = PyBitcoinToolsFactory(self.btcd, batch_size=2)
+        request = ["txid1", "txid2", "txid3"]
+        get_raw_transactions_response = [[{"result": "rawtx1"}, {"result": "rawtx2"}],
+                                         [{"result": "rawtx3"}]]
+        self.btcd.get_raw_transactions.side_effect = get_raw_transactions_response
+        r = [x for x in self.sut.get_transactions(request)]
+        self.assertEqual([x.txid for x in r], request)
+        for x in r:
+            self.assertIsInstance(x, PyBitcoinToolsTransaction)
+        self.btcd.get_raw_transactions.assert_called_with(["txid3"])
+        self.assertFalse(self.btcd.get_raw_transaction.called)
+
+    def test_get_transactions_parse_pool(self):
+        with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+            txids = list(json.load(f))
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'main'
+        for needs in (None, {'vout.value', 'vout.addresses'}, {'vin.asm', 'vout.asm'}):
+            expected = [tx.json for tx in PyBitcoinToolsFactory(btcd, async=True, batch_size=4,
+                                                                needs=needs).get_transactions(txids)]
+            for batch_size in (4, None):
+                sut = PyBitcoinToolsFactory(btcd, async=True, batch_size=batch_size, parse_workers=2,
+                                            parse_batch_size=3, needs=needs)
+                try:
+                    r = sut.get_transactions(txids, parent_block='block')
+                finally:
+                    sut.close()
+                for x in r:
+                    self.assertIsInstance(x, PyBitcoinToolsTransaction)
+                    self.assertEqual(x.parent, 'block')
+                self.assertEqual([x.json for x in r], expected)
+        # outputs are rebuilt on the decoded scripts, addresses left out by needs are still derived on access
+        x = r[0]
+        self.assertEqual([vout.scriptPubKey.addresses for vout in x.vout],
+                         [vout.scriptPubKey.addresses for vout in PyBitcoinToolsTransaction(x._hex, x.txid).vout])
+
+    def test_get_transactions_network(self):
+        with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+            txids = list(json.load(f))[:5]
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'testnet'
+        for batch_size in (None, 2):
+            for tx in PyBitcoinToolsFactory(btcd, batch_size=batch_size).get_transactions(txids):
+                addresses = [address for vout in tx.vout for address in vout.scriptPubKey.addresses or ()]
+                self.assertTrue(addresses)
+                self.assertTrue(all(address[0] in 'mn2' for address in addresses), addresses)
+
+    def test_parse_workers_without_pool(self):
+        for options in ({'async': False}, {'async': True, 'raw_blocks': True}):
+            with self.assertRaises(ValueError):
+                PyBitcoinToolsFactory(self.btcd, parse_workers=2, **options)
+        self.assertIsNone(PyBitcoinToolsFactory(self.btcd, raw_blocks=True, parse_workers=0).parse_pool)
+
     def test_generate_blocks_from_height_explicit_stop_with_limit(self):
         i, limit = 0, 3
         get_block_hash_response = [{"result": "block_hash_1"},
@@ -130,6 +189,34 @@ class TestPyBitcoinToolsFactory(TestCase):
             self.assertEqual(block.hash, get_block_response[i]['result']['hash'])
         self.assertEqual(i+1, 3)
 
+    def test_generate_raw_blocks_from_height_explicit_natural_stop(self):
+        self.sut = PyBitcoinToolsFactory(self.btcd, raw_blocks=True)
+        hashes = ['0000000000007f51a1c13814ecb9698f56b91b2599552d7c47ec1d5b7517ae81',
+                  '000000000000c5e7fb216de3593318708b3372afb511f3824c4a9f7300a39529']
+        self.btcd.get_block_hash.side_effect = [{"result": hashes[0]},
+                                                {"result": hashes[1]},
+                                                BlockNotFound('', 'getblockhash', 115003)]
+        self.btcd.get_raw_block.side_effect = [get_raw_block(h) for h in hashes]
+        blocks = list(self.sut.generate_blocks(blockheight=115001))
+        self.assertEqual([block.hash for block in blocks], hashes)
+        self.assertEqual([block.height for block in blocks], [115001, 115002])
+        for block in blocks:
+            self.assertIsInstance(block, PyBitcoinToolsBlock)
+        self.assertFalse(self.btcd.get_raw_transaction.called)
+        self.assertFalse(self.btcd.get_block.called)
+
+    def test_generate_raw_blocks_from_hash_explicit_stop_hash(self):
+        self.sut = PyBitcoinToolsFactory(self.btcd, raw_blocks=True)
+        hashes = ['0000000000007f51a1c13814ecb9698f56b91b2599552d7c47ec1d5b7517ae81',
+                  '000000000000c5e7fb216de3593318708b3372afb511f3824c4a9f7300a39529',
+                  '0000000000000f246cec2e9f71acc743db66da926a15cd31a2739612c64546dd']
+        self.btcd.get_block.side_effect = [{"result": {"hash": hashes[0], "height": 115001}}]
+        self.btcd.get_block_hash.side_effect = [{"result": hashes[1]}, {"result": hashes[2]}]
+        self.btcd.get_raw_block.side_effect = [get_raw_block(h) for h in hashes]
+        blocks = list(self.sut.generate_blocks(blockhash=hashes[0], stop_blockhash=hashes[1]))
+        self.assertEqual([block.hash for block in blocks], hashes[:2])
+        self.assertEqual([block.height for block in blocks], [115001, 115002])
+
     def test_blocks_generator_multiple_starts(self):
          with self.assertRaises(ValueError):
             self.sut.generate_blocks(blockhash='cafe', blockheight=1)
@@ -1,10 +1,39 @@
 from unittest import TestCase
 from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsTransaction, PyBitcoinToolsVin, \
-    PyBitcoinToolsVout
-from mock import Mock
+    PyBitcoinToolsVout, PyBitcoinToolsBlock
+from bitcoincrawler.test.mocks.components.bitcoind.client import get_block, get_raw_block
+from mock import Mock, patch
+from bitcoincrawler.components.pybitcointools.scripts import vout_asm
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
 import json
 from decimal import Decimal
 
+class TestPyBitcoinToolsBlockModel(TestCase):
+    def setUp(self):
+        self.block_hash = '000000000000c5e7fb216de3593318708b3372afb511f3824c4a9f7300a39529'
+        self.block_obj = get_block(self.block_hash)['result']
+        self.raw_block = get_raw_block(self.block_hash)['result']
+
+    def test_PyBitcoinToolsBlock(self):
+        self.sut = PyBitcoinToolsBlock(self.raw_block, height=115002, nextblockhash=self.block_obj['nextblockhash'])
+        for key in ('hash', 'size', 'height', 'version', 'merkleroot', 'time', 'nonce', 'bits',
+                    'previousblockhash', 'nextblockhash'):
+            self.assertEqual(getattr(self.sut, key), self.block_obj[key])
+        self.assertAlmostEqual(self.sut.difficulty, float(self.block_obj['difficulty']), places=6)
+        self.assertEqual(self.sut.json['tx'], self.block_obj['tx'])
+        txs = list(self.sut.tx)
+        self.assertEqual([tx.txid for tx in txs], self.block_obj['tx'])
+        for tx in txs:
+            self.assertIsInstance(tx, PyBitcoinToolsTransaction)
+            self.assertEqual(tx.parent, self.block_hash)
+        self.assertIs(self.sut.coinbase.is_coinbase, True)
+
+    def test_PyBitcoinToolsBlock_from_bytes(self):
+        self.sut = PyBitcoinToolsBlock(bytes.fromhex(self.raw_block))
+        self.assertEqual(self.sut.hash, self.block_hash)
+        self.assertIsNone(self.sut.height)
+        self.assertIsNone(self.sut.nextblockhash)
+
 class TestBTCDTransactionModel(TestCase):
     def setUp(self):
         self.btcd_coinbase_obj = {"txid": "0128d4ee91f5ccc61ef9ffe868a874f7b38a7e78cb7510cc576de989832d9345",
@@ -100,6 +129,17 @@ class TestBTCDVin(TestCase):
         self.assertEqual(self.sut.scriptSig.asm, self.btcd_json_vin['scriptSig']['asm'])
         self.assertIsNone(self.sut.coinbase)
 
+    def test_Vin_needs(self):
+        self.sut = PyBitcoinToolsVin(self.pybtcd_vin, self.parent_tx, needs={'vin.txid'})
+        self.assertIsNone(self.sut.json['scriptSig']['asm'])
+        self.assertEqual(self.sut.scriptSig.asm, self.btcd_json_vin['scriptSig']['asm'])
+
+    def test_Vin_script_view(self):
+        self.sut = PyBitcoinToolsVin(self.pybtcd_vin, self.parent_tx)
+        self.assertIs(self.sut.scriptSig, self.sut.scriptSig)
+        self.assertFalse(hasattr(self.sut, '__dict__'))
+        self.assertFalse(hasattr(self.sut.scriptSig, '__dict__'))
+
     def test_Vin_coinbase(self):
         self.sut = PyBitcoinToolsVin(self.pybtcd_coinbase_vin, self.parent_tx)
         self.assertEqual(self.sut.parent, self.parent_tx)
@@ -125,6 +165,7 @@ class TestBTCDVout(TestCase):
                          }
                      }
         self.pybtcd_vout_obj = {'script': '76a914c825a1ecf2a6830c4401620c3a16f1995057c2ab88ac', 'value': 2508039992}
+        script_cache.clear()
 
         self.parent_tx = Mock()
 
@@ -133,9 +174,34 @@ class TestBTCDVout(TestCase):
         vout = json.loads(json.dumps(self.btcd_vout_obj), parse_float=Decimal)
         self.assertEqual(self.sut.parent, self.parent_tx)
         self.assertEqual(self.sut.value, vout['value'])
+        self.assertEqual(self.sut.value_sat, 2508039992)
         self.assertEqual(self.sut.n, vout['n'])
         self.assertEqual(self.sut.scriptPubKey.addresses, vout['scriptPubKey']['addresses'])
         self.assertEqual(self.sut.scriptPubKey.type, vout['scriptPubKey']['type'])
         self.assertEqual(self.sut.scriptPubKey.reqSigs, vout['scriptPubKey']['reqSigs'])
         self.assertEqual(self.sut.scriptPubKey.hex, vout['scriptPubKey']['hex'])
         self.assertEqual(self.sut.scriptPubKey.asm, vout['scriptPubKey']['asm'])
+
+    def test_Vout_lazy_asm(self):
+        self.sut = PyBitcoinToolsVout(self.pybtcd_vout_obj, 0, "main", self.parent_tx)
+        vout = json.loads(json.dumps(self.btcd_vout_obj), parse_float=Decimal)
+        with patch('bitcoincrawler.components.pybitcointools.decoders.vout_asm', wraps=vout_asm) as render:
+            self.assertEqual(self.sut.scriptPubKey.addresses, vout['scriptPubKey']['addresses'])
+            self.assertFalse(render.called)
+            self.assertEqual(self.sut.json, vout)
+            self.assertEqual(self.sut.scriptPubKey.asm, vout['scriptPubKey']['asm'])
+            self.assertEqual(render.call_count, 1)
+
+    def test_Vout_needs(self):
+        self.sut = PyBitcoinToolsVout(self.pybtcd_vout_obj, 0, "main", self.parent_tx, needs={'vout.value'})
+        vout = json.loads(json.dumps(self.btcd_vout_obj), parse_float=Decimal)
+        with patch('bitcoincrawler.components.pybitcointools.decoders.vout_asm', wraps=vout_asm) as render:
+            self.assertEqual(self.sut.scriptPubKey.type, 'pubkeyhash')
+            self.assertEqual(self.sut.json, {'value': vout['value'], 'n': 0,
+                                             'scriptPubKey': {'hex': vout['scriptPubKey']['hex'],
+                                                              'type': 'pubkeyhash', 'asm': None}})
+            self.assertFalse(render.called)
+            # read anyway
+            self.assertEqual(self.sut.scriptPubKey.asm, vout['scriptPubKey']['asm'])
+            self.assertEqual(self.sut.scriptPubKey.addresses, vout['scriptPubKey']['addresses'])
+            self.assertEqual(self.sut.json, vout)
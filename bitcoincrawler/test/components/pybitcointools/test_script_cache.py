@@ -0,0 +1,90 @@
+from unittest import TestCase
+import sys
+import threading
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder
+from bitcoincrawler.components.pybitcointools.addresses import AddressCache
+from bitcoincrawler.components.pybitcointools.script_cache import ScriptCache, script_cache
+from mock import patch
+
+
+class TestScriptCache(TestCase):
+    def setUp(self):
+        script_cache.clear()
+
+    def test_script_cache(self):
+        sut = ScriptCache()
+        script = b'\xa9\x14' + b'\x11' * 20 + b'\x87'
+        self.assertIsNone(sut.get(script, 'main'))
+        sut.put(script, 'main', {'type': 'scripthash', 'asm': None}, addresses=False)
+        self.assertEqual(sut.get(script, 'main'), ('scripthash', None, None, None))
+        self.assertIsNone(sut.get(script, 'main', addresses=True))
+        self.assertIsNone(sut.get(script, 'testnet'))
+        sut.put(script, 'main', {'type': 'scripthash', 'asm': None, 'reqSigs': 1, 'addresses': ['3address']})
+        sut.put_asm(memoryview(script), 'main', 'OP_HASH160 11 OP_EQUAL')
+        self.assertEqual(sut.get(script, 'main', addresses=True, asm=True),
+                         ('scripthash', 1, ('3address',), 'OP_HASH160 11 OP_EQUAL'))
+        self.assertEqual((sut.hits, sut.misses), (2, 3))
+        self.assertEqual(sut.stats()['entries'], 1)
+        self.assertEqual(sut.bytes, sut.get(script, 'main').size(script))
+
+    def test_eviction(self):
+        script = b'\x51'
+        sut = ScriptCache(maxbytes=1000)
+        for i in range(0, 10):
+            sut.put(bytes((i,)), 'main', {'type': 'nonstandard', 'asm': None})
+        self.assertEqual(len(sut), 1000 // (1 + 320))
+        self.assertEqual(sut.evictions, 10 - len(sut))
+        self.assertLessEqual(sut.bytes, 1000)
+        self.assertIsNone(sut.get(b'\x00', 'main'))
+        self.assertIsNotNone(sut.get(b'\x09', 'main'))
+        sut.maxbytes = 0
+        sut.clear()
+        sut.put(script, 'main', {'type': 'nonstandard', 'asm': None})
+        self.assertEqual(len(sut), 0)
+
+    def test_threads(self):
+        """
+        Parse workers share the caches: concurrent evictions don't break lookups
+        """
+        sut, addresses = ScriptCache(maxbytes=4000), AddressCache(maxsize=8)
+        errors = []
+
+        def run(offset):
+            try:
+                for i in range(0, 2000):
+                    script = bytes(((i + offset) % 64,))
+                    if sut.get(script, 'main', asm=True) is None:
+                        sut.put(script, 'main', {'type': 'nonstandard', 'asm': None})
+                        sut.put_asm(script, 'main', 'asm')
+                    addresses.address(bytes(((i + offset) % 16,)) * 20, 0x00)
+            except Exception as e:
+                errors.append(e)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=run, args=(i * 7,)) for i in range(0, 4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        self.assertLessEqual(sut.bytes, 4000)
+        self.assertEqual(sut.bytes, sum(sut.get(bytes((i,)), 'main').size(bytes((i,)))
+                                        for i in range(0, 64) if sut.get(bytes((i,)), 'main')))
+        self.assertLessEqual(len(addresses), 8)
+
+    def test_decode_cached(self):
+        vout = {'value': 5000, 'script': '76a914' + '11' * 20 + '88ac'}
+        expected = VOUTDecoder.decode_script(vout, 1, 'main')
+        self.assertEqual(VOUTDecoder.decode(vout, 1, 'main', asm=False, addresses=False)['scriptPubKey'],
+                         {'type': 'pubkeyhash', 'hex': vout['script'], 'asm': None})
+        self.assertEqual(VOUTDecoder.decode(vout, 1, 'main'), expected)
+        with patch.object(VOUTDecoder, 'decode_script') as decode_script:
+            for _ in range(0, 2):
+                decoded = VOUTDecoder.decode(vout, 1, 'main')
+                self.assertEqual(decoded, expected)
+                decoded['scriptPubKey']['addresses'].append('mutated')
+            self.assertFalse(decode_script.called)
+        self.assertEqual((script_cache.hits, script_cache.misses), (2, 2))
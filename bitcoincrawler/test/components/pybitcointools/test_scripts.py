@@ -0,0 +1,29 @@
+from unittest import TestCase
+import binascii
+from bitcoincrawler.components.pybitcointools.scripts import iter_script, vin_asm, vout_asm
+
+
+class TestScripts(TestCase):
+    def test_iter_script(self):
+        script = binascii.unhexlify('0002aabb4c03ccddee4d0100ff51' + '05aabb')
+        self.assertEqual([(code, data and bytes(data)) for code, data in iter_script(script)],
+                         [(0, None), (2, b'\xaa\xbb'), (76, b'\xcc\xdd\xee'), (77, b'\xff'), (81, None),
+                          (5, b'\xaa\xbb')])
+
+    def test_vout_asm(self):
+        self.assertEqual(vout_asm(binascii.unhexlify('a9146af7caf9b09224af8a171318f69d254c1756e54e87')),
+                         'OP_HASH160 6af7caf9b09224af8a171318f69d254c1756e54e OP_EQUAL')
+        self.assertEqual(vout_asm(binascii.unhexlify('4f5052baff')), 'OP_UNKNOWN 0 2 OP_UNKNOWN OP_INVALIDOPCODE')
+        self.assertEqual(vout_asm(binascii.unhexlify('6a0401020304'), nulldata=True), 'OP_RETURN 67305985')
+        self.assertEqual(vout_asm(binascii.unhexlify('6a0401020304')), 'OP_RETURN 01020304')
+        self.assertEqual(vout_asm(b''), '')
+
+    def test_vin_asm(self):
+        self.assertEqual(vin_asm(binascii.unhexlify('0151')), '81')
+        self.assertEqual(vin_asm(binascii.unhexlify('01510100')), '81 0')
+        self.assertEqual(vin_asm(binascii.unhexlify('0181b0')), '-1 -48')
+        self.assertEqual(vin_asm(binascii.unhexlify('0200ac01ac')), 'OP_CHECKSIG OP_CHECKSIG')
+        self.assertEqual(vin_asm(binascii.unhexlify('02d2040115')), '1234 21')
+        self.assertEqual(vin_asm(binascii.unhexlify('0115')), '21')
+        self.assertEqual(vin_asm(binascii.unhexlify('0500000000ff')), '-127')
+        self.assertEqual(vin_asm(binascii.unhexlify('05ff00000001')), 'ff00000001')
@@ -0,0 +1,81 @@
+from unittest import TestCase
+from bitcoincrawler.components.pybitcointools.serialization import read_varint, split_transaction, \
+    split_transactions, parse_header, bits_to_difficulty, RawTransaction
+from bitcoin import deserialize
+from bitcoincrawler.test.mocks.components.bitcoind.client import get_block, serialize_block, varint, PREFIX
+import binascii
+import json
+
+
+class TestSerialization(TestCase):
+    def setUp(self):
+        with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+            self.rawtransactions = json.load(f)
+        self.block = get_block('0000000000007f51a1c13814ecb9698f56b91b2599552d7c47ec1d5b7517ae81')['result']
+        self.raw_block = serialize_block(self.block, self.rawtransactions)
+
+    def test_read_varint(self):
+        for n in (0, 0xfc, 0xfd, 0xffff, 0x10000, 0xffffffff, 0x100000000):
+            data = b'\xaa' + varint(n) + b'\xbb'
+            value, offset = read_varint(data, 1)
+            self.assertEqual(value, n)
+            self.assertEqual(data[offset], 0xbb)
+
+    def test_parse_header(self):
+        header = parse_header(self.raw_block)
+        for key in ('hash', 'version', 'previousblockhash', 'merkleroot', 'time', 'bits', 'nonce'):
+            self.assertEqual(header[key], self.block[key])
+        self.assertAlmostEqual(header['difficulty'], float(self.block['difficulty']), places=6)
+
+    def test_bits_to_difficulty(self):
+        self.assertEqual(bits_to_difficulty(0x1d00ffff), 1.0)
+
+    def test_split_transactions(self):
+        txs = split_transactions(self.raw_block)
+        self.assertEqual([txid for txid, tx in txs], self.block['tx'])
+        for txid, tx in txs:
+            self.assertEqual(binascii.hexlify(tx).decode('utf-8'), self.rawtransactions[txid])
+
+    def test_split_transaction_segwit(self):
+        """
+        Witness data must be skipped, and excluded from the txid.
+        """
+        txid = self.block['tx'][1]
+        legacy = binascii.unhexlify(self.rawtransactions[txid])
+        witness = b''.join(b'\x02' + varint(3) + b'abc' + varint(2) + b'de' for i in range(0, legacy[4]))
+        segwit = legacy[:4] + b'\x00\x01' + legacy[4:-4] + witness + legacy[-4:]
+        r_txid, r_tx, offset = split_transaction(segwit + b'trailing', 0)
+        self.assertEqual(r_txid, txid)
+        self.assertEqual(r_tx, legacy)
+        self.assertEqual(offset, len(segwit))
+
+    def test_raw_transaction(self):
+        """
+        Same fields of pybitcointools deserialize()
+        """
+        for txid, rawtx in self.rawtransactions.items():
+            expected = deserialize(rawtx)
+            sut = RawTransaction(binascii.unhexlify(rawtx))
+            self.assertEqual(sut.version, expected['version'])
+            self.assertEqual(sut.locktime, expected['locktime'])
+            self.assertEqual([{'outpoint': vin['outpoint'], 'script': vin['script'], 'sequence': vin['sequence']}
+                              for vin in sut.ins], expected['ins'])
+            self.assertEqual([{'value': vout['value'], 'script': vout['script']} for vout in sut.outs],
+                             expected['outs'])
+            self.assertEqual(sut.end, len(rawtx) // 2)
+            self.assertEqual(sut.is_coinbase(), expected['ins'][0]['outpoint']['hash'] == '00' * 32)
+        self.assertFalse(hasattr(sut, '__dict__'))
+        self.assertFalse(hasattr(sut.ins[0], '__dict__'))
+        self.assertFalse(hasattr(sut.outs[0], '__dict__'))
+
+    def test_raw_transaction_segwit(self):
+        txid = self.block['tx'][1]
+        legacy = binascii.unhexlify(self.rawtransactions[txid])
+        witness = b''.join(b'\x02' + varint(3) + b'abc' + varint(2) + b'de' for i in range(0, legacy[4]))
+        segwit = legacy[:4] + b'\x00\x01' + legacy[4:-4] + witness + legacy[-4:]
+        sut, expected = RawTransaction(b'head' + segwit, offset=4), RawTransaction(legacy)
+        self.assertTrue(sut.segwit)
+        self.assertEqual((sut.version, sut.locktime), (expected.version, expected.locktime))
+        self.assertEqual([vin['script'] for vin in sut.ins], [vin['script'] for vin in expected.ins])
+        self.assertEqual([vout['value'] for vout in sut.outs], [vout['value'] for vout in expected.outs])
+        self.assertEqual(sut.end, 4 + len(segwit))
@@ -0,0 +1,101 @@
+from unittest import TestCase
+from copy import deepcopy
+import binascii
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.components.columns import BlockColumns, SCRIPT_TYPES, NO_PREVOUT
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsTransaction
+from bitcoincrawler.components.pybitcointools.serialization import RawTransaction
+from bitcoincrawler.filters import OutputFilter
+from bitcoincrawler.test.mocks.components.bitcoind.client import bitcoin_cli_mock
+
+# output scripts and their bitcoind type
+SCRIPTS = [('76a914' + '11' * 20 + '88ac', 'pubkeyhash'),
+           ('a914' + '11' * 20 + '87', 'scripthash'),
+           ('21' + '02' + '11' * 32 + 'ac', 'pubkey'),
+           ('5121' + '02' + '11' * 32 + '51ae', 'multisig'),
+           ('6a0401020304', 'nulldata'),
+           ('0014' + '11' * 20, 'witness_v0_keyhash'),
+           ('0020' + '11' * 32, 'witness_v0_scripthash'),
+           ('5120' + '11' * 32, 'witness_unknown'),
+           ('0015' + '11' * 21, 'nonstandard'),
+           ('51', 'nonstandard')]
+
+
+def transaction(scripts):
+    """
+    :return: serialized transaction, one input and an output per script
+    """
+    outputs = ''.join('e803000000000000' + '{:02x}'.format(len(script) // 2) + script for script in scripts)
+    return binascii.unhexlify('01000000' + '01' + '22' * 32 + '00000000' + '00' + 'ffffffff' +
+                              '{:02x}'.format(len(scripts)) + outputs + '00000000')
+
+
+class ColumnsObserver:
+    def __init__(self):
+        self.columns = []
+
+    def on_block_columns(self, columns):
+        self.columns.append(columns)
+
+
+class TestBlockColumns(TestCase):
+    def setUp(self):
+        self.btcd = deepcopy(bitcoin_cli_mock)
+        self.btcd.network = 'main'
+
+    def columns(self, factory):
+        return [BlockColumns.from_block(block)
+                for block in factory.generate_blocks(blockheight=115000, stop_blockheight=115006)]
+
+    def test_models_and_raw_blocks_columns(self):
+        expected = self.columns(BitcoindFactory(self.btcd))
+        for factory in (PyBitcoinToolsFactory(self.btcd),
+                        PyBitcoinToolsFactory(self.btcd, raw_blocks=True)):
+            for block_columns, sut in zip(expected, self.columns(factory)):
+                self.assertEqual(sut.txids, block_columns.txids)
+                for name in ('out_value', 'out_type', 'out_tx', 'out_n', 'out_script', 'out_scripts',
+                             'in_tx', 'in_prevout_n', 'in_prevout_txids', 'in_sequence', 'in_script', 'in_scripts'):
+                    self.assertEqual(getattr(sut, name), getattr(block_columns, name), name)
+
+    def test_columns(self):
+        block = next(BitcoindFactory(self.btcd).generate_blocks(blockheight=115000))
+        txs = list(block.tx)
+        sut = BlockColumns.from_block(block)
+        vouts = [vout for tx in txs for vout in tx.vout]
+        vins = [vin for tx in txs for vin in tx.vin]
+        self.assertEqual(sut.outputs, len(vouts))
+        self.assertEqual(sut.inputs, len(vins))
+        self.assertEqual(list(sut.out_value), [vout.value_sat for vout in vouts])
+        self.assertEqual([SCRIPT_TYPES[code] for code in sut.out_type], [vout.scriptPubKey.type for vout in vouts])
+        self.assertEqual(binascii.hexlify(sut.output_script(1)).decode('utf-8'), vouts[1].scriptPubKey.hex)
+        self.assertEqual(sut.in_prevout_n[0], NO_PREVOUT)
+        self.assertIsNone(sut.input_prevout(0))
+        self.assertEqual(sut.input_prevout(1), (vins[1].txid, vins[1].vout))
+        self.assertEqual(binascii.hexlify(sut.input_script(1)).decode('utf-8'), vins[1].scriptSig.hex)
+        self.assertEqual(sum(sut.value_by_type().values()), sum(vout.value_sat for vout in vouts))
+
+    def test_script_types(self):
+        """
+        Raw scripts (add_raw_transaction, filters) and decoded outputs are classified alike
+        """
+        rawtx = transaction([script for script, script_type in SCRIPTS])
+        raw, decoded = BlockColumns('hash', 0), BlockColumns('hash', 0)
+        raw.add_raw_transaction('txid', RawTransaction(rawtx))
+        decoded.add_transaction(PyBitcoinToolsTransaction(rawtx, 'txid'))
+        expected = [script_type for script, script_type in SCRIPTS]
+        self.assertEqual([SCRIPT_TYPES[code] for code in raw.out_type], expected)
+        self.assertEqual(decoded.out_type, raw.out_type)
+        outputs = PyBitcoinToolsTransaction(rawtx, 'txid').raw_outputs()
+        for script_type in set(expected):
+            self.assertEqual(OutputFilter(script_types=[script_type]).select(outputs),
+                             [i for i, t in enumerate(expected) if t == script_type])
+
+    def test_scanner_columns_observers(self):
+        observer = ColumnsObserver()
+        scanner = BitcoinScanner(PyBitcoinToolsFactory(self.btcd, raw_blocks=True).generate_blocks(
+            blockheight=115000, stop_blockheight=115002))
+        scanner.columns_observers.append(observer)
+        scanner.scan()
+        self.assertEqual([columns.height for columns in observer.columns], [115000, 115001, 115002])
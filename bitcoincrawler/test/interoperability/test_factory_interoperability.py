@@ -1,5 +1,7 @@
 from unittest import TestCase
 from bitcoincrawler.components.bitcoind import factory
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.components.base_factory import AdapterFactory
 from bitcoincrawler.test.mocks.components.bitcoind.client import bitcoin_cli_mock
 from bitcoincrawler.components.bitcoind.model import BTCDTransaction, BTCDBlock, BTCDVin, BTCDVout
 from copy import deepcopy
@@ -9,6 +11,8 @@ class TestBitcoinFactory(TestCase):
         self.btcd = deepcopy(bitcoin_cli_mock)
         self.sut = factory.BitcoindFactory(self.btcd)
         self.async_sut = factory.BitcoindFactory(self.btcd, async=True)
+        self.batch_sut = factory.BitcoindFactory(self.btcd, batch_size=3)
+        self.async_batch_sut = factory.BitcoindFactory(self.btcd, async=True, batch_size=3)
 
     def tearDown(self):
         self.btcd = deepcopy(bitcoin_cli_mock)
@@ -79,3 +83,65 @@ class TestBitcoinFactory(TestCase):
                 for vout in transaction.vout:
                     self.assertIsInstance(vout, BTCDVout)
 
+    def test_get_mempool_transactions_batched(self):
+        expected = [tx.json for tx in self.sut.get_mempool_transactions()]
+        for sut in (self.batch_sut, self.async_batch_sut):
+            transactions = [tx for tx in sut.get_mempool_transactions()]
+            self.assertEqual(expected, [tx.json for tx in transactions])
+        self.assertEqual(self.btcd.get_raw_transactions.call_count, 68)
+
+    def test_generate_raw_blocks(self):
+        raw_btcd = deepcopy(bitcoin_cli_mock)
+        raw_btcd.network = 'main'
+        raw_sut = PyBitcoinToolsFactory(raw_btcd, raw_blocks=True)
+        blocks = list(self.sut.generate_blocks(blockheight=115000, max_iterations=7))
+        raw_blocks = list(AdapterFactory(raw_sut, raw_sut).generate_blocks(blockheight=115000, max_iterations=7))
+        self.assertEqual(len(raw_blocks), 7)
+        for block, raw_block in zip(blocks, raw_blocks):
+            self.assertEqual(block.hash, raw_block.hash)
+            self.assertEqual(block.height, raw_block.height)
+            self.assertEqual([tx.json for tx in block.tx], [tx.json for tx in raw_block.tx])
+        self.assertFalse(raw_btcd.get_raw_transaction.called)
+
+    def test_generate_blocks_decoded_txs(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115000, max_iterations=7))
+        decoded_btcd = deepcopy(bitcoin_cli_mock)
+        decoded_sut = factory.BitcoindFactory(decoded_btcd)
+        decoded_blocks = list(decoded_sut.generate_blocks(blockheight=115000, max_iterations=7, decoded_txs=True))
+        self.assertEqual(len(decoded_blocks), 7)
+        for block, decoded_block in zip(blocks, decoded_blocks):
+            self.assertEqual(block.hash, decoded_block.hash)
+            transactions = list(decoded_block.tx)
+            self.assertEqual([tx.json for tx in block.tx], [tx.json for tx in transactions])
+            self.assertEqual([tx.parent for tx in transactions], [block.hash] * len(transactions))
+            self.assertEqual(block.coinbase.json, decoded_block.coinbase.json)
+        self.assertFalse(decoded_btcd.get_raw_transaction.called)
+        self.assertFalse(decoded_btcd.decode_raw_transaction.called)
+
+    def test_generate_blocks_prefetch(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115000))
+        prefetch_sut = factory.BitcoindFactory(deepcopy(bitcoin_cli_mock), prefetch=3)
+        raw_btcd = deepcopy(bitcoin_cli_mock)
+        raw_btcd.network = 'main'
+        raw_prefetch_sut = PyBitcoinToolsFactory(raw_btcd, raw_blocks=True, prefetch=3)
+        self.assertEqual(len(blocks), 7)
+        for sut in (prefetch_sut, raw_prefetch_sut):
+            prefetched = list(sut.generate_blocks(blockheight=115000))
+            self.assertEqual([block.hash for block in blocks], [block.hash for block in prefetched])
+            self.assertEqual([block.height for block in blocks], [block.height for block in prefetched])
+
+    def test_generate_headers(self):
+        blocks = list(self.sut.generate_blocks(blockheight=115000))
+        headers_btcd = deepcopy(bitcoin_cli_mock)
+        headers_sut = factory.BitcoindFactory(headers_btcd)
+        headers = list(headers_sut.generate_headers(blockheight=115000, batch_size=3))
+        self.assertEqual([block.hash for block in blocks], [header.hash for header in headers])
+        for block, header in zip(blocks, headers):
+            for key in ('height', 'time', 'bits', 'difficulty', 'chainwork', 'previousblockhash'):
+                self.assertEqual(block.json.get(key), header.json.get(key))
+        self.assertEqual(headers_btcd.get_block_headers.call_count, 3)
+        self.assertFalse(headers_btcd.get_block.called)
+        headers = list(headers_sut.generate_headers(blockhash=blocks[1].hash, max_iterations=4, batch_size=3))
+        self.assertEqual([header.height for header in headers], [115001, 115002, 115003, 115004])
+        headers = list(headers_sut.generate_headers(blockheight=115000, stop_blockhash=blocks[2].hash))
+        self.assertEqual([header.height for header in headers], [115000, 115001, 115002])
@@ -4,6 +4,8 @@ from unittest.mock import Mock
 from asyncio import coroutine
 from hashlib import md5
 import asyncio
+import binascii
+import struct
 
 @asyncio.coroutine
 def chain(obj, *funcs):
@@ -37,18 +39,81 @@ def decode_raw_transaction(rawtx, async=False):
     else:
         return openfile(rawtx)
 
+def get_raw_transactions(txids, async=False):
+    res = [get_raw_transaction(txid) for txid in txids]
+    return coroutine(lambda: res)() if async else res
+
+def decode_raw_transactions(rawtxs, async=False):
+    res = [decode_raw_transaction(rawtx) for rawtx in rawtxs]
+    return coroutine(lambda: res)() if async else res
+
+def varint(n):
+    if n < 0xfd:
+        return struct.pack('<B', n)
+    elif n <= 0xffff:
+        return b'\xfd' + struct.pack('<H', n)
+    elif n <= 0xffffffff:
+        return b'\xfe' + struct.pack('<I', n)
+    return b'\xff' + struct.pack('<Q', n)
+
+def serialize_block(block, rawtransactions):
+    """
+    Rebuilds the wire format of a fixture block, from its json and the raw transactions.
+    """
+    header = struct.pack('<I32s32sIII',
+                         block['version'],
+                         binascii.unhexlify(block['previousblockhash'])[::-1],
+                         binascii.unhexlify(block['merkleroot'])[::-1],
+                         block['time'],
+                         int(block['bits'], 16),
+                         block['nonce'])
+    txs = b''.join(binascii.unhexlify(rawtransactions[txid]) for txid in block['tx'])
+    return header + varint(len(block['tx'])) + txs
+
+def get_raw_block(block_hash):
+    with open(PREFIX + 'cli_files/rawtransactions.json') as outfile:
+        rawtransactions = json.load(outfile)
+    block = get_block(block_hash)['result']
+    return {"result": binascii.hexlify(serialize_block(block, rawtransactions)).decode('utf-8')}
+
 def get_block_hash(block_height):
     block_height = str(block_height)
     with open(PREFIX + 'cli_files/blockhash.json') as outfile:
         return {"result": json.load(outfile, parse_float=Decimal).get(block_height)}
 
-def get_block(block_hash):
+def get_block(block_hash, verbosity=None):
     with open(PREFIX + 'cli_files/blocks/{}.json'.format(block_hash)) as outfile:
-        return {"result": json.load(outfile, parse_float=Decimal)}
+        block = json.load(outfile, parse_float=Decimal)
+    if verbosity == 2:
+        block['tx'] = [decode_raw_transaction(get_raw_transaction(txid)['result'])['result'] for txid in block['tx']]
+    return {"result": block}
+
+def header(block):
+    return {k: v for k, v in block.items() if k not in ('tx', 'size')}
+
+def get_block_header(block_hash):
+    return {"result": header(get_block(block_hash)['result'])}
+
+def get_block_headers(block_hashes):
+    return [get_block_header(block_hash) for block_hash in block_hashes]
+
+def get_block_hashes(block_heights):
+    return [get_block_hash(block_height) for block_height in block_heights]
+
+def get_block_count():
+    with open(PREFIX + 'cli_files/blockhash.json') as outfile:
+        return {"result": max(int(height) for height in json.load(outfile))}
 
 bitcoin_cli_mock = Mock()
 bitcoin_cli_mock.get_raw_mempool.side_effect = get_raw_mempool
 bitcoin_cli_mock.get_raw_transaction.side_effect = get_raw_transaction
 bitcoin_cli_mock.decode_raw_transaction.side_effect = decode_raw_transaction
+bitcoin_cli_mock.get_raw_transactions.side_effect = get_raw_transactions
+bitcoin_cli_mock.decode_raw_transactions.side_effect = decode_raw_transactions
 bitcoin_cli_mock.get_block_hash.side_effect = get_block_hash
-bitcoin_cli_mock.get_block.side_effect = get_block
\ No newline at end of file
+bitcoin_cli_mock.get_block.side_effect = get_block
+bitcoin_cli_mock.get_raw_block.side_effect = get_raw_block
+bitcoin_cli_mock.get_block_header.side_effect = get_block_header
+bitcoin_cli_mock.get_block_headers.side_effect = get_block_headers
+bitcoin_cli_mock.get_block_hashes.side_effect = get_block_hashes
+bitcoin_cli_mock.get_block_count.side_effect = get_block_count
\ No newline at end of file
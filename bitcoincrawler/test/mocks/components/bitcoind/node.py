@@ -0,0 +1,60 @@
+"""
+An in-memory bitcoind chain, with the BitcoinCli methods used to follow the tip: blocks can be mined
+and reorged by tests, waitfornewblock wakes up on tip changes.
+"""
+from hashlib import sha256
+import threading
+
+from bitcoincrawler.components.bitcoind.exceptions.client import BitcoinCliException, BlockNotFound
+
+
+class FakeNode:
+    def __init__(self, blocks=1, long_poll=True):
+        """
+        :param long_poll: False behaves as a node without waitfornewblock
+        """
+        self.network = 'main'
+        self.long_poll = long_poll
+        self.chain = []
+        self.blocks = {}
+        self.waits = 0
+        self.__cond = threading.Condition()
+        self.mine(blocks)
+
+    def mine(self, n=1, tag=''):
+        with self.__cond:
+            for _ in range(0, n):
+                height = len(self.chain)
+                previousblockhash = self.chain[-1] if self.chain else None
+                blockhash = sha256('{}{}{}'.format(previousblockhash, height, tag).encode('utf-8')).hexdigest()
+                self.blocks[blockhash] = {'hash': blockhash, 'height': height, 'tx': [],
+                                          'previousblockhash': previousblockhash}
+                self.chain.append(blockhash)
+            self.__cond.notify_all()
+
+    def reorg(self, depth, n, tag='fork'):
+        """
+        Replaces the last depth blocks with n new ones
+        """
+        with self.__cond:
+            del self.chain[len(self.chain) - depth:]
+            self.mine(n, tag=tag)
+
+    def get_block_hash(self, height):
+        with self.__cond:
+            if height >= len(self.chain):
+                raise BlockNotFound({'code': -8, 'message': 'Block height out of range'}, 'getblockhash', height)
+            return {'result': self.chain[height]}
+
+    def get_block(self, blockhash, verbosity=None):
+        with self.__cond:
+            return {'result': dict(self.blocks[blockhash])}
+
+    def wait_for_new_block(self, timeout=0):
+        if not self.long_poll:
+            raise BitcoinCliException({'code': -32601, 'message': 'Method not found'}, 'waitfornewblock', [])
+        with self.__cond:
+            self.waits += 1
+            tip = self.chain[-1]
+            self.__cond.wait_for(lambda: self.chain[-1] != tip, timeout or None)
+            return {'result': {'hash': self.chain[-1], 'height': len(self.chain) - 1}}
@@ -0,0 +1,167 @@
+"""
+A local bitcoind stand-in: JSON-RPC over HTTP/1.1 (keep-alive and batches), backed by the cli_files fixtures.
+Useful for benchmarks and for tests that need a real socket.
+"""
+import json
+import glob
+import socket
+import threading
+import time
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import binascii
+
+from bitcoincrawler.test.mocks.components.bitcoind.client import serialize_block
+
+import os
+PREFIX = os.path.dirname(__file__) + '/'
+
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super(RPCError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeBitcoindHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1  # headers and body in a single write, as bitcoind does
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if isinstance(request, list):
+            response = [self.server.dispatch(r) for r in request]
+        else:
+            response = self.server.dispatch(request)
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBitcoind(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0):
+        """
+        :param latency: seconds added to every http request, as a remote node would
+        """
+        HTTPServer.__init__(self, address, FakeBitcoindHandler)
+        self.latency = latency
+        self.requests = 0
+        self.__lock = threading.Lock()
+        self.__thread = None
+        # open connection socket: the thread serving it
+        self.__connections = {}
+        with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+            self.rawtransactions = json.load(f)
+        with open(PREFIX + 'cli_files/rawmempool.json') as f:
+            self.mempool = json.load(f)
+        with open(PREFIX + 'cli_files/blockhash.json') as f:
+            self.blockhashes = {int(height): blockhash for height, blockhash in json.load(f).items()}
+        self.blocks = {}
+        for filename in glob.glob(PREFIX + 'cli_files/blocks/*.json'):
+            with open(filename) as f:
+                block = json.load(f)
+                self.blocks[block['hash']] = block
+        self.methods = {'getrawtransaction': self.getrawtransaction,
+                        'decoderawtransaction': self.decoderawtransaction,
+                        'getrawmempool': lambda: self.mempool,
+                        'getblockhash': self.getblockhash,
+                        'getblock': self.getblock,
+                        'getblockheader': self.getblockheader,
+                        'getblockcount': lambda: max(self.blockhashes)}
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(*self.server_address)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+        Closes the keep-alive connections clients left open too: every server thread is done on return
+        """
+        self.shutdown()
+        self.server_close()
+        self.__thread.join()
+        with self.__lock:
+            connections = list(self.__connections.items())
+        for request, thread in connections:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            thread.join()
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self.__serve, args=(request, client_address), daemon=True)
+        with self.__lock:
+            self.__connections[request] = thread
+        thread.start()
+
+    def __serve(self, request, client_address):
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            with self.__lock:
+                self.__connections.pop(request, None)
+
+    def dispatch(self, request):
+        with self.__lock:
+            self.requests += 1
+        try:
+            method = self.methods.get(request.get('method'))
+            if not method:
+                raise RPCError(-32601, 'Method not found')
+            return {'result': method(*request.get('params', [])), 'error': None, 'id': request.get('id')}
+        except RPCError as e:
+            return {'result': None, 'error': {'code': e.code, 'message': e.message}, 'id': request.get('id')}
+
+    def getrawtransaction(self, txid, verbose=0):
+        try:
+            return self.rawtransactions[txid]
+        except KeyError:
+            raise RPCError(-5, 'No information available about transaction')
+
+    def decoderawtransaction(self, rawtx):
+        try:
+            with open(PREFIX + 'cli_files/transactions/{}.json'.format(md5(rawtx.encode('utf-8')).hexdigest())) as f:
+                return json.load(f)
+        except IOError:
+            raise RPCError(-22, 'TX decode failed')
+
+    def getblockhash(self, height):
+        try:
+            return self.blockhashes[height]
+        except KeyError:
+            raise RPCError(-8, 'Block height out of range')
+
+    def getblockheader(self, blockhash):
+        block = self.getblock(blockhash)
+        return {k: v for k, v in block.items() if k not in ('tx', 'size')}
+
+    def getblock(self, blockhash, verbose=True):
+        try:
+            block = self.blocks[blockhash]
+        except KeyError:
+            raise RPCError(-5, 'Block not found')
+        if not verbose:
+            return binascii.hexlify(serialize_block(block, self.rawtransactions)).decode('utf-8')
+        if verbose == 2:
+            return dict(block, tx=[self.decoderawtransaction(self.rawtransactions[txid]) for txid in block['tx']])
+        return block
@@ -0,0 +1,181 @@
+from unittest import TestCase
+import asyncio
+import os
+from bitcoincrawler.async_scanner import AsyncBitcoinScanner
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.client import BitcoinCli
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.components.model import BlockDisconnected
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block
+from bitcoincrawler.test.mocks.components.bitcoind.server import FakeBitcoind
+from bitcoincrawler.test.test_filters import ItemsObserver as OutputsObserver
+from bitcoincrawler.test.test_scanner import BulkObserver, ItemsObserver
+
+
+class SyncObserver:
+    def __init__(self):
+        self.seen = []
+
+    def on_block(self, block):
+        self.seen.append(block.hash)
+
+    def on_transaction(self, transaction):
+        self.seen.append(transaction.txid)
+
+    def on_input(self, input):
+        self.seen.append((input.parent.txid, input.txid, input.vout))
+
+    def on_output(self, output):
+        self.seen.append((output.parent.txid, output.n))
+
+
+class AsyncObserver(SyncObserver):
+    def __init__(self):
+        super(AsyncObserver, self).__init__()
+        self.running = 0
+        self.max_running = 0
+
+    @asyncio.coroutine
+    def _track(self, item):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        yield from asyncio.sleep(0)
+        self.seen.append(item)
+        self.running -= 1
+
+    @asyncio.coroutine
+    def on_input(self, input):
+        yield from self._track((input.parent.txid, input.txid, input.vout))
+
+    @asyncio.coroutine
+    def on_output(self, output):
+        yield from self._track((output.parent.txid, output.n))
+
+    @asyncio.coroutine
+    def on_block_disconnected(self, block):
+        yield from self._track(('disconnected', block.hash))
+
+
+class BlocksObserver:
+    def __init__(self):
+        self.hashes = []
+
+    def on_block(self, block):
+        self.hashes.append(block.hash)
+
+
+class AsyncBlocks:
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        yield from asyncio.sleep(0)
+        try:
+            return next(self.blocks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestAsyncBitcoinScanner(TestCase):
+    def setUp(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))[:4]
+        self.blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes]
+        self.expected = SyncObserver()
+        scanner = BitcoinScanner(self.blocks)
+        for observers in (scanner.blocks_observers, scanner.transactions_observers,
+                          scanner.inputs_observers, scanner.outputs_observers):
+            observers.append(self.expected)
+        scanner.scan()
+
+    def scan(self, blocks, observer, concurrency=100):
+        scanner = AsyncBitcoinScanner(blocks, concurrency=concurrency)
+        for observers in (scanner.blocks_observers, scanner.transactions_observers,
+                          scanner.inputs_observers, scanner.outputs_observers):
+            observers.append(observer)
+        scanner.scan()
+
+    def test_sync_observers(self):
+        observer = SyncObserver()
+        self.scan(self.blocks, observer)
+        self.assertEqual(observer.seen, self.expected.seen)
+
+    def test_async_observers(self):
+        for blocks in (self.blocks, AsyncBlocks(self.blocks)):
+            observer = AsyncObserver()
+            self.scan(blocks, observer, concurrency=3)
+            self.assertEqual(sorted(observer.seen, key=repr), sorted(self.expected.seen, key=repr))
+            self.assertEqual(observer.max_running, 3)
+            self.assertEqual(observer.running, 0)
+
+    def test_block_disconnected(self):
+        observer = AsyncObserver()
+        scanner = AsyncBitcoinScanner([self.blocks[0], BlockDisconnected(self.blocks[0])])
+        scanner.blocks_observers.append(observer)
+        scanner.scan()
+        self.assertEqual(observer.seen, [self.blocks[0].hash, ('disconnected', self.blocks[0].hash)])
+
+    def test_bulk_observers(self):
+        items, bulk = ItemsObserver(), BulkObserver()
+        bulk.on_outputs = asyncio.coroutine(bulk.on_outputs)
+        scanner = AsyncBitcoinScanner(self.blocks)
+        for observers in (scanner.transactions_observers, scanner.inputs_observers, scanner.outputs_observers):
+            observers.extend([items, bulk])
+        scanner.scan()
+        self.assertEqual(bulk.transactions, items.transactions)
+        self.assertEqual(bulk.inputs, items.inputs)
+        self.assertEqual(sorted(bulk.outputs), sorted(items.outputs))
+
+    def test_notify_transaction(self):
+        txs = [tx for block in self.blocks for tx in block.tx]
+        for observer in (SyncObserver(), AsyncObserver()):
+            scanner = AsyncBitcoinScanner(None)
+            for observers in (scanner.transactions_observers, scanner.inputs_observers, scanner.outputs_observers):
+                observers.append(observer)
+            for tx in txs[:2]:
+                scanner.notify_transaction(tx)
+            scanner.loop.run_until_complete(asyncio.gather(*(scanner.notify_transaction_async(tx)
+                                                             for tx in txs[2:])))
+            expected = [item for item in self.expected.seen if item not in set(b.hash for b in self.blocks)]
+            self.assertEqual(sorted(observer.seen, key=repr), sorted(expected, key=repr))
+
+    def test_async_factories(self):
+        """
+        blocks and transactions rpcs of async factories are awaited on the scanner loop
+        """
+        server = FakeBitcoind().start()
+        first_height = min(server.blockhashes)
+        try:
+            with BitcoinCli('username', 'password', server.url) as cli:
+                expected = OutputsObserver()
+                scanner = BitcoinScanner(BitcoindFactory(cli).generate_blocks(blockheight=first_height,
+                                                                              max_iterations=4))
+                scanner.outputs_observers.append(expected)
+                scanner.scan()
+                self.assertGreater(len(expected.outputs), 0)
+                factories = [BitcoindFactory(cli, async=True), BitcoindFactory(cli, async=True, batch_size=10),
+                             PyBitcoinToolsFactory(cli, async=True),
+                             PyBitcoinToolsFactory(cli, async=True, raw_blocks=True)]
+                for factory in factories:
+                    for blocks in (factory.generate_blocks_async(blockheight=first_height, max_iterations=4),
+                                   factory.generate_blocks(blockheight=first_height, max_iterations=4)):
+                        observer = OutputsObserver()
+                        sut = AsyncBitcoinScanner(blocks)
+                        sut.outputs_observers.append(observer)
+                        sut.scan()
+                        self.assertEqual(observer.outputs, expected.outputs)
+                blockhash = server.blockhashes[first_height + 1]
+                blocks = BitcoindFactory(cli, async=True).generate_blocks_async(
+                    blockhash=blockhash, stop_blockhash=server.blockhashes[first_height + 2])
+                scanner = AsyncBitcoinScanner(blocks)
+                observer = BlocksObserver()
+                scanner.blocks_observers.append(observer)
+                scanner.scan()
+                self.assertEqual(observer.hashes, [blockhash, server.blockhashes[first_height + 2]])
+        finally:
+            server.stop()
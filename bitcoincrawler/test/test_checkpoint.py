@@ -0,0 +1,128 @@
+from unittest import TestCase
+from copy import deepcopy
+import os
+import shutil
+import tempfile
+import time
+from bitcoincrawler.async_scanner import AsyncBitcoinScanner
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.checkpoint import Checkpoint
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.pipeline import PipelinedScanner
+from bitcoincrawler.test.mocks.components.bitcoind.client import bitcoin_cli_mock
+
+
+class Crash(Exception):
+    pass
+
+
+class StatefulObserver:
+    def __init__(self, crash_at=None):
+        self.heights = []
+        self.transactions = 0
+        self.crash_at = crash_at
+
+    def on_block(self, block):
+        if block.height == self.crash_at:
+            raise Crash()
+        self.heights.append(block.height)
+
+    def on_transaction(self, transaction):
+        self.transactions += 1
+
+    def get_state(self):
+        return {'heights': list(self.heights), 'transactions': self.transactions}
+
+    def set_state(self, state):
+        self.heights = state['heights']
+        self.transactions = state['transactions']
+
+
+class SlowCheckpoint(Checkpoint):
+    def _write(self, state):
+        time.sleep(0.2)
+        super(SlowCheckpoint, self)._write(state)
+
+
+class BrokenCheckpoint(Checkpoint):
+    def _write(self, state):
+        raise OSError('disk full')
+
+
+class TestCheckpoint(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'scan.checkpoint')
+        self.factory = BitcoindFactory(deepcopy(bitcoin_cli_mock))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def scanner(self, observer, checkpoint, blockheight=None, scanner_class=BitcoinScanner):
+        if blockheight is None:
+            blockheight = checkpoint.next_height(default=115000)
+        blocks = self.factory.generate_blocks(blockheight=blockheight, stop_blockheight=115006)
+        scanner = scanner_class(blocks, checkpoint=checkpoint)
+        scanner.blocks_observers.append(observer)
+        scanner.transactions_observers.append(observer)
+        return scanner
+
+    def test_resume(self):
+        expected = StatefulObserver()
+        self.scanner(expected, Checkpoint(self.path + '.full')).scan()
+
+        with self.assertRaises(Crash):
+            self.scanner(StatefulObserver(crash_at=115005), Checkpoint(self.path, every=2)).scan()
+        checkpoint = Checkpoint(self.path, every=2)
+        self.assertEqual(checkpoint.height, 115003)
+        self.assertEqual(checkpoint.next_height(), 115004)
+
+        observer = StatefulObserver()
+        self.scanner(observer, checkpoint).scan()
+        self.assertEqual(observer.heights, list(range(115000, 115007)))
+        self.assertEqual(observer.transactions, expected.transactions)
+        self.assertEqual(Checkpoint(self.path).height, 115006)
+
+    def test_blocks_must_follow_checkpoint(self):
+        self.scanner(StatefulObserver(), Checkpoint(self.path)).scan()
+        with self.assertRaises(ValueError):
+            self.scanner(StatefulObserver(), Checkpoint(self.path), blockheight=115000).scan()
+        checkpoint = Checkpoint(self.path)
+        checkpoint.load()['hash'] = 'other_hash'
+        checkpoint.load()['height'] = 115002
+        with self.assertRaises(ValueError):
+            self.scanner(StatefulObserver(), checkpoint).scan()
+
+    def test_write_does_not_block(self):
+        checkpoint = SlowCheckpoint(self.path, every=1)
+        observer = StatefulObserver()
+        block = next(self.factory.generate_blocks(blockheight=115000))
+        s = time.time()
+        checkpoint.save(block, [observer])
+        checkpoint.save(block, [observer])
+        self.assertLess(time.time() - s, 0.1)
+        self.assertFalse(os.path.exists(self.path))
+        checkpoint.flush()
+        self.assertEqual(Checkpoint(self.path).height, 115000)
+
+    def test_failed_write_keeps_previous_checkpoint(self):
+        checkpoint = Checkpoint(self.path)
+        observer = StatefulObserver()
+        blocks = list(self.factory.generate_blocks(blockheight=115000, max_iterations=2))
+        checkpoint.save(blocks[0], [observer])
+        checkpoint.flush()
+        observer.get_state = lambda: {'unpicklable': lambda: None}
+        checkpoint.save(blocks[1], [observer])
+        with self.assertRaises(Exception):
+            checkpoint.flush()
+        self.assertEqual(Checkpoint(self.path).height, 115000)
+
+    def test_scan_error_not_replaced_by_write_error(self):
+        for scanner_class in (BitcoinScanner, AsyncBitcoinScanner, PipelinedScanner):
+            sut = self.scanner(StatefulObserver(crash_at=115003), BrokenCheckpoint(self.path, every=3),
+                               scanner_class=scanner_class)
+            with self.assertLogs('bitcoincrawler.checkpoint') as logs, self.assertRaises(Crash):
+                sut.scan()
+            self.assertIn('disk full', logs.output[0])
+            with self.assertRaises(OSError):
+                self.scanner(StatefulObserver(), BrokenCheckpoint(self.path), scanner_class=scanner_class).scan()
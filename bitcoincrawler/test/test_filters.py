@@ -0,0 +1,174 @@
+from unittest import TestCase
+from unittest.mock import patch
+from copy import deepcopy
+import binascii
+import os
+from bitcoin import bin_hash160
+from bitcoincrawler.async_scanner import AsyncBitcoinScanner
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.pybitcointools.addresses import b58check_encode
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.filters import OutputFilter, InputFilter, address_script, op_return_data
+from bitcoincrawler import mempool_inspector
+from bitcoincrawler.pipeline import PipelinedScanner
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, get_raw_block, \
+    bitcoin_cli_mock
+from bitcoincrawler.test.test_scanner import prevout
+
+PUBKEYS = [binascii.unhexlify('024d57123256b2a84e6618bc12b08f81cd54ec79fcd7a55a129eee9402bac8d5f7'),
+           binascii.unhexlify('03' + '11' * 32)]
+
+
+def decoded_addresses(script):
+    vout = {'script': binascii.hexlify(script).decode('utf-8'), 'value': 0}
+    return VOUTDecoder.decode_script(vout, 0, 'main', asm=False)['scriptPubKey'].get('addresses', [])
+
+
+def txid_of(item):
+    """
+    parent of pybitcointools inputs and outputs is the txid
+    """
+    return getattr(item.parent, 'txid', item.parent)
+
+
+class ItemsObserver:
+    def __init__(self, output_filter=None, input_filter=None):
+        if output_filter:
+            self.output_filter = output_filter
+        if input_filter:
+            self.input_filter = input_filter
+        self.inputs = []
+        self.outputs = []
+
+    def on_input(self, input):
+        self.inputs.append((txid_of(input), input.txid, input.vout))
+
+    def on_output(self, output):
+        self.outputs.append((txid_of(output), output.n))
+
+
+class BulkObserver(ItemsObserver):
+    def __init__(self, output_filter=None, input_filter=None):
+        super(BulkObserver, self).__init__(output_filter, input_filter)
+        self.values = []
+
+    def on_inputs(self, transaction, inputs):
+        self.inputs.extend((transaction.txid,) + prevout(outpoint) for n, outpoint in inputs)
+
+    def on_outputs(self, transaction, outputs):
+        self.outputs.extend((transaction.txid, n) for n, value, script in outputs)
+        self.values.extend(value for n, value, script in outputs)
+
+
+class TestFilters(TestCase):
+    def setUp(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))
+        self.blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+        self.btcd_blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None)
+                            for blockhash in blockhashes]
+        self.outputs = [(tx.txid, vout.n, vout.value_sat, set(vout.scriptPubKey.addresses or ()))
+                        for block in self.btcd_blocks for tx in block.tx for vout in tx.vout]
+        self.addresses = sorted(set(a for txid, n, value, addresses in self.outputs for a in addresses))
+
+    def test_raw(self):
+        for block, btcd_block in zip(self.blocks, self.btcd_blocks):
+            for tx, btcd_tx in zip(block.tx, btcd_block.tx):
+                self.assertEqual(tx.raw_outputs(), btcd_tx.raw_outputs())
+                self.assertEqual(tx.raw_inputs(), btcd_tx.raw_inputs())
+
+    def test_output_filter_addresses(self):
+        raw = [output for block in self.blocks for tx in block.tx for output in tx.raw_outputs()]
+        for watched in (self.addresses[:1], self.addresses[::3], self.addresses):
+            sut = OutputFilter(addresses=watched)
+            self.assertEqual(sut.select(raw), [i for i, (txid, n, value, addresses) in enumerate(self.outputs)
+                                               if addresses & set(watched)])
+        sut = OutputFilter(addresses=self.addresses, min_value=50 * 10 ** 8)
+        self.assertEqual(sut.select(raw), [i for i, output in enumerate(self.outputs) if output[2] >= 50 * 10 ** 8])
+        self.assertEqual(OutputFilter(addresses=[]).select(raw), [])
+
+    def test_output_filter_keys(self):
+        pubkey_hash = bin_hash160(PUBKEYS[1])
+        p2pk = bytes((33,)) + PUBKEYS[1] + b'\xac'
+        multisig = b'\x51' + b''.join(bytes((33,)) + k for k in PUBKEYS) + b'\x52\xae'
+        watched = b58check_encode(pubkey_hash, 0x00)
+        self.assertIn(watched, decoded_addresses(p2pk))
+        self.assertIn(watched, decoded_addresses(multisig))
+        sut = OutputFilter(addresses=[watched])
+        self.assertEqual(sut.select([(0, p2pk), (0, multisig), (0, address_script(watched)), (0, b'\xac')]),
+                         [0, 1, 2])
+        testnet = OutputFilter(addresses=[b58check_encode(pubkey_hash, 0x6F)])
+        self.assertEqual(testnet.select([(0, p2pk), (0, multisig), (0, address_script(watched))]), [2])
+        with self.assertRaises(ValueError):
+            OutputFilter(addresses=['1PLoYttF6YdytJRzdnyubpEethhn5B8837'])
+        with self.assertRaises(ValueError):
+            OutputFilter(addresses=[b58check_encode(b'\x01' * 20, 0x80)])
+
+    def test_output_filter_op_return(self):
+        scripts = [b'\x6a\x04omni' + b'\x00' * 4, b'\x6a\x4c\x05omni!', b'\x6a\x4d\x04\x00omni', b'\x6a',
+                   b'\x6a\x03abc', b'\x04omni\xac']
+        self.assertEqual([op_return_data(s) for s in scripts],
+                         [b'omni', b'omni!', b'omni', b'', b'abc', None])
+        self.assertEqual(OutputFilter(op_return_prefix=b'omni').select([(0, s) for s in scripts]), [0, 1, 2])
+        self.assertEqual(OutputFilter(op_return_prefix='').select([(0, s) for s in scripts]), [0, 1, 2, 3, 4])
+
+    def test_output_filter_script_types(self):
+        raw = [(0, address_script(self.addresses[0])), (0, bytes((33,)) + PUBKEYS[0] + b'\xac'),
+               (0, b'\xa9\x14' + b'\x01' * 20 + b'\x87'), (0, b'\x6a\x03abc')]
+        self.assertEqual(OutputFilter(script_types=['pubkey', 'nulldata']).select(raw), [1, 3])
+        with self.assertRaises(ValueError):
+            OutputFilter(script_types=['p2pkh'])
+
+    def test_input_filter(self):
+        vins = [(vin.txid, vin.vout) for block in self.btcd_blocks for tx in block.tx for vin in tx.vin
+                if not vin.coinbase]
+        sut = InputFilter(vins[::2])
+        raw = [outpoint for block in self.blocks for tx in block.tx for outpoint in tx.raw_inputs()]
+        selected = [raw[i] for i in sut.select(raw)]
+        self.assertEqual(len(selected), len(vins[::2]))
+        self.assertTrue(all(sut.match(outpoint) for outpoint in selected))
+
+    def scan(self, scanner_class, blocks):
+        watched = self.addresses[::4]
+        observer = ItemsObserver(OutputFilter(addresses=watched),
+                                 InputFilter([(txid, n) for txid, n, value, addresses in self.outputs]))
+        bulk = BulkObserver(OutputFilter(min_value=10 ** 9))
+        everything = ItemsObserver()
+        sut = scanner_class(blocks)
+        for observers in (sut.inputs_observers, sut.outputs_observers):
+            observers.extend([observer, bulk, everything])
+        sut.scan()
+        self.assertEqual(observer.outputs, [(txid, n) for txid, n, value, addresses in self.outputs
+                                            if addresses & set(watched)])
+        self.assertEqual(bulk.outputs, [(txid, n) for txid, n, value, addresses in self.outputs
+                                        if value >= 10 ** 9])
+        self.assertEqual(bulk.values, [value for txid, n, value, addresses in self.outputs if value >= 10 ** 9])
+        self.assertEqual(len(everything.outputs), len(self.outputs))
+        spent = [vin for vin in everything.inputs if vin[1:] in set((txid, n) for txid, n, v, a in self.outputs)]
+        self.assertEqual(observer.inputs, spent)
+        self.assertEqual(bulk.inputs, everything.inputs)
+
+    def test_scanners(self):
+        for blocks in (self.blocks, self.btcd_blocks):
+            self.scan(BitcoinScanner, blocks)
+            self.scan(AsyncBitcoinScanner, blocks)
+            self.scan(PipelinedScanner, blocks)
+
+    def test_mempool(self):
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'main'
+        sut = mempool_inspector.MempoolInspector(BitcoindFactory(btcd), async=False)
+        filtered = ItemsObserver(OutputFilter(min_value=10 ** 6))
+        bulk, everything = BulkObserver(), ItemsObserver()
+        sut.inputs_join_mempool_observers.extend([bulk, everything])
+        sut.outputs_join_mempool_observers.extend([filtered, bulk, everything])
+        with patch.object(mempool_inspector, '_split_items_observers',
+                          wraps=mempool_inspector._split_items_observers) as split:
+            sut.inspect()
+        self.assertEqual(split.call_count, 2)
+        self.assertGreater(len(everything.outputs), 0)
+        self.assertEqual(bulk.outputs, everything.outputs)
+        self.assertEqual(bulk.inputs, everything.inputs)
+        self.assertEqual(filtered.outputs, [o for o, value in zip(bulk.outputs, bulk.values) if value >= 10 ** 6])
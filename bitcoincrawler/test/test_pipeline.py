@@ -0,0 +1,202 @@
+from unittest import TestCase
+from copy import deepcopy
+import os
+import threading
+import time
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.client import BitcoinCli
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.pybitcointools import decoders
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.components.model import BlockDisconnected
+from bitcoincrawler.pipeline import PipelinedScanner
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, get_raw_block, bitcoin_cli_mock
+from bitcoincrawler.test.mocks.components.bitcoind.server import FakeBitcoind
+from bitcoincrawler.test.test_scanner import BulkObserver, ItemsObserver
+from mock import patch
+
+
+class Crash(Exception):
+    pass
+
+
+class BlocksObserver:
+    def __init__(self, delay=0, crash_at=None):
+        self.hashes = []
+        self.delay = delay
+        self.crash_at = crash_at
+
+    def on_block(self, block):
+        if len(self.hashes) == self.crash_at:
+            raise Crash()
+        time.sleep(self.delay)
+        self.hashes.append(block.hash)
+
+    def on_block_disconnected(self, block):
+        self.hashes.append(('disconnected', block.hash))
+
+
+class AddressesObserver:
+    needs = {'vout.value', 'vout.addresses'}
+
+    def __init__(self):
+        self.addresses = []
+
+    def on_output(self, output):
+        self.addresses.append(output.scriptPubKey.addresses)
+
+
+class TestPipelinedScanner(TestCase):
+    def setUp(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))[:6]
+        self.blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes]
+        self.fetched = 0
+
+    def generate(self, blocks, delay=0):
+        for block in blocks:
+            time.sleep(delay)
+            self.fetched += 1
+            yield block
+
+    def test_scan(self):
+        expected = ItemsObserver()
+        scanner = BitcoinScanner(self.blocks)
+        for observers in (scanner.transactions_observers, scanner.inputs_observers, scanner.outputs_observers):
+            observers.append(expected)
+        scanner.scan()
+        items, bulk, blocks = ItemsObserver(), BulkObserver(), BlocksObserver()
+        sut = PipelinedScanner(self.generate(self.blocks + [BlockDisconnected(self.blocks[-1])], delay=0.001),
+                               parse_workers=3, queue_size=2)
+        sut.blocks_observers.append(blocks)
+        for observers in (sut.transactions_observers, sut.inputs_observers, sut.outputs_observers):
+            observers.extend([items, bulk])
+        sut.scan()
+        self.assertEqual(blocks.hashes, [block.hash for block in self.blocks] +
+                         [('disconnected', self.blocks[-1].hash)])
+        for observer in (items, bulk):
+            self.assertEqual(observer.transactions, expected.transactions)
+            self.assertEqual(observer.inputs, expected.inputs)
+            self.assertEqual(observer.outputs, expected.outputs)
+        stats = sut.stats()
+        self.assertEqual(stats['fetch']['blocks'], len(self.blocks) + 1)
+        self.assertEqual(stats['parse']['blocks'], len(self.blocks))
+        self.assertEqual(stats['dispatch']['blocks'], len(self.blocks))
+        self.assertLessEqual(stats['max_queue_depth'], 2)
+        self.assertEqual(sut.queue_depth, 0)
+
+    def test_backpressure(self):
+        observer = BlocksObserver(delay=0.01)
+        ahead = []
+
+        def blocks():
+            for block in self.blocks * 4:
+                ahead.append(len(ahead) - len(observer.hashes))
+                yield block
+        sut = PipelinedScanner(blocks(), parse_workers=2, queue_size=2)
+        sut.blocks_observers.append(observer)
+        sut.scan()
+        self.assertEqual(len(observer.hashes), len(self.blocks) * 4)
+        # queued blocks, and the one being dispatched
+        self.assertLessEqual(max(ahead), 2 + 1)
+        self.assertGreater(sut.stats()['dispatch']['utilization'], 0.5)
+
+    def test_observer_error_stops_stages(self):
+        threads = threading.active_count()
+        sut = PipelinedScanner(self.generate(self.blocks * 10), queue_size=2)
+        sut.blocks_observers.append(BlocksObserver(crash_at=2))
+        with self.assertRaises(Crash):
+            sut.scan()
+        self.assertLess(self.fetched, len(self.blocks) * 10)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_generator_error(self):
+        def blocks():
+            yield self.blocks[0]
+            raise Crash()
+        sut = PipelinedScanner(blocks())
+        observer = BlocksObserver()
+        sut.blocks_observers.append(observer)
+        with self.assertRaises(Crash):
+            sut.scan()
+        self.assertEqual(observer.hashes, [self.blocks[0].hash])
+
+    def scan_in_thread(self, sut):
+        """
+        :return: the scan error, in at most 5 seconds: a scan that never returns fails the test
+        """
+        errors = []
+
+        def scan():
+            try:
+                sut.scan()
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=scan, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), 'scan hangs')
+        return errors[0] if errors else None
+
+    def test_invalid_needs(self):
+        observer = AddressesObserver()
+        observer.needs = {'vout.valeu'}
+        sut = PipelinedScanner(self.generate(self.blocks))
+        sut.outputs_observers.append(observer)
+        self.assertIsInstance(self.scan_in_thread(sut), ValueError)
+        self.assertEqual(self.fetched, 0)
+
+    def test_not_iterable_generator(self):
+        sut = PipelinedScanner(42)
+        sut.blocks_observers.append(BlocksObserver())
+        self.assertIsInstance(self.scan_in_thread(sut), TypeError)
+
+    def scan_factory(self, factory, first_height):
+        expected = ItemsObserver()
+        scanner = BitcoinScanner(factory.generate_blocks(blockheight=first_height, max_iterations=4))
+        scanner.outputs_observers.append(expected)
+        scanner.scan()
+        observer = ItemsObserver()
+        sut = PipelinedScanner(factory.generate_blocks(blockheight=first_height, max_iterations=4), parse_workers=2)
+        for observers in (sut.transactions_observers, sut.inputs_observers, sut.outputs_observers):
+            observers.append(observer)
+        sut.scan()
+        self.assertEqual(observer.outputs, expected.outputs)
+        self.assertEqual(len(observer.transactions), len(set(txid for txid, n in expected.outputs)))
+
+    def test_async_factory(self):
+        """
+        block.tx rpcs of async factories run on the parse workers event loops
+        """
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'main'
+        server = FakeBitcoind().start()
+        first_height = min(server.blockhashes)
+        try:
+            self.scan_factory(BitcoindFactory(btcd, async=True), first_height)
+            with BitcoinCli('username', 'password', server.url, async=True) as cli:
+                self.scan_factory(BitcoindFactory(cli, async=True, batch_size=10), first_height)
+        finally:
+            server.stop()
+
+    def test_decode_in_parse_stage(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))[:6]
+        blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+        threads = []
+        decode_script = decoders.VOUTDecoder.decode_script
+
+        def decode(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return decode_script(*args, **kwargs)
+        script_cache.clear()
+        observer = AddressesObserver()
+        sut = PipelinedScanner(blocks, parse_workers=2)
+        sut.outputs_observers.append(observer)
+        with patch.object(decoders.VOUTDecoder, 'decode_script', side_effect=decode):
+            sut.scan()
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(len(observer.addresses), sum(len(list(tx.vout)) for block in blocks for tx in block.tx))
+        self.assertTrue(all(observer.addresses))
+        script_cache.clear()
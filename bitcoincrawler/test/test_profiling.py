@@ -0,0 +1,122 @@
+from unittest import TestCase
+from copy import deepcopy
+import json
+import os
+import shutil
+import tempfile
+import time
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.filters import OutputFilter
+from bitcoincrawler.mempool_inspector import MempoolInspector
+from bitcoincrawler.profiling import ScanProfiler, LogReporter, JsonReporter
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, bitcoin_cli_mock
+from bitcoincrawler.test.test_scanner import BulkObserver, ItemsObserver
+
+
+class SlowObserver:
+    def on_block(self, block):
+        time.sleep(0.002)
+
+
+class TestScanProfiler(TestCase):
+    def setUp(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))[:4]
+        self.blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes]
+
+    def scan(self, profiler, observers=None):
+        items = ItemsObserver()
+        sut = BitcoinScanner(self.blocks, profiler=profiler)
+        sut.blocks_observers.append(SlowObserver())
+        observers = observers or [items, BulkObserver()]
+        for kind in (sut.transactions_observers, sut.inputs_observers, sut.outputs_observers):
+            kind.extend(observers)
+        sut.scan()
+        return items
+
+    def test_profiler(self):
+        reports = []
+        profiler = ScanProfiler(reporter=reports.append, every=2, window=3, sample=1)
+        items = self.scan(profiler)
+        self.assertEqual(len(reports), 2)
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot['blocks'], 4)
+        self.assertEqual(snapshot['last_block']['height'], self.blocks[-1].height)
+        self.assertEqual(snapshot['last_block']['transactions'], len(self.blocks[-1].json['tx']))
+        window = snapshot['window']
+        self.assertEqual(window['blocks'], 3)
+        self.assertGreaterEqual(window['dispatch'], 0.002)
+        self.assertGreater(window['outputs_per_s'], window['transactions_per_s'])
+        observers = {(o['observer'], o['callback']): o for o in snapshot['observers']}
+        self.assertEqual(snapshot['observers'][0]['observer'], 'SlowObserver')
+        self.assertEqual(observers[('SlowObserver', 'on_block')]['calls'], 4)
+        self.assertEqual(observers[('ItemsObserver', 'on_output')]['calls'], len(items.outputs))
+        self.assertEqual(observers[('BulkObserver', 'on_outputs')]['calls'], len(items.transactions))
+        json.dumps(snapshot)
+
+    def test_counts(self):
+        """
+        items are counted once, whatever the observers notified of them
+        """
+        last = self.blocks[-1]
+        expected = {'transactions': len(last.json['tx']), 'inputs': sum(len(tx['vin']) for tx in last.json['tx']),
+                    'outputs': sum(len(tx['vout']) for tx in last.json['tx'])}
+        filtered = ItemsObserver()
+        filtered.output_filter = OutputFilter(min_value=10 ** 20)
+        for observers in ([ItemsObserver()], [ItemsObserver(), ItemsObserver(), BulkObserver()], [BulkObserver()],
+                          [BulkObserver(), filtered], [ItemsObserver(), filtered]):
+            profiler = ScanProfiler()
+            self.scan(profiler, observers)
+            last_block = profiler.snapshot()['last_block']
+            self.assertEqual({kind: last_block[kind] for kind in expected}, expected)
+
+    def test_sample(self):
+        """
+        one transaction every `sample` is timed, counting for `sample`: the observers get the same items
+        """
+        expected = self.scan(None)
+        profiler = ScanProfiler(sample=3)
+        items = self.scan(profiler)
+        self.assertEqual((items.transactions, items.inputs, items.outputs),
+                         (expected.transactions, expected.inputs, expected.outputs))
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot['last_block']['outputs'], sum(len(tx['vout']) for tx in self.blocks[-1].json['tx']))
+        observers = {(o['observer'], o['callback']): o for o in snapshot['observers']}
+        self.assertEqual(observers[('SlowObserver', 'on_block')]['calls'], 4)
+        self.assertEqual(observers[('ItemsObserver', 'on_transaction')]['calls'],
+                         3 * len(range(0, len(items.transactions), 3)))
+        self.assertEqual(observers[('ItemsObserver', 'on_output')]['calls'] % 3, 0)
+
+    def test_disabled(self):
+        sut = BitcoinScanner(self.blocks)
+        self.assertNotIn('_call', vars(sut))
+        self.assertNotIn('_observe', vars(sut))
+
+    def test_reporters(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'profile.json')
+            profiler = ScanProfiler(reporter=JsonReporter(path), every=1)
+            self.scan(profiler)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['blocks'], 4)
+        finally:
+            shutil.rmtree(directory)
+        with self.assertLogs('bitcoincrawler.profiling') as logs:
+            self.scan(ScanProfiler(reporter=LogReporter(), every=4))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('SlowObserver.on_block', logs.output[0])
+
+    def test_mempool(self):
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'main'
+        profiler = ScanProfiler()
+        sut = MempoolInspector(BitcoindFactory(btcd), async=False, profiler=profiler)
+        observer = ItemsObserver()
+        sut.transaction_join_mempool_observers.append(observer)
+        sut.inspect()
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot['blocks'], 1)
+        self.assertEqual(snapshot['last_block']['transactions'], len(observer.transactions))
+        self.assertGreater(snapshot['last_block']['fetch'], 0)
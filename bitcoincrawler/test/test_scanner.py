@@ -1,6 +1,25 @@
 from unittest import TestCase
+from copy import deepcopy
+import os
 from bitcoincrawler import blockchain_scanner
-from mock import Mock
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.model import COINBASE_OUTPOINT
+from bitcoincrawler.components.pybitcointools.addresses import address_cache
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.components.pybitcointools.serialization import hash_to_hex
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, bitcoin_cli_mock
+from mock import Mock, MagicMock, patch
+import struct
+
+
+def prevout(outpoint):
+    """
+    (txid, n) of a raw input outpoint, (None, None) for coinbase inputs
+    """
+    if outpoint == COINBASE_OUTPOINT:
+        return None, None
+    return hash_to_hex(outpoint[:32]), struct.unpack('<I', outpoint[32:])[0]
 
 class TestScanner(TestCase):
     def setUp(self):
@@ -40,4 +59,121 @@ class TestScanner(TestCase):
         self.mempool_obs.reset_mock()
 
     def test___notify_block(self):
-        pass
\ No newline at end of file
+        pass
+
+class HeaderOnlyBlock:
+    def __init__(self, height):
+        self.height = height
+
+    @property
+    def tx(self):
+        raise AssertionError('transactions requested')
+
+
+class ItemsObserver:
+    def __init__(self):
+        self.transactions = []
+        self.inputs = []
+        self.outputs = []
+
+    def on_transaction(self, transaction):
+        self.transactions.append(transaction.txid)
+
+    def on_input(self, input):
+        self.inputs.append((input.parent.txid, input.txid, input.vout))
+
+    def on_output(self, output):
+        self.outputs.append((output.parent.txid, output.n))
+
+
+class BulkObserver(ItemsObserver):
+    def __init__(self):
+        super(BulkObserver, self).__init__()
+        self.calls = 0
+
+    def on_block_transactions(self, block, transactions):
+        self.calls += 1
+        self.transactions.extend(tx.txid for tx in transactions)
+
+    def on_inputs(self, transaction, inputs):
+        self.calls += 1
+        self.inputs.extend((transaction.txid,) + prevout(outpoint) for n, outpoint in inputs)
+
+    def on_outputs(self, transaction, outputs):
+        self.calls += 1
+        self.outputs.extend((transaction.txid, n) for n, value, script in outputs)
+
+
+class TestScannerNotifications(TestCase):
+    def test_blocks_observers_only(self):
+        block_obs = Mock()
+        sut = blockchain_scanner.BitcoinScanner([HeaderOnlyBlock(1), HeaderOnlyBlock(2)])
+        sut.blocks_observers.append(block_obs)
+        sut.scan()
+        self.assertEqual([c[0][0].height for c in block_obs.on_block.call_args_list], [1, 2])
+
+    def test_no_observers(self):
+        blocks = MagicMock()
+        sut = blockchain_scanner.BitcoinScanner(blocks)
+        sut.scan()
+        self.assertFalse(blocks.__iter__.called)
+
+    def test_needs(self):
+        values, addresses = Mock(needs={'vout.value'}), Mock(needs={'vout.value', 'vout.addresses'})
+        sut = blockchain_scanner.BitcoinScanner([])
+        sut.outputs_observers.extend([values, addresses])
+        self.assertEqual(sut.needs, {'vout.value', 'vout.addresses'})
+        sut.blocks_observers.append(Mock(needs=None))
+        self.assertIsNone(sut.needs)
+        sut.blocks_observers[0] = Mock(needs={'vout.valeu'})
+        with self.assertRaises(ValueError):
+            sut.needs
+
+    def test_needs_given_to_factory(self):
+        """
+        Fields no observer reads are never decoded
+        """
+        class ValuesObserver:
+            needs = {'vout.value', 'vout.type'}
+
+            def __init__(self):
+                self.values = []
+
+            def on_output(self, output):
+                self.values.append((output.value_sat, output.scriptPubKey.type))
+        btcd = deepcopy(bitcoin_cli_mock)
+        btcd.network = 'main'
+        decoded = []
+        for scanner_factory in (None, PyBitcoinToolsFactory(btcd, raw_blocks=True)):
+            factory = scanner_factory or PyBitcoinToolsFactory(btcd, raw_blocks=True)
+            observer = ValuesObserver()
+            sut = blockchain_scanner.BitcoinScanner(factory.generate_blocks(blockheight=115000, max_iterations=3),
+                                                    factory=scanner_factory)
+            sut.outputs_observers.append(observer)
+            script_cache.clear()
+            with patch.object(address_cache, 'address', wraps=address_cache.address) as address:
+                sut.scan()
+            decoded.append((observer.values, address.call_count))
+        script_cache.clear()
+        everything, projected = decoded
+        self.assertTrue(everything[0])
+        self.assertGreater(everything[1], 0)
+        self.assertEqual(projected, (everything[0], 0))
+        self.assertEqual(factory.needs, {'vout.value', 'vout.type'})
+        # needs given to the factory are kept
+        factory.needs = {'vout.addresses'}
+        blockchain_scanner.BitcoinScanner([], factory=factory).scan()
+        self.assertEqual(factory.needs, {'vout.addresses'})
+
+    def test_bulk_observers(self):
+        blockhashes = sorted(f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/'))[:3]
+        blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes]
+        items, bulk = ItemsObserver(), BulkObserver()
+        sut = blockchain_scanner.BitcoinScanner(blocks)
+        for observers in (sut.transactions_observers, sut.inputs_observers, sut.outputs_observers):
+            observers.extend([items, bulk])
+        sut.scan()
+        self.assertEqual(bulk.transactions, items.transactions)
+        self.assertEqual(bulk.inputs, items.inputs)
+        self.assertEqual(bulk.outputs, items.outputs)
+        self.assertEqual(bulk.calls, len(blocks) + 2 * len(items.transactions))
@@ -0,0 +1,105 @@
+from unittest import TestCase
+from copy import deepcopy
+from bitcoincrawler import sharded_scanner
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
+from bitcoincrawler.observers import MergeableObserver
+from bitcoincrawler.test.mocks.components.bitcoind.client import bitcoin_cli_mock
+
+
+class CountingObserver(MergeableObserver):
+    def __init__(self):
+        self.heights = []
+        self.transactions = 0
+        self.outputs = 0
+
+    def on_block(self, block):
+        self.heights.append(block.height)
+
+    def on_transaction(self, transaction):
+        self.transactions += 1
+
+    def on_output(self, output):
+        self.outputs += 1
+
+    def merge(self, other):
+        self.heights.extend(other.heights)
+        self.transactions += other.transactions
+        self.outputs += other.outputs
+
+
+class BulkCountingObserver(MergeableObserver):
+    def __init__(self):
+        self.transactions = 0
+        self.inputs = 0
+        self.outputs = 0
+
+    def on_block_transactions(self, block, transactions):
+        self.transactions += len(transactions)
+
+    def on_inputs(self, transaction, inputs):
+        self.inputs += len(inputs)
+
+    def on_outputs(self, transaction, outputs):
+        self.outputs += len(outputs)
+
+    def merge(self, other):
+        self.transactions += other.transactions
+        self.inputs += other.inputs
+        self.outputs += other.outputs
+
+
+def make_factory():
+    return BitcoindFactory(deepcopy(bitcoin_cli_mock))
+
+
+def make_observers():
+    return [CountingObserver()]
+
+
+def make_bulk_observers():
+    return [BulkCountingObserver()]
+
+
+class TestShardedScanner(TestCase):
+    def test_plan_shards(self):
+        self.assertEqual(sharded_scanner.plan_shards(0, 10, 2, [1] * 10), [(0, 5), (5, 10)])
+        self.assertEqual(sharded_scanner.plan_shards(0, 10, 2, [1] * 8 + [8, 8]), [(0, 9), (9, 10)])
+        self.assertEqual(sharded_scanner.plan_shards(0, 2, 4, [1, 1]), [(0, 1), (1, 2)])
+
+    def test_interpolate(self):
+        self.assertEqual(sharded_scanner.interpolate([(10, 1), (14, 9)], 9, 16), [1, 1, 3, 5, 7, 9, 9])
+
+    def test_scan(self):
+        expected = CountingObserver()
+        scanner = BitcoinScanner(make_factory().generate_blocks(blockheight=115000, stop_blockheight=115006))
+        sharded_scanner.register(scanner, [expected])
+        scanner.scan()
+
+        sut = sharded_scanner.ShardedScanner(make_factory, make_observers, workers=2, shards_per_worker=2, samples=3)
+        observer, = sut.scan(115000, 115006)
+        self.assertEqual(observer.heights, list(range(115000, 115007)))
+        self.assertEqual(observer.transactions, expected.transactions)
+        self.assertEqual(observer.outputs, expected.outputs)
+        self.assertEqual(sum(stats.blocks for stats in sut.workers_stats), 7)
+        self.assertEqual(sum(stats.transactions for stats in sut.workers_stats), expected.transactions)
+        self.assertEqual(sum(stats.shards for stats in sut.workers_stats), 4)
+
+    def test_scan_bulk_observers(self):
+        expected = BulkCountingObserver()
+        scanner = BitcoinScanner(make_factory().generate_blocks(blockheight=115000, stop_blockheight=115006))
+        sharded_scanner.register(scanner, [expected])
+        scanner.scan()
+        self.assertGreater(expected.inputs, 0)
+
+        sut = sharded_scanner.ShardedScanner(make_factory, make_bulk_observers, workers=2, shards_per_worker=2,
+                                             samples=3)
+        observer, = sut.scan(115000, 115006)
+        self.assertEqual((observer.transactions, observer.inputs, observer.outputs),
+                         (expected.transactions, expected.inputs, expected.outputs))
+        self.assertEqual(observer.transactions, sum(stats.transactions for stats in sut.workers_stats))
+
+    def test_scan_invalid_range(self):
+        sut = sharded_scanner.ShardedScanner(make_factory, make_observers, workers=1)
+        with self.assertRaises(ValueError):
+            sut.scan(115006, 115000)
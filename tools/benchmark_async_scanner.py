@@ -0,0 +1,64 @@
+"""
+Inputs and outputs/s notified to one transaction, one input and one output observer over the fixture blocks:
+BitcoinScanner(async=True), one run_until_complete per callback, vs. AsyncBitcoinScanner with sync
+and with coroutine observers.
+"""
+import asyncio
+import os
+import time
+
+from bitcoincrawler.async_scanner import AsyncBitcoinScanner
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block
+
+ROUNDS = 50
+
+
+class Counter:
+    def __init__(self):
+        self.n = 0
+
+    def on_transaction(self, transaction):
+        self.n += 1
+
+    def on_input(self, input):
+        self.n += 1
+
+    def on_output(self, output):
+        self.n += 1
+
+
+class AsyncCounter(Counter):
+    @asyncio.coroutine
+    def on_transaction(self, transaction):
+        self.n += 1
+
+    @asyncio.coroutine
+    def on_input(self, input):
+        self.n += 1
+
+    @asyncio.coroutine
+    def on_output(self, output):
+        self.n += 1
+
+
+def measure(name, scanner_factory, observer, blocks):
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        scanner = scanner_factory(blocks)
+        scanner.transactions_observers.append(observer)
+        scanner.inputs_observers.append(observer)
+        scanner.outputs_observers.append(observer)
+        scanner.scan()
+    elapsed = time.time() - s
+    print('{:<28} {:>7} callbacks in {:.2f}s ({:.0f} callbacks/s)'.format(name, observer.n, elapsed,
+                                                                          observer.n / elapsed))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    blocks = [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes]
+    measure('BitcoinScanner(async=True)', lambda blocks: BitcoinScanner(blocks, async=True), Counter(), blocks)
+    measure('AsyncBitcoinScanner, sync', AsyncBitcoinScanner, Counter(), blocks)
+    measure('AsyncBitcoinScanner, async', AsyncBitcoinScanner, AsyncCounter(), blocks)
@@ -0,0 +1,46 @@
+"""
+Outputs/s summing the outputs value of the fixture blocks with BitcoinScanner: on_output per output
+vs. on_outputs per transaction, on the raw outputs.
+"""
+import os
+import time
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_raw_block
+
+ROUNDS = 1000
+
+
+class ValueSum:
+    def __init__(self):
+        self.outputs = 0
+        self.value = 0
+
+    def on_output(self, output):
+        self.outputs += 1
+        self.value += output.value_sat
+
+
+class BulkValueSum(ValueSum):
+    def on_outputs(self, transaction, outputs):
+        self.outputs += len(outputs)
+        self.value += sum(value for n, value, script in outputs)
+
+
+def measure(name, observer, blocks):
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        scanner = BitcoinScanner(blocks)
+        scanner.outputs_observers.append(observer)
+        scanner.scan()
+    elapsed = time.time() - s
+    print('{:<10} {:>7} outputs in {:.2f}s ({:.0f} outputs/s), {} satoshis'.format(
+        name, observer.outputs, elapsed, observer.outputs / elapsed, observer.value))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+    measure('on_output', ValueSum(), blocks)
+    measure('on_outputs', BulkValueSum(), blocks)
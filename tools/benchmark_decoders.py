@@ -0,0 +1,62 @@
+"""
+Outputs/s decoding the fixture transactions outputs: tokenizer only vs. byte templates with tokenizer fallback,
+with and without the address and script caches; base58check encoding: pybitcointools vs. in-project encoder.
+"""
+import json
+import time
+
+from bitcoin import deserialize, bin_to_b58check
+
+from bitcoincrawler.components.pybitcointools.addresses import address_cache, b58check_encode
+from bitcoincrawler.components.pybitcointools.decoders import VOUTDecoder
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX
+
+ROUNDS = 5
+
+
+def tokenized(vouts):
+    for n, vout in enumerate(vouts):
+        VOUTDecoder.decode_tokenized(vout, n, 'main')
+
+
+def templates(vouts):
+    for n, vout in enumerate(vouts):
+        VOUTDecoder.decode(vout, n, 'main')
+
+
+def measure(name, func, vouts, cache_size=2**16, script_cache_bytes=0):
+    address_cache.clear()
+    address_cache.maxsize = cache_size
+    script_cache.clear()
+    script_cache.maxbytes = script_cache_bytes
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        func(vouts)
+    elapsed = time.time() - s
+    n = len(vouts) * ROUNDS
+    print('{:<24} {:>6} outputs in {:.2f}s ({:.0f} outputs/s), address cache hit rate {:.1%}, '
+          'script cache hit rate {:.1%} ({} bytes)'.format(name, n, elapsed, n / elapsed, address_cache.hit_rate,
+                                                           script_cache.hit_rate, script_cache.bytes))
+
+
+def measure_b58check(name, func, hashes):
+    s = time.time()
+    for h in hashes:
+        func(h, 0)
+    elapsed = time.time() - s
+    print('{:<24} {:>6} addresses in {:.2f}s ({:.0f} addresses/s)'.format(name, len(hashes), elapsed,
+                                                                         len(hashes) / elapsed))
+
+
+if __name__ == '__main__':
+    with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+        vouts = [vout for rawtx in json.load(f).values() for vout in deserialize(rawtx)['outs']]
+    measure('tokenized, no cache', tokenized, vouts, cache_size=0)
+    measure('templates, no cache', templates, vouts, cache_size=0)
+    measure('tokenized', tokenized, vouts)
+    measure('templates', templates, vouts)
+    measure('templates, script cache', templates, vouts, script_cache_bytes=32 * 2**20)
+    hashes = [bytes((i % 256,)) * 20 for i in range(0, 20000)]
+    measure_b58check('bin_to_b58check', bin_to_b58check, hashes)
+    measure_b58check('b58check_encode', b58check_encode, hashes)
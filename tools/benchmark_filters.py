@@ -0,0 +1,72 @@
+"""
+Outputs/s of BitcoinScanner on the fixture blocks for an observer watching 100k addresses:
+checking vout.scriptPubKey.addresses in on_output vs. an OutputFilter on the raw scripts,
+and the cost of OutputFilter.select alone.
+"""
+import os
+import random
+import time
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.pybitcointools.addresses import b58check_encode
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.filters import OutputFilter
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_raw_block
+
+ROUNDS = 50
+WATCHED = 100000
+
+
+class Watcher:
+    def __init__(self, watched):
+        self.watched = watched
+        self.outputs = 0
+        self.matches = 0
+
+    def on_output(self, output):
+        self.outputs += 1
+        if any(a in self.watched for a in output.scriptPubKey.addresses or ()):
+            self.matches += 1
+
+
+class FilteredWatcher:
+    def __init__(self, watched):
+        self.output_filter = OutputFilter(addresses=watched)
+        self.matches = 0
+
+    def on_output(self, output):
+        self.matches += 1
+
+
+def measure(name, observer, blocks, outputs):
+    script_cache.clear()
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        scanner = BitcoinScanner(blocks)
+        scanner.outputs_observers.append(observer)
+        scanner.scan()
+    elapsed = time.time() - s
+    print('{:<9} {:>7} outputs in {:.2f}s ({:.0f} outputs/s), {} matches'.format(
+        name, outputs * ROUNDS, elapsed, outputs * ROUNDS / elapsed, observer.matches))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+    raw = [output for block in blocks for tx in block.tx for output in tx.raw_outputs()]
+    addresses = [a for block in blocks for tx in block.tx for vout in tx.vout
+                 for a in vout.scriptPubKey.addresses or ()]
+    random.seed(0)
+    watched = set(random.sample(addresses, 10))
+    watched.update(b58check_encode(os.urandom(20), random.choice((0x00, 0x05))) for _ in range(WATCHED - 10))
+    s = time.time()
+    output_filter = OutputFilter(addresses=watched)
+    print('OutputFilter of {} addresses built in {:.2f}s'.format(len(watched), time.time() - s))
+    measure('on_output', Watcher(watched), blocks, len(raw))
+    measure('filtered', FilteredWatcher(watched), blocks, len(raw))
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        output_filter.select(raw)
+    elapsed = time.time() - s
+    print('select    {:.2f}us per output'.format(elapsed / (len(raw) * ROUNDS) * 10 ** 6))
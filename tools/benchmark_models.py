@@ -0,0 +1,48 @@
+"""
+Materializes every input and output (with its script view) of the fixture blocks, keeping them all alive:
+memory (tracemalloc) and objects/s, for the bitcoind (getblock verbosity 2) and pybitcointools (raw block) models.
+"""
+import os
+import time
+import tracemalloc
+
+from bitcoincrawler.components.bitcoind.model import BTCDBlock
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, get_raw_block
+
+ROUNDS = 20
+
+
+def materialize(blocks):
+    objects = []
+    for block in blocks:
+        for tx in block.tx:
+            for vin in tx.vin:
+                vin.scriptSig.hex
+                objects.append(vin)
+            for vout in tx.vout:
+                vout.scriptPubKey.hex
+                objects.append(vout)
+    return objects
+
+
+def measure(name, blocks):
+    materialize(blocks)
+    tracemalloc.start()
+    objects = materialize(blocks)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        materialize(blocks)
+    elapsed = time.time() - s
+    n = len(objects) * ROUNDS
+    print('{:<16} {:>6} inputs/outputs, {:>4.0f} bytes each, {:.0f} objects/s'.format(name, len(objects),
+                                                                                       size / len(objects),
+                                                                                       n / elapsed))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    measure('bitcoind', [BTCDBlock(get_block(blockhash, verbosity=2)['result'], None) for blockhash in blockhashes])
+    measure('pybitcointools', [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes])
@@ -0,0 +1,77 @@
+"""
+Transactions/s through PyBitcoinToolsFactory(async=True) on the fixture transactions, parsing on the
+event loop thread (parse_workers=0) vs. a pool of 1..cpu_count processes.
+The rpc side is an in-memory cli: only the parse stage is measured. Every transaction is fully
+decoded (.json), as an observer reading all the fields would do.
+loop ms/tx is the cpu time the event loop process spends per transaction, workers ms/tx the one of the
+parse workers: with as many cores as workers + 1, the pool makes min(1 / loop, workers / workers ms) tx/s.
+The fixtures repeat every ROUNDS: with warm caches nearly every script is a script_cache hit, cold runs them
+with the caches disabled, as on a range of blocks with no address reuse.
+
+Scaling with the workers is unmeasured: the only run so far had 1 core, where the pool can only be slower
+(3913 -> 1946 tx/s warm, 2086 -> 1285 tx/s cold, 1 and 2 workers alike). Its cpu times project it: loop
+~0.2 ms/tx with the pool (0.25 warm, 0.48 cold without), workers 0.31 ms/tx warm, 0.55 ms/tx cold. So on
+workers + 1 cores: ~3200 tx/s per worker warm, ~1800 cold, linear up to the ~5000 tx/s of the loop process,
+reached with 2 workers warm and 3 cold. Past that, more workers add nothing.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from bitcoincrawler.components.pybitcointools.addresses import address_cache
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.components.pybitcointools.script_cache import script_cache
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX
+
+ROUNDS = 40
+BATCH_SIZE = 200
+
+
+class MemoryCli:
+    network = 'main'
+
+    def __init__(self, rawtxs):
+        self.rawtxs = rawtxs
+
+    def get_raw_transactions(self, txids, async=False):
+        res = [{'result': self.rawtxs[txid]} for txid in txids]
+        return asyncio.coroutine(lambda: res)() if async else res
+
+
+def measure(rawtxs, workers, caches):
+    txids = list(rawtxs) * ROUNDS
+    factory = PyBitcoinToolsFactory(MemoryCli(rawtxs), async=True, batch_size=BATCH_SIZE,
+                                    parse_workers=workers, parse_batch_size=BATCH_SIZE // max(workers, 1))
+    children = os.times()
+    try:
+        factory.get_transactions(txids[:BATCH_SIZE])  # starts the workers
+        s, cpu = time.time(), time.process_time()
+        for tx in factory.get_transactions(txids):
+            tx.json
+        elapsed, cpu = time.time() - s, time.process_time() - cpu
+    finally:
+        factory.close()
+    # the workers cpu time is accounted once they exit, warm up included
+    workers_cpu = sum(os.times()[2:4]) - sum(children[2:4])
+    print('{:<5} {:>2} workers {:>6} txs in {:.2f}s ({:.0f} tx/s), loop {:.3f} ms/tx, workers {:.3f} ms/tx'.format(
+        caches, workers, len(txids), elapsed, len(txids) / elapsed, cpu * 1000 / len(txids),
+        workers_cpu * 1000 / (len(txids) + BATCH_SIZE)))
+
+
+if __name__ == '__main__':
+    with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+        rawtxs = json.load(f)
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    for caches in ('warm', 'cold'):
+        if caches == 'cold':
+            # before the workers fork
+            script_cache.maxbytes, address_cache.maxsize = 0, 0
+            script_cache.clear()
+            address_cache.clear()
+        measure(rawtxs, 0, caches)
+        workers = 1
+        while workers <= max_workers:
+            measure(rawtxs, workers, caches)
+            workers *= 2
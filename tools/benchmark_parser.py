@@ -0,0 +1,48 @@
+"""
+Transactions/s parsing the fixture transactions: pybitcointools deserialize() vs. RawTransaction,
+reading every input and output field.
+"""
+import binascii
+import json
+import time
+
+from bitcoin import deserialize
+
+from bitcoincrawler.components.pybitcointools.serialization import RawTransaction
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX
+
+ROUNDS = 50
+
+
+def read(tx):
+    for vin in tx['ins']:
+        vin['outpoint']['hash'], vin['outpoint']['index'], vin['script'], vin['sequence']
+    for vout in tx['outs']:
+        vout['value'], vout['script']
+
+
+def pybitcointools(rawtxs):
+    for rawtx in rawtxs:
+        read(deserialize(rawtx))
+
+
+def raw_transaction(rawtxs):
+    for rawtx in rawtxs:
+        tx = RawTransaction(binascii.unhexlify(rawtx))
+        read({'ins': tx.ins, 'outs': tx.outs})
+
+
+def measure(name, func, rawtxs):
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        func(rawtxs)
+    elapsed = time.time() - s
+    n = len(rawtxs) * ROUNDS
+    print('{:<16} {:>6} txs in {:.2f}s ({:.0f} tx/s)'.format(name, n, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+        rawtxs = list(json.load(f).values())
+    measure('deserialize', pybitcointools, rawtxs)
+    measure('RawTransaction', raw_transaction, rawtxs)
@@ -0,0 +1,66 @@
+"""
+Blocks/s scanning the fixture blocks with simulated rpc latency (FETCH_LATENCY per block, TX_LATENCY per
+block.tx, as the getrawtransaction calls of BitcoindFactory blocks): BitcoinScanner vs. PipelinedScanner,
+with the stages utilization.
+"""
+import os
+import time
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.pipeline import PipelinedScanner, STAGES
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_raw_block
+
+ROUNDS = 10
+FETCH_LATENCY = 0.005
+TX_LATENCY = 0.010
+
+
+class RemoteBlock:
+    def __init__(self, block):
+        self.block = block
+        self.hash = block.hash
+        self.height = block.height
+
+    @property
+    def tx(self):
+        time.sleep(TX_LATENCY)
+        return self.block.tx
+
+
+class ValueSum:
+    def __init__(self):
+        self.value = 0
+
+    def on_output(self, output):
+        self.value += output.value_sat
+
+
+def fetch(blocks):
+    for _ in range(0, ROUNDS):
+        for block in blocks:
+            time.sleep(FETCH_LATENCY)
+            yield RemoteBlock(block)
+
+
+def measure(name, scanner, n):
+    observer = ValueSum()
+    scanner.outputs_observers.append(observer)
+    s = time.time()
+    scanner.scan()
+    elapsed = time.time() - s
+    stats = ''
+    if isinstance(scanner, PipelinedScanner):
+        r = scanner.stats()
+        stats = ', '.join('{} {:.0%}'.format(stage, r[stage]['utilization']) for stage in STAGES)
+        stats += ', max queue depth {}'.format(r['max_queue_depth'])
+    print('{:<24} {:>4} blocks in {:.2f}s ({:.0f} blocks/s) {}'.format(name, n, elapsed, n / elapsed, stats))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+    n = len(blocks) * ROUNDS
+    measure('BitcoinScanner', BitcoinScanner(fetch(blocks)), n)
+    for workers in (1, 2, 4):
+        measure('PipelinedScanner({})'.format(workers), PipelinedScanner(fetch(blocks), parse_workers=workers), n)
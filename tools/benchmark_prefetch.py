@@ -0,0 +1,39 @@
+"""
+blocks/s of generate_blocks against a local fake bitcoind with network latency,
+serial vs. read-ahead (prefetch), while the consumer parses every transaction.
+"""
+import time
+
+from bitcoincrawler.components.bitcoind.client import BitcoinCli
+from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
+from bitcoincrawler.test.mocks.components.bitcoind.server import FakeBitcoind
+
+LATENCY = 0.05
+ROUNDS = 5
+PREFETCH = 4
+
+
+def scan(factory):
+    blocks = 0
+    for _ in range(0, ROUNDS):
+        for block in factory.generate_blocks(blockheight=115000):
+            for tx in block.tx:
+                for vout in tx.vout:
+                    vout.scriptPubKey.addresses
+            blocks += 1
+    return blocks
+
+
+def measure(name, factory):
+    s = time.time()
+    blocks = scan(factory)
+    elapsed = time.time() - s
+    print('{:<16} {:>4} blocks in {:.2f}s ({:.1f} blocks/s)'.format(name, blocks, elapsed, blocks / elapsed))
+
+
+if __name__ == '__main__':
+    server = FakeBitcoind(latency=LATENCY).start()
+    with BitcoinCli('user', 'password', server.url) as btcd:
+        measure('serial', PyBitcoinToolsFactory(btcd, raw_blocks=True))
+        measure('prefetch {}'.format(PREFETCH), PyBitcoinToolsFactory(btcd, raw_blocks=True, prefetch=PREFETCH))
+    server.stop()
@@ -0,0 +1,78 @@
+"""
+Outputs/s of BitcoinScanner without profiler vs. with a ScanProfiler (default sample), and the profile of the
+last run: on the fixture blocks (~11 transactions each: the per block timings weigh more than on recent blocks),
+and on one block of ~1500 of their transactions.
+Measured on 1 core, python 3.6: 3-5% overhead on the large block, 6-14% on the fixture blocks (timing every
+callback, before sampling: 18-28%).
+"""
+import json
+import os
+import time
+
+from bitcoincrawler.blockchain_scanner import BitcoinScanner
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsBlock
+from bitcoincrawler.profiling import ScanProfiler
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX, get_block, get_raw_block, serialize_block
+
+ROUNDS = 500
+REPEAT = 5
+
+
+class ValueSum:
+    def __init__(self):
+        self.outputs = 0
+        self.value = 0
+
+    def on_output(self, output):
+        self.outputs += 1
+        self.value += output.value_sat
+
+
+class TransactionsCount:
+    def __init__(self):
+        self.transactions = 0
+
+    def on_transaction(self, transaction):
+        self.transactions += 1
+
+
+def run(blocks, profiler, transactions, rounds):
+    observer = ValueSum()
+    s = time.perf_counter()
+    for _ in range(0, rounds):
+        scanner = BitcoinScanner(blocks, profiler=profiler)
+        scanner.outputs_observers.append(observer)
+        if transactions:
+            scanner.transactions_observers.append(TransactionsCount())
+        scanner.scan()
+    return observer.outputs / (time.perf_counter() - s)
+
+
+def measure(name, blocks, profiler, transactions=False, rounds=ROUNDS):
+    plain = max(run(blocks, None, transactions, rounds) for _ in range(0, REPEAT))
+    profiled = max(run(blocks, profiler, transactions, rounds) for _ in range(0, REPEAT))
+    print('{:<24} {:.0f} outputs/s, profiled {:.0f} outputs/s: {:.1%} overhead'.format(
+        name, plain, profiled, 1 - profiled / plain))
+
+
+def large_block(blockhashes, times):
+    """
+    The transactions of the fixture blocks, `times` over, under the header of the first one
+    """
+    with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+        rawtransactions = json.load(f)
+    block = get_block(blockhashes[0])['result']
+    block['tx'] = [txid for blockhash in blockhashes for txid in get_block(blockhash)['result']['tx']] * times
+    return PyBitcoinToolsBlock(serialize_block(block, rawtransactions))
+
+
+if __name__ == '__main__':
+    blockhashes = [f[:-len('.json')] for f in os.listdir(PREFIX + 'cli_files/blocks/')]
+    blocks = [PyBitcoinToolsBlock(get_raw_block(blockhash)['result']) for blockhash in blockhashes]
+    large = [large_block(blockhashes, 20)]
+    profiler = ScanProfiler()
+    measure('on_output', blocks, profiler)
+    measure('on_transaction+on_output', blocks, profiler, transactions=True)
+    measure('large on_output', large, profiler, rounds=ROUNDS // 20)
+    measure('large on_transaction+...', large, profiler, transactions=True, rounds=ROUNDS // 20)
+    print(json.dumps(profiler.snapshot(), indent=2))
@@ -0,0 +1,66 @@
+"""
+requests/s against a local fake bitcoind: one-shot connections (plain requests.post / aiohttp.request)
+vs. BitcoinCli pooled keep-alive sessions.
+"""
+import asyncio
+import json
+import time
+
+import aiohttp
+import requests
+
+from bitcoincrawler.components.bitcoind.client import BitcoinCli
+from bitcoincrawler.test.mocks.components.bitcoind.server import FakeBitcoind
+
+CALLS = 2000
+ASYNC_LIMIT = 100
+
+
+def one_shot_sync(btcd, txids):
+    headers = {"content-type": "application/json", "Authorization": btcd.btcd_auth_header}
+    for txid in txids:
+        payload = {"method": "getrawtransaction", "params": [txid], "jsonrpc": "2.0", "id": 0}
+        requests.post(btcd.btcd_url, data=json.dumps(payload), headers=headers).text
+
+
+def pooled_sync(btcd, txids):
+    for txid in txids:
+        btcd.get_raw_transaction(txid)
+
+
+def one_shot_async(btcd, txids):
+    headers = {"content-type": "application/json", "Authorization": btcd.btcd_auth_header_async}
+    lock = asyncio.Semaphore(ASYNC_LIMIT)
+
+    @asyncio.coroutine
+    def fetch(txid):
+        payload = {"method": "getrawtransaction", "params": [txid], "jsonrpc": "2.0", "id": 0}
+        with (yield from lock):
+            r = yield from aiohttp.request('POST', btcd.btcd_url, data=json.dumps(payload), headers=headers)
+            return (yield from r.text())
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.gather(*(fetch(txid) for txid in txids)))
+
+
+def pooled_async(btcd, txids):
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(asyncio.gather(*(btcd.call("getrawtransaction", txid, async=True) for txid in txids)))
+
+
+def measure(name, func, btcd, txids):
+    s = time.time()
+    func(btcd, txids)
+    elapsed = time.time() - s
+    print('{:<16} {:>6} calls in {:.2f}s ({:.0f} requests/s)'.format(name, len(txids), elapsed, len(txids) / elapsed))
+
+
+if __name__ == '__main__':
+    server = FakeBitcoind().start()
+    txids = (list(server.rawtransactions.keys()) * (CALLS // len(server.rawtransactions) + 1))[:CALLS]
+    with BitcoinCli('user', 'password', server.url, async=True, async_limit=ASYNC_LIMIT) as btcd:
+        measure('one-shot sync', one_shot_sync, btcd, txids)
+        measure('pooled sync', pooled_sync, btcd, txids)
+        measure('one-shot async', one_shot_async, btcd, txids)
+        measure('pooled async', pooled_async, btcd, txids)
+    server.stop()
@@ -0,0 +1,41 @@
+"""
+Summing the outputs value of the fixture transactions: BTC Decimals (vout.value) vs. satoshis (vout.value_sat).
+"""
+import json
+import time
+import tracemalloc
+
+from bitcoincrawler.components.pybitcointools.model import PyBitcoinToolsTransaction
+from bitcoincrawler.test.mocks.components.bitcoind.client import PREFIX
+
+ROUNDS = 20
+
+
+def btc(vouts):
+    return sum(vout.value for vout in vouts)
+
+
+def satoshis(vouts):
+    return sum(vout.value_sat for vout in vouts)
+
+
+def measure(name, func, vouts):
+    tracemalloc.start()
+    func(vouts)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    s = time.time()
+    for _ in range(0, ROUNDS):
+        func(vouts)
+    elapsed = time.time() - s
+    n = len(vouts) * ROUNDS
+    print('{:<10} {:>6} outputs in {:.2f}s ({:.0f} outputs/s), peak {} bytes'.format(name, n, elapsed,
+                                                                                   n / elapsed, peak))
+
+
+if __name__ == '__main__':
+    with open(PREFIX + 'cli_files/rawtransactions.json') as f:
+        txs = [PyBitcoinToolsTransaction(rawtx, txid) for txid, rawtx in json.load(f).items()]
+    vouts = [vout for tx in txs for vout in tx.vout]
+    measure('value', btc, vouts)
+    measure('value_sat', satoshis, vouts)
@@ -3,6 +3,7 @@ from bitcoincrawler.components.bitcoind.factory import BitcoindFactory
 from bitcoincrawler.components.pybitcointools.factory import PyBitcoinToolsFactory
 from bitcoincrawler.blockchain_scanner import *
 from bitcoincrawler.components.base_factory import AdapterFactory
+from bitcoincrawler.checkpoint import Checkpoint
 import time
 import json
 import logging
@@ -82,9 +83,9 @@ def do(storage):
     obs = Observer(storage, task='push')
     mp = Observer(storage)
 
-    def bind(adapter, mp_obs, obs):
+    def bind(adapter, mp_obs, obs, checkpoint=None):
       nodes_generator = adapter.generate_blocks(blockheight=start_height, max_iterations=increment)
-      bitcoin_scanner = BitcoinScanner(nodes_generator, async=ASYNC)
+      bitcoin_scanner = BitcoinScanner(nodes_generator, async=ASYNC, checkpoint=checkpoint)
       bitcoin_scanner.transactions_observers.append(obs)
       bitcoin_scanner.blocks_observers.append(obs)
       return bitcoin_scanner
@@ -99,7 +100,7 @@ def do(storage):
     s = time.time()
     adapter1 = AdapterFactory(blocks_factory, blocks_factory)
 
-    bind(adapter1, mp1, obs1).scan()
+    bind(adapter1, mp1, obs1, checkpoint=checkpoint).scan()
     at2 = time.time() - s
     res = '{} parser: {} txs scanned in {} blocks, {} txs from mempool, done in {}s ({} tx\s)'
     #FIXME Useful to find parsing mistakes, but unreliable for timings, since the step 2 handles comparison
@@ -118,8 +119,10 @@ blocks_factory = BitcoindFactory(btcd, async=ASYNC)
 txs_factory = PyBitcoinToolsFactory(btcd, async=ASYNC)
 
 if __name__ == '__main__':
-    start_height = 1
     increment = 5
+    # a chunk is done once compared: restart from the last compared one
+    checkpoint = Checkpoint('compare_blockchain.checkpoint', every=increment)
+    start_height = checkpoint.next_height(default=1)
     storage = Storage()
     while start_height < 370000:
         do(storage)